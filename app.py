@@ -1,25 +1,161 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-from emotion_detector import EmotionDetector
-from face_emotion_detector import FaceEmotionDetector
 from database import EmotionDatabase
+from lazy_engine import LazyEngine, start_warmup
 from datetime import datetime
+import json
 import os
+import threading
 
 app = Flask(__name__)
 CORS(app)
 
-# Initialize detectors
-text_detector = EmotionDetector()
-face_detector = FaceEmotionDetector()
+# WebSocket support for /ws/face-stream (optional)
+try:
+    from flask_sock import Sock
+    sock = Sock(app)
+except ImportError:
+    sock = None
+    print("[WARNING] flask-sock not installed - /ws/face-stream disabled")
 
-# Initialize database
-db = EmotionDatabase('emotion_data.db')
+def build_text_detector():
+    """Create the text detector (imports TextBlob on first use)"""
+    from emotion_detector import EmotionDetector
+    
+    # TEXT_CACHE_SIZE=0 disables the text result cache, TEXT_CACHE_TTL=0 disables expiry
+    return EmotionDetector(
+        cache_size=int(os.environ.get('TEXT_CACHE_SIZE', 1024)),
+        cache_ttl=float(os.environ.get('TEXT_CACHE_TTL', 3600)) or None
+    )
+
+def build_face_detector():
+    """
+    Create the face detector (imports OpenCV and DeepFace on first use)
+    With FACE_WORKERS > 0 the detector runs in that many worker processes
+    instead, keeping model work off the web process's request threads
+    """
+    # FACE_PIPELINE=deepface sends whole frames to DeepFace.analyze instead of Haar crops
+    # FACE_BATCH_SIZE=1 disables micro-batching of concurrent face requests
+    # FACE_DETECT_MAX_SIDE=0 searches full-resolution frames for faces
+    # FACE_DETECTOR=yunet or ssd finds faces with an OpenCV DNN model instead of Haar
+    # FACE_CACHE_CLIENTS=0 disables the near-duplicate frame cache
+    # FACE_BACKEND=onnx or opencv runs the exported emotion model without TensorFlow
+    # FACE_QUANTIZED=true runs its int8 version (see quantize_emotion_model.py)
+    detector_kwargs = dict(
+        pipeline=os.environ.get('FACE_PIPELINE', 'crop'),
+        batch_size=int(os.environ.get('FACE_BATCH_SIZE', 16)),
+        batch_wait_ms=float(os.environ.get('FACE_BATCH_WAIT_MS', 10)),
+        detect_max_side=int(os.environ.get('FACE_DETECT_MAX_SIDE', 640)),
+        frame_cache_clients=int(os.environ.get('FACE_CACHE_CLIENTS', 1024)),
+        frame_cache_ttl=float(os.environ.get('FACE_CACHE_TTL', 5)) or None,
+        frame_cache_distance=int(os.environ.get('FACE_CACHE_MAX_DISTANCE', 5)),
+        backend=os.environ.get('FACE_BACKEND', 'deepface'),
+        model_path=os.environ.get('FACE_MODEL_PATH') or None,
+        backend_threads=int(os.environ.get('FACE_BACKEND_THREADS', 0)),
+        quantized=os.environ.get('FACE_QUANTIZED', 'False').lower() == 'true',
+        face_detector=os.environ.get('FACE_DETECTOR', 'haar'),
+        face_detector_model=os.environ.get('FACE_DETECTOR_MODEL') or None
+    )
+    
+    workers = int(os.environ.get('FACE_WORKERS', 0))
+    if workers > 0:
+        from face_worker_pool import FaceWorkerPool
+        detector = FaceWorkerPool(
+            size=workers,
+            detector_kwargs=detector_kwargs,
+            threads=int(os.environ.get('FACE_WORKER_THREADS', 4)),
+            niceness=int(os.environ.get('FACE_WORKER_NICE', 10)),
+            timeout=float(os.environ.get('FACE_WORKER_TIMEOUT', 30))
+        )
+    else:
+        from face_emotion_detector import FaceEmotionDetector
+        detector = FaceEmotionDetector(**detector_kwargs)
+    
+    # Run a synthetic inference so /ready only passes once the model is hot
+    detector.warm_up()
+    return detector
+
+# Detectors are loaded lazily so importing the app stays fast
+text_engine = LazyEngine('text', build_text_detector)
+face_engine = LazyEngine('face', build_face_detector)
+ENGINES = (text_engine, face_engine)
+
+# Load engines in the background right away (WARMUP=False loads on first request)
+# Face worker processes re-import the main module as __mp_main__; they must not warm up
+if os.environ.get('WARMUP', 'True').lower() == 'true' and __name__ != '__mp_main__':
+    start_warmup(ENGINES)
+
+# Initialize database (one pooled connection per request thread)
+# DB_JOURNAL_MODE=DELETE and DB_SYNCHRONOUS=FULL restore SQLite's defaults
+# DB_WRITE_BEHIND=False writes detections before responding instead of in background batches
+db = EmotionDatabase(
+    'emotion_data.db',
+    journal_mode=os.environ.get('DB_JOURNAL_MODE', 'WAL'),
+    synchronous=os.environ.get('DB_SYNCHRONOUS', 'NORMAL'),
+    mmap_size_mb=float(os.environ.get('DB_MMAP_MB', 256)),
+    cache_size_mb=float(os.environ.get('DB_CACHE_MB', 16)),
+    write_behind=os.environ.get('DB_WRITE_BEHIND', 'True').lower() == 'true',
+    flush_size=int(os.environ.get('DB_FLUSH_SIZE', 100)),
+    flush_interval=float(os.environ.get('DB_FLUSH_INTERVAL_MS', 500)) / 1000
+)
 print("[APP] Database initialized")
 
 # Keep in-memory history for backward compatibility (optional)
 emotion_history = []
 
+# Maximum number of texts accepted by /api/detect/batch
+MAX_BATCH_SIZE = 1000
+
+# Maximum document length (characters) accepted by /api/detect/document
+MAX_DOCUMENT_LENGTH = 1000000
+
+# Characters of a document kept in the emotions table (the full text is not stored)
+DOCUMENT_EXCERPT_LENGTH = 1000
+
+# Raw image bodies accepted by /api/detect-face (besides JSON and multipart)
+RAW_IMAGE_TYPES = ('image/jpeg', 'image/png', 'image/webp', 'image/bmp')
+
+# Maximum upload size (bytes) accepted by /api/detect-video
+MAX_VIDEO_BYTES = int(os.environ.get('MAX_VIDEO_MB', 500)) * 1024 * 1024
+
+# Each open /ws/face-stream holds a request thread (gunicorn runs 8): keep
+# fewer streams than threads so HTTP routes and /health always get one
+STREAM_MAX_SESSIONS = int(os.environ.get('STREAM_MAX_SESSIONS', 4))
+
+# Seconds a stream may go without a frame before the server closes it
+STREAM_IDLE_TIMEOUT = float(os.environ.get('STREAM_IDLE_TIMEOUT', 30))
+
+stream_sessions = 0
+stream_sessions_lock = threading.Lock()
+
+def face_db_entries(result, timestamp):
+    """Database records for a face detection result, one per detected face"""
+    faces_count = result.get('faces_detected', 1)
+    faces = result.get('faces')
+    if not faces:
+        return [{
+            'text': f"Facial expression detected ({faces_count} face(s))",
+            'emotion': result['emotion'],
+            'confidence': result['confidence'],
+            'all_emotions': result['all_emotions'],
+            'type': 'face',
+            'faces_detected': faces_count,
+            'method': result.get('method', 'unknown'),
+            'timestamp': timestamp
+        }]
+    
+    return [{
+        'text': f"Facial expression detected (face {index} of {len(faces)} at "
+                f"x={face['box']['x']}, y={face['box']['y']}, {face['box']['w']}x{face['box']['h']})",
+        'emotion': face['emotion'],
+        'confidence': face['confidence'],
+        'all_emotions': face['all_emotions'],
+        'type': 'face',
+        'faces_detected': len(faces),
+        'method': result.get('method', 'unknown'),
+        'timestamp': timestamp
+    } for index, face in enumerate(faces, 1)]
+
 @app.route('/')
 def index():
     """Serve the main page"""
@@ -31,7 +167,28 @@ def health():
     return jsonify({
         'status': 'healthy',
         'service': 'AI Emotion Detection',
-        'version': '1.0'
+        'version': '1.0',
+        'text_cache': text_engine.peek().cache_stats() if text_engine.loaded else None,
+        'db_write_queue': db.write_queue_stats()
+    }), 200
+
+@app.route('/ready')
+def ready():
+    """Readiness check: 200 once every detection engine has loaded, 503 before"""
+    is_ready = all(engine.loaded for engine in ENGINES)
+    return jsonify({
+        'ready': is_ready,
+        'engines': {engine.name: engine.status() for engine in ENGINES}
+    }), 200 if is_ready else 503
+
+@app.route('/api/metrics')
+def metrics():
+    """Engine load state, face model latency, text cache and database write queue metrics"""
+    return jsonify({
+        'engines': {engine.name: engine.status() for engine in ENGINES},
+        'face': face_engine.peek().get_metrics() if face_engine.loaded else None,
+        'text_cache': text_engine.peek().cache_stats() if text_engine.loaded else None,
+        'db_write_queue': db.write_queue_stats()
     }), 200
 
 @app.route('/camera-test')
@@ -72,11 +229,12 @@ def detect_emotion():
         if len(text) > 5000:
             return jsonify({
                 'error': 'Text too long',
-                'message': 'Please provide text with less than 5000 characters'
+                'message': 'Please provide text with less than 5000 characters, '
+                           'or use /api/detect/document for long documents'
             }), 400
         
         # Detect emotion
-        result = text_detector.detect(text)
+        result = text_engine.get().detect(text)
         
         # Save to database
         db_entry = {
@@ -122,6 +280,168 @@ def detect_emotion():
             'message': 'An error occurred while processing your request'
         }), 500
 
+@app.route('/api/detect/batch', methods=['POST'])
+def detect_emotion_batch():
+    """
+    API endpoint to detect emotions for many texts in one call
+    Expects JSON: {"texts": ["first text", "second text", ...]}
+    Returns: {"results": [{"emotion": "happy", "confidence": 0.95, ...}, ...]}
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('texts'), list):
+            return jsonify({
+                'error': 'No texts provided',
+                'message': 'Please provide a list of texts in the request body'
+            }), 400
+        
+        texts = data['texts']
+        
+        if not texts:
+            return jsonify({
+                'error': 'Empty batch',
+                'message': 'Please provide at least one text'
+            }), 400
+        
+        if len(texts) > MAX_BATCH_SIZE:
+            return jsonify({
+                'error': 'Batch too large',
+                'message': f'Please provide at most {MAX_BATCH_SIZE} texts per request'
+            }), 400
+        
+        for index, text in enumerate(texts):
+            if not isinstance(text, str) or not text.strip():
+                return jsonify({
+                    'error': 'Empty text',
+                    'message': f'Text at index {index} must be a non-empty string'
+                }), 400
+            if len(text.strip()) > 5000:
+                return jsonify({
+                    'error': 'Text too long',
+                    'message': f'Text at index {index} must have less than 5000 characters'
+                }), 400
+        
+        texts = [text.strip() for text in texts]
+        
+        # Detect emotions for the whole batch
+        results = text_engine.get().detect_batch(texts)
+        
+        # Save all results to database in one transaction
+        timestamp = datetime.now().isoformat()
+        db_entries = [{
+            'text': text,
+            'emotion': result['emotion'],
+            'confidence': result['confidence'],
+            'all_emotions': result['all_emotions'],
+            'sentiment_polarity': result['sentiment']['polarity'],
+            'sentiment_subjectivity': result['sentiment']['subjectivity'],
+            'type': 'text',
+            'timestamp': timestamp
+        } for text, result in zip(texts, results)]
+        db.add_emotions(db_entries)
+        
+        # Also add to in-memory history, keeping only last 50 entries
+        emotion_history.extend({
+            'text': text[:100] + '...' if len(text) > 100 else text,
+            'emotion': result['emotion'],
+            'confidence': result['confidence'],
+            'timestamp': timestamp,
+            'type': 'text'
+        } for text, result in zip(texts, results))
+        del emotion_history[:-50]
+        
+        return jsonify({
+            'success': True,
+            'count': len(results),
+            'results': [{
+                'emotion': result['emotion'],
+                'confidence': result['confidence'],
+                'all_emotions': result['all_emotions'],
+                'sentiment': result['sentiment'],
+                'text_length': len(text)
+            } for text, result in zip(texts, results)],
+            'timestamp': timestamp
+        })
+    
+    except Exception as e:
+        app.logger.error(f"Error in detect_emotion_batch: {str(e)}")
+        return jsonify({
+            'error': 'Processing error',
+            'message': 'An error occurred while processing your request'
+        }), 500
+
+@app.route('/api/detect/document', methods=['POST'])
+def detect_emotion_document():
+    """
+    API endpoint to analyze long documents chunk by chunk
+    Expects JSON: {"text": "long text...", "chunk_size": 1000} or a text/plain body
+    Streams NDJSON: one {"type": "chunk", ...} line per chunk, then a final
+    {"type": "aggregate", ...} line with the score of the whole document
+    """
+    try:
+        if request.is_json:
+            data = request.get_json() or {}
+            text = data.get('text')
+            chunk_size = data.get('chunk_size', 1000)
+        else:
+            text = request.get_data(as_text=True)
+            chunk_size = request.args.get('chunk_size', 1000, type=int)
+        
+        if not isinstance(text, str) or not text.strip():
+            return jsonify({
+                'error': 'No text provided',
+                'message': 'Please provide non-empty text in the request body'
+            }), 400
+        
+        if len(text) > MAX_DOCUMENT_LENGTH:
+            return jsonify({
+                'error': 'Text too long',
+                'message': f'Please provide text with less than {MAX_DOCUMENT_LENGTH} characters'
+            }), 400
+        
+        if not isinstance(chunk_size, int) or not 100 <= chunk_size <= 20000:
+            return jsonify({
+                'error': 'Invalid chunk size',
+                'message': 'chunk_size must be an integer between 100 and 20000'
+            }), 400
+    
+    except Exception as e:
+        app.logger.error(f"Error in detect_emotion_document: {str(e)}")
+        return jsonify({
+            'error': 'Processing error',
+            'message': 'An error occurred while processing your request'
+        }), 500
+    
+    def generate():
+        try:
+            for result in text_engine.get().detect_stream(text, chunk_size):
+                if result['type'] == 'aggregate':
+                    result['timestamp'] = datetime.now().isoformat()
+                    
+                    # Save the document result to database, with an excerpt of the text
+                    db.add_emotion({
+                        'text': text[:DOCUMENT_EXCERPT_LENGTH] + '...' if len(text) > DOCUMENT_EXCERPT_LENGTH else text,
+                        'emotion': result['emotion'],
+                        'confidence': result['confidence'],
+                        'all_emotions': result['all_emotions'],
+                        'sentiment_polarity': result['sentiment']['polarity'],
+                        'sentiment_subjectivity': result['sentiment']['subjectivity'],
+                        'type': 'text',
+                        'method': 'document',
+                        'timestamp': result['timestamp']
+                    })
+                yield json.dumps(result) + '\n'
+        except Exception as e:
+            app.logger.error(f"Error in detect_emotion_document: {str(e)}")
+            yield json.dumps({
+                'type': 'error',
+                'error': 'Processing error',
+                'message': 'An error occurred while processing your request'
+            }) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/history', methods=['GET'])
 def get_history():
     """Get emotion detection history from database"""
@@ -155,26 +475,60 @@ def get_history():
 def detect_face_emotion():
     """
     API endpoint to detect emotion from facial expression
-    Expects JSON: {"image": "base64_encoded_image"}
+    Accepts any of:
+      - Raw image body with Content-Type image/jpeg or image/png
+      - multipart/form-data with the image file in an "image" field
+      - JSON: {"image": "base64_encoded_image"}
+    Near-identical frames from the same client (X-Client-Id header) reuse
+    the previous result; requests without the header, or with ?cache=false,
+    always run full detection
     Returns: {"emotion": "happy", "confidence": 0.95, "all_emotions": {...}}
     """
     try:
-        print("[API] Received face detection request")
-        data = request.get_json()
+        print(f"[API] Received face detection request ({request.mimetype})")
         
-        if not data or 'image' not in data:
-            print("[ERROR] No image data in request")
-            return jsonify({
-                'error': 'No image provided',
-                'message': 'Please provide a base64 encoded image'
-            }), 400
+        # Frame cache scope: one client, unless the caller opts out. Only an
+        # explicit id: behind a NAT or proxy many users share remote_addr
+        use_cache = request.args.get('cache', 'true').lower() not in ('false', '0', 'no')
+        client_id = request.headers.get('X-Client-Id')
+        cache_key = client_id if use_cache and client_id else None
         
-        image_data = data['image']
-        print(f"[API] Image data received, length: {len(image_data)}")
-        
-        # Detect emotion from face
-        print("[API] Calling face detector...")
-        result = face_detector.detect_from_base64(image_data)
+        if request.mimetype in RAW_IMAGE_TYPES or request.mimetype == 'multipart/form-data':
+            # Binary upload: decoded straight from the request buffer
+            if request.mimetype == 'multipart/form-data':
+                upload = request.files.get('image')
+                image_bytes = upload.read() if upload else b''
+            else:
+                image_bytes = request.get_data(cache=False)
+            
+            if not image_bytes:
+                print("[ERROR] No image data in request")
+                return jsonify({
+                    'error': 'No image provided',
+                    'message': 'Please upload an image body or an "image" form field'
+                }), 400
+            
+            print(f"[API] Image bytes received: {len(image_bytes)}")
+            print("[API] Calling face detector...")
+            result = face_engine.get().detect_from_bytes(image_bytes, cache_key=cache_key)
+        else:
+            data = request.get_json(silent=True)
+            
+            if not data or 'image' not in data:
+                print("[ERROR] No image data in request")
+                return jsonify({
+                    'error': 'No image provided',
+                    'message': 'Please provide a base64 encoded image'
+                }), 400
+            
+            image_data = data['image']
+            print(f"[API] Image data received, length: {len(image_data)}")
+            if data.get('cache') is False:
+                cache_key = None
+            
+            # Detect emotion from face
+            print("[API] Calling face detector...")
+            result = face_engine.get().detect_from_base64(image_data, cache_key=cache_key)
         print(f"[API] Detection result: {result}")
         
         if not result.get('success', False):
@@ -185,25 +539,16 @@ def detect_face_emotion():
                 'message': error_msg
             }), 400
         
-        # Save to database
-        db_entry = {
-            'text': f"Facial expression detected ({result.get('faces_detected', 1)} face(s))",
-            'emotion': result['emotion'],
-            'confidence': result['confidence'],
-            'all_emotions': result['all_emotions'],
-            'type': 'face',
-            'faces_detected': result.get('faces_detected', 1),
-            'method': result.get('method', 'unknown'),
-            'timestamp': datetime.now().isoformat()
-        }
-        db.add_emotion(db_entry)
+        # Save every face to database in one transaction
+        timestamp = datetime.now().isoformat()
+        db.add_emotions(face_db_entries(result, timestamp))
         
         # Also add to in-memory history
         history_entry = {
-            'text': db_entry['text'],
+            'text': f"Facial expression detected ({result.get('faces_detected', 1)} face(s))",
             'emotion': result['emotion'],
             'confidence': result['confidence'],
-            'timestamp': db_entry['timestamp'],
+            'timestamp': timestamp,
             'type': 'face'
         }
         emotion_history.append(history_entry)
@@ -218,7 +563,9 @@ def detect_face_emotion():
             'confidence': result['confidence'],
             'all_emotions': result['all_emotions'],
             'faces_detected': result.get('faces_detected', 1),
+            'faces': result.get('faces', []),
             'method': result.get('method', 'unknown'),
+            'cached': result.get('cached', False),
             'timestamp': history_entry['timestamp']
         })
     
@@ -234,6 +581,188 @@ def detect_face_emotion():
             'message': f'An error occurred while processing your image: {str(e)}'
         }), 500
 
+@app.route('/api/detect-video', methods=['POST'])
+def detect_video_emotion():
+    """
+    API endpoint for a facial emotion timeline of a video file
+    Accepts a raw video body (Content-Type video/*) or multipart/form-data
+    with the file in a "video" field; ?fps= sets the frames analyzed per
+    second of video (default VIDEO_SAMPLE_FPS, 0 = every frame)
+    Streams NDJSON: one {"type": "frame", "timestamp": ...} line per sampled
+    frame as soon as it is analyzed, then a {"type": "summary", ...} line
+    with frames/s processed and the dominant emotion
+    """
+    import tempfile
+    from video_analysis import analyze_video
+    
+    path = None
+    try:
+        # type= only converts query values: convert the env default here
+        try:
+            default_fps = float(os.environ.get('VIDEO_SAMPLE_FPS', 2.0))
+        except ValueError:
+            app.logger.error(f"VIDEO_SAMPLE_FPS={os.environ['VIDEO_SAMPLE_FPS']!r} is not a number")
+            default_fps = None
+        sample_fps = request.args.get('fps', default_fps, type=float)
+        if sample_fps is None or not 0 <= sample_fps <= 60:
+            return jsonify({
+                'error': 'Invalid sampling rate',
+                'message': 'fps must be a number between 0 and 60'
+            }), 400
+        
+        if request.mimetype == 'multipart/form-data':
+            upload = request.files.get('video')
+            stream = upload.stream if upload else None
+        elif request.mimetype.startswith('video/') or request.mimetype == 'application/octet-stream':
+            stream = request.stream
+        else:
+            stream = None
+        if stream is None:
+            return jsonify({
+                'error': 'No video provided',
+                'message': 'Please upload a video body (Content-Type video/*) or a "video" form field'
+            }), 400
+        
+        # VideoCapture reads files: spool the upload to disk in chunks
+        with tempfile.NamedTemporaryFile(suffix='.video', delete=False) as spool:
+            path = spool.name
+            size = 0
+            for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+                size += len(chunk)
+                if size > MAX_VIDEO_BYTES:
+                    break
+                spool.write(chunk)
+        if size > MAX_VIDEO_BYTES or not size:
+            os.remove(path)
+            return jsonify({
+                'error': 'Video too large' if size else 'No video provided',
+                'message': f'Please upload a video of at most {MAX_VIDEO_BYTES // (1024 * 1024)} MB'
+                           if size else 'The uploaded video is empty'
+            }), 413 if size else 400
+        
+        print(f"[API] Video received: {size} bytes, sampling {sample_fps} fps")
+        detector = face_engine.get()
+        timeline = analyze_video(detector, path, sample_fps=sample_fps,
+                                 threads=int(os.environ.get('VIDEO_THREADS', 4)))
+        # Opening the video happens on the first step: report unreadable files as a 400
+        first = next(timeline)
+    except ValueError as e:
+        if path and os.path.exists(path):
+            os.remove(path)
+        print(f"[ERROR] Video rejected: {e}")
+        return jsonify({
+            'error': 'Invalid video',
+            'message': 'The upload could not be read as a video (unsupported or corrupt file)'
+        }), 400
+    except Exception as e:
+        app.logger.error(f"Error in detect_video_emotion: {str(e)}")
+        if path and os.path.exists(path):
+            os.remove(path)
+        return jsonify({
+            'error': 'Processing error',
+            'message': 'An error occurred while processing your video'
+        }), 500
+    
+    def generate():
+        try:
+            yield json.dumps(first) + '\n'
+            for entry in timeline:
+                yield json.dumps(entry) + '\n'
+        except Exception as e:
+            app.logger.error(f"Error in detect_video_emotion: {str(e)}")
+            yield json.dumps({
+                'type': 'error',
+                'error': 'Processing error',
+                'message': 'An error occurred while processing your video'
+            }) + '\n'
+        finally:
+            timeline.close()
+            os.remove(path)
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def stream_setting(name, default, cast, low, high):
+    """Read a streaming knob from the query string (or its STREAM_* env default) within bounds"""
+    env_name = f'STREAM_{name.upper()}'
+    if env_name in os.environ:
+        # type= only converts query values: convert the env default here
+        try:
+            default = cast(os.environ[env_name])
+        except ValueError:
+            raise ValueError(f'{env_name}={os.environ[env_name]!r} is not a valid {cast.__name__}')
+    value = request.args.get(name, default, type=cast)
+    if value is None or not low <= value <= high:
+        raise ValueError(f'{name} must be between {low} and {high}')
+    return value
+
+if sock is not None:
+    @sock.route('/ws/face-stream')
+    def face_stream(ws):
+        """
+        WebSocket endpoint for live facial emotion tracking
+        Query args: keyframe_interval (frames), emotion_fps (0 = every frame), smoothing (0-0.95)
+        Client sends: binary JPEG/PNG frames
+        Server sends: one JSON {"type": "update", "faces": [...], ...} per frame,
+                      or {"type": "error", ...} for a frame that could not be processed
+        At most STREAM_MAX_SESSIONS streams run at once, and one that sends no
+        frame for STREAM_IDLE_TIMEOUT seconds is closed
+        """
+        from face_stream import FaceStreamSession
+        global stream_sessions
+        
+        with stream_sessions_lock:
+            full = stream_sessions >= STREAM_MAX_SESSIONS
+            if not full:
+                stream_sessions += 1
+        if full:
+            ws.send(json.dumps({
+                'type': 'error',
+                'error': 'Too many streams',
+                'message': f'The server is already running {STREAM_MAX_SESSIONS} live streams, try again later'
+            }))
+            return
+        
+        try:
+            try:
+                session = FaceStreamSession(
+                    face_engine.get(),
+                    keyframe_interval=stream_setting('keyframe_interval', 10, int, 1, 300),
+                    emotion_fps=stream_setting('emotion_fps', 5.0, float, 0.0, 60.0),
+                    smoothing=stream_setting('smoothing', 0.6, float, 0.0, 0.95)
+                )
+            except ValueError as e:
+                ws.send(json.dumps({'type': 'error', 'error': 'Invalid settings', 'message': str(e)}))
+                return
+            
+            print("[STREAM] Client connected")
+            while True:
+                # None: no frame within the timeout, the tab is idle or gone
+                frame = ws.receive(timeout=STREAM_IDLE_TIMEOUT)
+                if frame is None:
+                    ws.send(json.dumps({
+                        'type': 'error',
+                        'error': 'Idle timeout',
+                        'message': f'No frame received for {STREAM_IDLE_TIMEOUT:g}s, closing the stream'
+                    }))
+                    break
+                if isinstance(frame, str):
+                    ws.send(json.dumps({
+                        'type': 'error',
+                        'error': 'Unsupported message',
+                        'message': 'Send frames as binary JPEG or PNG messages'
+                    }))
+                    continue
+                
+                try:
+                    update = session.process_bytes(frame)
+                except Exception as e:
+                    update = {'type': 'error', 'error': 'Detection failed', 'message': str(e)}
+                ws.send(json.dumps(update))
+            print(f"[STREAM] Client disconnected: {session.stats()}")
+        finally:
+            with stream_sessions_lock:
+                stream_sessions -= 1
+
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
     """Get statistics about detected emotions from database"""
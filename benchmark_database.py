@@ -0,0 +1,188 @@
+"""
+Benchmark: EmotionDatabase with a connection per call vs pooled connections
+Run with: python benchmark_database.py
+"before" opens a fresh connection with SQLite's defaults (rollback journal,
+synchronous=FULL) for every call, as EmotionDatabase used to; "after" uses
+the per-thread connections with WAL and the tuned pragmas. Section 4 adds
+the write-behind queue and times add_emotion() as request threads see it.
+Each run uses its own database file in a temporary directory.
+"""
+import sys
+import io
+import contextlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+import numpy as np
+
+from database import EmotionDatabase
+
+SEED_ROWS = 5000
+SINGLE_INSERTS = 500
+BATCHES = 40
+BATCH_ROWS = 50
+READERS = 4
+LOAD_SECONDS = 3.0
+REQUEST_THREADS = 8
+REQUEST_INSERTS = 250  # Per thread
+
+RECORD = {
+    'text': 'I am so happy and excited but also really fed up today',
+    'emotion': 'happy',
+    'confidence': 0.61,
+    'all_emotions': {'happy': 0.61, 'excited': 0.22, 'frustrated': 0.17},
+    'sentiment_polarity': 0.4,
+    'sentiment_subjectivity': 0.8,
+    'type': 'text',
+    'method': 'benchmark'
+}
+
+
+class PerCallDatabase(EmotionDatabase):
+    """The previous behaviour: a new connection with SQLite's defaults for every call"""
+
+    def _connect(self):
+        # Closed when the caller drops it, like the old explicit close()
+        return sqlite3.connect(self.db_path, timeout=self.busy_timeout)
+
+
+def record(index):
+    return dict(RECORD, emotion=('happy', 'sad', 'angry', 'calm')[index % 4], timestamp=datetime.now().isoformat())
+
+
+def single_inserts(db):
+    """add_emotion() calls per second, one commit each"""
+    start = time.perf_counter()
+    for i in range(SINGLE_INSERTS):
+        db.add_emotion(record(i))
+    return SINGLE_INSERTS / (time.perf_counter() - start)
+
+
+def batched_inserts(db):
+    """Rows per second through add_emotions() in batches"""
+    start = time.perf_counter()
+    for i in range(BATCHES):
+        db.add_emotions([record(i * BATCH_ROWS + j) for j in range(BATCH_ROWS)])
+    return BATCHES * BATCH_ROWS / (time.perf_counter() - start)
+
+
+def reads_under_write_load(db):
+    """Read latencies (ms) of READERS threads while one thread keeps inserting"""
+    stop = threading.Event()
+    latencies = [[] for _ in range(READERS)]
+    errors = [0]
+    writes = [0]
+
+    def writer():
+        while not stop.is_set():
+            try:
+                db.add_emotion(record(writes[0]))
+                writes[0] += 1
+            except sqlite3.OperationalError:
+                errors[0] += 1
+
+    def reader(samples):
+        index = 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                db.get_recent_history(20) if index % 2 else db.get_statistics()
+                samples.append((time.perf_counter() - start) * 1000)
+            except sqlite3.OperationalError:
+                errors[0] += 1
+            index += 1
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader, args=(samples,))
+                                                   for samples in latencies]
+    for thread in threads:
+        thread.start()
+    time.sleep(LOAD_SECONDS)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return np.concatenate([np.array(samples) for samples in latencies]), writes[0] / LOAD_SECONDS, errors[0]
+
+
+def request_path_inserts(db):
+    """add_emotion() latency (ms) seen by REQUEST_THREADS concurrent callers, and rows/s until written"""
+    latencies = [[] for _ in range(REQUEST_THREADS)]
+
+    def request_thread(samples):
+        for i in range(REQUEST_INSERTS):
+            start = time.perf_counter()
+            db.add_emotion(record(i))
+            samples.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=request_thread, args=(samples,)) for samples in latencies]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    db.flush()  # Rows/s counts until every row is on disk
+    elapsed = time.perf_counter() - start
+    return np.concatenate([np.array(samples) for samples in latencies]), REQUEST_THREADS * REQUEST_INSERTS / elapsed
+
+
+def main():
+    print("=" * 60)
+    print("Database Benchmark")
+    print("=" * 60)
+    print(f"Seed rows: {SEED_ROWS}, CPUs: {os.cpu_count()}, SQLite {sqlite3.sqlite_version}")
+
+    results = {}
+    request_path = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, cls in (('before', PerCallDatabase), ('after', EmotionDatabase)):
+            with contextlib.redirect_stdout(io.StringIO()):  # The database logs every insert
+                db = cls(os.path.join(tmp, f'{label}.db'))
+                db.add_emotions([record(i) for i in range(SEED_ROWS)])
+                results[label] = {
+                    'journal': db.connection_info()['journal_mode'],
+                    'single': single_inserts(db),
+                    'batched': batched_inserts(db),
+                    'load': reads_under_write_load(db)
+                }
+                db.close()
+
+        for label, write_behind in (('sync', False), ('queued', True)):
+            with contextlib.redirect_stdout(io.StringIO()):
+                db = EmotionDatabase(os.path.join(tmp, f'{label}.db'), write_behind=write_behind)
+                request_path[label] = {'requests': request_path_inserts(db), 'queue': db.write_queue_stats()}
+                db.close()
+
+    print("\n1. Single-row inserts (add_emotion, one commit each)")
+    for label, result in results.items():
+        print(f"   {label:<7} ({result['journal']:<6}) {result['single']:9.0f} inserts/s")
+
+    print(f"\n2. Batched inserts (add_emotions, {BATCH_ROWS} rows per transaction)")
+    for label, result in results.items():
+        print(f"   {label:<7} ({result['journal']:<6}) {result['batched']:9.0f} rows/s")
+
+    print(f"\n3. Reads while a writer inserts ({READERS} reader threads, {LOAD_SECONDS:.0f}s)")
+    for label, result in results.items():
+        latencies, write_rate, errors = result['load']
+        print(f"   {label:<7} ({result['journal']:<6}) read p50 {np.percentile(latencies, 50):6.2f}ms  "
+              f"p95 {np.percentile(latencies, 95):6.2f}ms  reads {len(latencies):6d}  "
+              f"writes {write_rate:7.0f}/s  lock errors {errors}")
+
+    print(f"\n4. add_emotion() on the request path ({REQUEST_THREADS} threads x {REQUEST_INSERTS}, pooled WAL)")
+    for label in ('sync', 'queued'):
+        latencies, rate = request_path[label]['requests']
+        print(f"   {label:<7} call p50 {np.percentile(latencies, 50):7.3f}ms  p95 {np.percentile(latencies, 95):7.3f}ms  "
+              f"{rate:7.0f} rows/s written")
+    queue_stats = request_path['queued']['queue']
+    print(f"   write-behind: {queue_stats['flush_rows']['count']} flushes, mean {queue_stats['flush_rows']['mean']} rows, "
+          f"flush p95 <= {queue_stats['flush_ms']['p95']}ms, {queue_stats['rows_failed']} rows failed")
+
+    print("\n" + "=" * 60)
+    print("Benchmark complete!")
+
+
+if __name__ == '__main__':
+    main()
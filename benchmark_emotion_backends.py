@@ -0,0 +1,132 @@
+"""
+Benchmark: emotion model backends (deepface vs onnx vs opencv)
+Run with: python benchmark_emotion_backends.py [image_dir] [model.onnx]
+Each backend loads in its own process so start-up time and peak memory
+(RSS) are not shared. Agreement is measured against the deepface backend
+on face crops from image_dir (Haar boxes) plus synthetic crops.
+Export the model first with: python export_emotion_model.py
+"""
+import sys
+import io
+import json
+import os
+import resource
+import subprocess
+import time
+
+import numpy as np
+
+BACKEND_NAMES = ('deepface', 'onnx', 'opencv')
+BATCH_SIZES = (1, 8, 32)
+SYNTHETIC_CROPS = 32
+
+
+def load_crops(detector, image_dir):
+    """Preprocessed face crops from photos in image_dir plus synthetic crops"""
+    import cv2
+
+    batches = []
+    if image_dir:
+        for name in sorted(os.listdir(image_dir)):
+            image = cv2.imread(os.path.join(image_dir, name))
+            if image is None:
+                continue
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            faces = detector.find_faces(gray)
+            if len(faces):
+                batches.append(detector._preprocess_faces(gray, faces))
+    rng = np.random.default_rng(0)
+    synthetic = cv2.GaussianBlur(rng.random((SYNTHETIC_CROPS * 48, 48), dtype=np.float32), (5, 5), 0)
+    batches.append(synthetic.reshape(SYNTHETIC_CROPS, 48, 48, 1))
+    return np.concatenate(batches)
+
+
+def run_child(name, image_dir, model_path):
+    """Load one backend, time it and print its results as JSON"""
+    import contextlib
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        from face_emotion_detector import FaceEmotionDetector
+        detector = FaceEmotionDetector(backend=name, model_path=model_path, batch_size=1, frame_cache_clients=0)
+    load_seconds = time.perf_counter() - start
+    backend = detector.emotion_backend
+
+    crops = load_crops(detector, image_dir)
+    predictions = backend.predict(crops)
+
+    latency_ms = {}
+    for batch_size in BATCH_SIZES:
+        batch = np.resize(crops, (batch_size,) + crops.shape[1:])
+        backend.predict(batch)  # warm-up
+        repeat = max(5, 200 // batch_size)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            backend.predict(batch)
+        latency_ms[batch_size] = (time.perf_counter() - start) / repeat * 1000
+
+    print(json.dumps({
+        'load_seconds': load_seconds,
+        'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'tensorflow_loaded': 'tensorflow' in sys.modules,
+        'latency_ms': latency_ms,
+        'predictions': predictions.tolist()
+    }))
+
+
+def main():
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    image_dir = sys.argv[1] if len(sys.argv) > 1 else ''
+    model_path = sys.argv[2] if len(sys.argv) > 2 else ''
+
+    print("=" * 60)
+    print("Emotion Backend Benchmark")
+    print("=" * 60)
+
+    results = {}
+    for name in BACKEND_NAMES:
+        child = subprocess.run(
+            [sys.executable, __file__, '--child', name, image_dir, model_path],
+            capture_output=True, text=True
+        )
+        lines = child.stdout.strip().splitlines()
+        if child.returncode != 0 or not lines:
+            error = (child.stderr.strip().splitlines() or ['no output'])[-1]
+            print(f"   [SKIP] {name}: {error}")
+            continue
+        results[name] = json.loads(lines[-1])
+
+    print("\n1. Start-up and memory (fresh process each)")
+    for name, result in results.items():
+        print(f"   {name:<9} load {result['load_seconds']:6.2f}s  peak RSS {result['rss_mb']:7.1f} MB"
+              f"  TensorFlow loaded: {result['tensorflow_loaded']}")
+
+    print("\n2. Model latency per batch")
+    print("   " + "backend".ljust(9) + "".join(f"{f'batch {size}':>14}" for size in BATCH_SIZES))
+    for name, result in results.items():
+        cells = "".join(f"{result['latency_ms'][str(size)]:12.2f}ms" for size in BATCH_SIZES)
+        print(f"   {name:<9}{cells}")
+
+    print("\n3. Agreement with the deepface backend")
+    if 'deepface' not in results:
+        print("   [SKIP] deepface backend not available")
+    else:
+        reference = np.array(results['deepface']['predictions'])
+        print(f"   {len(reference)} crops")
+        for name, result in results.items():
+            if name == 'deepface':
+                continue
+            predictions = np.array(result['predictions'])
+            same_top = np.mean(predictions.argmax(axis=1) == reference.argmax(axis=1)) * 100
+            print(f"   {name:<9} same top emotion {same_top:5.1f}%  "
+                  f"max probability difference {np.abs(predictions - reference).max():.2e}")
+
+    print("\n" + "=" * 60)
+    print("Benchmark complete!")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--child':
+        run_child(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else '', (sys.argv[4] if len(sys.argv) > 4 else '') or None)
+    else:
+        main()
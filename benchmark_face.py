@@ -0,0 +1,222 @@
+"""
+Benchmark script for the face emotion detector
+Run with: python benchmark_face.py [image_dir]
+Without an image directory synthetic frames are used; they only exercise
+the code paths, so pass a directory of photos with faces for real numbers.
+An optional boxes.json in that directory ({"photo.jpg": [[x, y, w, h], ...]})
+gives true face boxes for the recall columns.
+"""
+import sys
+import io
+import os
+import base64
+import contextlib
+import json
+import threading
+import time
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+import cv2
+import numpy as np
+
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+from face_emotion_detector import FaceEmotionDetector
+from inference_scheduler import MicroBatchScheduler
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def load_images(image_dir=None, count=5):
+    """Load images from image_dir, or build synthetic 640x480 frames"""
+    if image_dir:
+        images = []
+        for name in sorted(os.listdir(image_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                image = cv2.imread(os.path.join(image_dir, name))
+                if image is not None:
+                    images.append((name, image))
+        return images
+
+    rng = np.random.default_rng(0)
+    images = []
+    for i in range(count):
+        frame = rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)
+        frame = cv2.GaussianBlur(frame, (15, 15), 0)
+        cv2.ellipse(frame, (320, 240), (90, 120), 0, 0, 360, (170, 190, 220), -1)
+        images.append((f'synthetic_{i}', frame))
+    return images
+
+
+def box_recall(reference, found, min_iou=0.3):
+    """Fraction of reference boxes matched by a found box with IoU >= min_iou"""
+    if not len(reference):
+        return None
+    matched = 0
+    for rx, ry, rw, rh in reference:
+        for fx, fy, fw, fh in found:
+            overlap_w = min(rx + rw, fx + fw) - max(rx, fx)
+            overlap_h = min(ry + rh, fy + fh) - max(ry, fy)
+            if overlap_w > 0 and overlap_h > 0:
+                overlap = overlap_w * overlap_h
+                if overlap / (rw * rh + fw * fh - overlap) >= min_iou:
+                    matched += 1
+                    break
+    return matched / len(reference)
+
+
+def time_per_frame(func, images, repeat=3):
+    """Return the mean latency of func(image) over all images in milliseconds"""
+    with contextlib.redirect_stdout(io.StringIO()):  # Detector logs every call
+        func(images[0][1])  # warm-up
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for _, image in images:
+                func(image)
+    return (time.perf_counter() - start) / (repeat * len(images)) * 1000
+
+
+print("=" * 60)
+print("Face Emotion Detector Benchmark")
+print("=" * 60)
+
+images = load_images(sys.argv[1] if len(sys.argv) > 1 else None)
+if not images:
+    print("No images found")
+    sys.exit(1)
+print(f"Images: {len(images)} ({'synthetic' if len(sys.argv) < 2 else sys.argv[1]})")
+
+with contextlib.redirect_stdout(io.StringIO()):
+    detector = FaceEmotionDetector()
+    detector.warm_up()
+
+if not detector.deepface_available:
+    print("DeepFace is not installed, nothing to benchmark")
+    sys.exit(1)
+
+print("\n1. Pipeline per-frame latency")
+results = {}
+for pipeline in FaceEmotionDetector.PIPELINES:
+    detector.pipeline = pipeline
+    with contextlib.redirect_stdout(io.StringIO()):
+        results[pipeline] = [detector.detect_from_array(image) for _, image in images]
+    latency = time_per_frame(detector.detect_from_array, images)
+    methods = sorted({result.get('method', 'error') for result in results[pipeline]})
+    print(f"   {pipeline:<10} {latency:8.1f} ms/frame  (methods: {', '.join(methods)})")
+
+agree = sum(a.get('emotion') == b.get('emotion') for a, b in zip(results['crop'], results['deepface']))
+print(f"   Same dominant emotion in both pipelines: {agree}/{len(images)}")
+
+print("\n2. Concurrent crop inference (8 threads x 25 faces)")
+faces = detector._preprocess_faces(
+    np.full((480, 640), 128, dtype=np.uint8), [(220, 140, 200, 200)]
+)
+
+
+def hammer():
+    for _ in range(25):
+        detector._predict_emotions(faces)
+
+
+for batch_size in (1, 16):
+    if detector.scheduler:
+        detector.scheduler.close()
+    detector.scheduler = MicroBatchScheduler(detector._run_emotion_model, batch_size, 10) if batch_size > 1 else None
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    label = f"batch {batch_size}" if batch_size > 1 else "unbatched"
+    mean_batch = detector.scheduler.stats()['batch_size']['mean'] if detector.scheduler else 1
+    print(f"   {label:<10} {200 / elapsed:8.1f} faces/s  (mean batch {mean_batch})")
+
+print("\n3. Face finding at detection resolution caps (frames scaled to 1920px wide)")
+grays = []
+for _, image in images:
+    height, width = image.shape[:2]
+    full_hd = cv2.resize(image, (1920, round(height * 1920 / width)))
+    grays.append(cv2.cvtColor(full_hd, cv2.COLOR_BGR2GRAY))
+
+truth_path = os.path.join(sys.argv[1], 'boxes.json') if len(sys.argv) > 1 else None
+if truth_path and os.path.exists(truth_path):
+    with open(truth_path) as f:
+        truth = json.load(f)
+    reference = []
+    for (name, image), gray in zip(images, grays):
+        scale = gray.shape[1] / image.shape[1]
+        reference.append([[round(v * scale) for v in box] for box in truth.get(name, [])])
+    print(f"   Reference: {sum(len(boxes) for boxes in reference)} true faces from boxes.json")
+else:
+    # Without ground truth, full-resolution detections (including false positives) are the reference
+    detector.detect_max_side = 0
+    reference = [detector.find_faces(gray) for gray in grays]
+    print(f"   Reference: {sum(len(boxes) for boxes in reference)} faces found at full resolution")
+
+for cap in (0, 1280, 960, 640, 480, 320):
+    detector.detect_max_side = cap
+    start = time.perf_counter()
+    found = [detector.find_faces(gray) for gray in grays]
+    latency = (time.perf_counter() - start) / len(grays) * 1000
+    recalls = [r for r in map(box_recall, reference, found) if r is not None]
+    recall = f"{sum(recalls) / len(recalls):.0%}" if recalls else "n/a"
+    label = f"cap {cap}px" if cap else "full"
+    print(f"   {label:<10} {latency:8.1f} ms/frame  recall {recall:>4}  "
+          f"faces {sum(len(boxes) for boxes in found)}")
+
+print("\n4. Upload formats: bytes on the wire and server decode time (JPEG q80)")
+
+
+def parse_json(request):
+    return detector.decode_base64_image(request.get_json()['image'])
+
+
+def parse_multipart(request):
+    return detector.decode_image_bytes(request.files['image'].read())
+
+
+def parse_raw(request):
+    return detector.decode_image_bytes(request.get_data(cache=False))
+
+
+for _, image in images[:3]:
+    jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes()
+    data_url = 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode()
+    uploads = (
+        ('json', parse_json, dict(json={'image': data_url})),
+        ('multipart', parse_multipart, dict(data={'image': (io.BytesIO(jpeg), 'frame.jpg', 'image/jpeg')})),
+        ('raw', parse_raw, dict(data=jpeg, content_type='image/jpeg'))
+    )
+    print(f"   {image.shape[1]}x{image.shape[0]} frame")
+    for label, parse, body in uploads:
+        environ = EnvironBuilder(method='POST', **body).get_environ()
+        wire_bytes = int(environ['CONTENT_LENGTH'])
+        payload = environ['wsgi.input'].read()
+        repeat = 30
+        start = time.perf_counter()
+        for _ in range(repeat):
+            environ['wsgi.input'] = io.BytesIO(payload)
+            parse(Request(environ))
+        latency = (time.perf_counter() - start) / repeat * 1000
+        print(f"     {label:<10} {wire_bytes:>9} bytes  {latency:6.2f} ms decode")
+
+print("\n5. Near-duplicate frame cache (same frame + sensor noise, 20 frames)")
+rng = np.random.default_rng(0)
+_, still = images[0]
+frames = [np.clip(still.astype(np.int16) + rng.integers(-3, 4, still.shape), 0, 255).astype(np.uint8)
+          for _ in range(20)]
+detector.pipeline = 'crop'
+for label, key in (('bypass', None), ('cached', 'benchmark')):
+    detector.frame_cache.clear()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        results = [detector.detect_from_array(frame, cache_key=key) for frame in frames]
+    latency = (time.perf_counter() - start) / len(frames) * 1000
+    hits = sum(result.get('cached', False) for result in results)
+    print(f"   {label:<10} {latency:8.1f} ms/frame  ({hits}/{len(frames)} from cache)")
+
+print("\n" + "=" * 60)
+print("Benchmark complete!")
@@ -0,0 +1,129 @@
+"""
+Benchmark: face detector backends (haar vs yunet vs ssd)
+Run with: python benchmark_face_detectors.py path/to/photos [--max-side 640]
+Runs every detector whose model is available over each photo and reports
+per-image latency and faces found, then per detector the latency spread
+and the fallback rate: the share of photos with no face, which the app
+sends to the slower DeepFace fallback. With a boxes.json next to the photos
+({"photo.jpg": [[x, y, w, h], ...]}) it also reports recall.
+"""
+import sys
+import io
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from face_detectors import DETECTORS, build_face_detector_backend
+
+REPEAT = 3
+
+
+def box_recall(reference, found, min_iou=0.3):
+    """Fraction of reference boxes matched by a found box with IoU >= min_iou"""
+    if not len(reference):
+        return None
+    matched = 0
+    for rx, ry, rw, rh in reference:
+        for fx, fy, fw, fh in found:
+            overlap_w = min(rx + rw, fx + fw) - max(rx, fx)
+            overlap_h = min(ry + rh, fy + fh) - max(ry, fy)
+            if overlap_w > 0 and overlap_h > 0:
+                overlap = overlap_w * overlap_h
+                if overlap / (rw * rh + fw * fh - overlap) >= min_iou:
+                    matched += 1
+                    break
+    return matched / len(reference)
+
+
+def load_images(image_dir):
+    """(name, BGR image) for every readable image in image_dir"""
+    images = []
+    for name in sorted(os.listdir(image_dir)):
+        image = cv2.imread(os.path.join(image_dir, name))
+        if image is not None:
+            images.append((name, image))
+    return images
+
+
+def run_detector(detector, images):
+    """Best-of-REPEAT latency (ms) and boxes for each image"""
+    results = []
+    for _, image in images:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        detector.find(gray, image)  # warm-up (first DNN call allocates buffers)
+        timings = []
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            faces = detector.find(gray, image)
+            timings.append((time.perf_counter() - start) * 1000)
+        results.append((min(timings), faces))
+    return results
+
+
+def main():
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    parser = argparse.ArgumentParser(description='Compare face detector backends on a photo directory')
+    parser.add_argument('images', help='Directory of photos')
+    parser.add_argument('--max-side', type=int, default=640,
+                        help='Longest side faces are searched in, as FACE_DETECT_MAX_SIDE (default 640)')
+    parser.add_argument('--model', action='append', default=[], metavar='NAME=PATH',
+                        help='Model file for a detector, e.g. yunet=models/yunet.onnx (repeatable)')
+    args = parser.parse_args()
+    model_paths = dict(option.split('=', 1) for option in args.model)
+
+    print("=" * 60)
+    print("Face Detector Benchmark")
+    print("=" * 60)
+
+    images = load_images(args.images)
+    if not images:
+        raise SystemExit(f"No images found in {args.images}")
+    truth_path = os.path.join(args.images, 'boxes.json')
+    truth = None
+    if os.path.exists(truth_path):
+        with open(truth_path) as f:
+            truth = json.load(f)
+    print(f"Images: {len(images)}, detection cap: {args.max_side or 'full'}px, "
+          f"ground truth: {'boxes.json' if truth else 'none'}")
+
+    detectors = {}
+    for name in DETECTORS:
+        try:
+            detectors[name] = build_face_detector_backend(name, model_paths.get(name), max_side=args.max_side)
+        except (FileNotFoundError, cv2.error) as e:
+            print(f"   [SKIP] {name}: {e}")
+    results = {name: run_detector(detector, images) for name, detector in detectors.items()}
+
+    print(f"\n1. Per image (best of {REPEAT}): latency and faces found")
+    width = max(len(name) for name, _ in images)
+    print("   " + "image".ljust(width) + "".join(f"{name:>18}" for name in results))
+    for index, (image_name, image) in enumerate(images):
+        cells = "".join(f"{results[name][index][0]:10.1f}ms {len(results[name][index][1]):>3}f"
+                        for name in results)
+        print(f"   {image_name:<{width}}{cells}")
+
+    print("\n2. Summary per detector")
+    for name, detector_results in results.items():
+        latencies = np.array([latency for latency, _ in detector_results])
+        found = [faces for _, faces in detector_results]
+        fallback = sum(1 for faces in found if not len(faces)) / len(found)
+        line = (f"   {name:<6} load {detectors[name].load_seconds:6.3f}s  "
+                f"p50 {np.percentile(latencies, 50):7.1f}ms  p95 {np.percentile(latencies, 95):7.1f}ms  "
+                f"faces {sum(len(faces) for faces in found):>4}  fallback rate {fallback:5.1%}")
+        if truth:
+            recalls = [box_recall(truth.get(image_name, []), faces)
+                       for (image_name, _), faces in zip(images, found)]
+            recalls = [recall for recall in recalls if recall is not None]
+            line += f"  recall {sum(recalls) / len(recalls):.0%}" if recalls else "  recall n/a"
+        print(line)
+
+    print("\n" + "=" * 60)
+    print("Benchmark complete!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark script for the text emotion detector
+Run with: python benchmark_text.py
+"""
+import sys
+import io
+import re
+import time
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+from emotion_detector import EmotionDetector, regex_tokenize
+
+SHORT_TEXT = "I am so happy and excited but also really fed up today"
+LONG_TEXT = (
+    "Honestly I was not worried at first, but after the meeting I felt worn out, "
+    "anxious and a little on edge. The team was thrilled about the launch, yet I am "
+    "frustrated that nobody noticed how tired everyone is. What a surprise! "
+) * 30
+LONG_TEXT = LONG_TEXT[:5000]
+
+
+def time_per_call(func, arg, repeat=200):
+    """Return the mean latency of func(arg) in microseconds"""
+    func(arg)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(arg)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def linear_scan_keywords(detector, words):
+    """Reference implementation: scan every emotion list for every token"""
+    emotion_scores = {emotion: 0 for emotion in detector.emotion_keywords.keys()}
+    for i, word in enumerate(words):
+        for emotion, keywords in detector.emotion_keywords.items():
+            if word in keywords:
+                score = 1.0
+                if i > 0 and words[i-1] in detector.intensifiers:
+                    score *= 1.5
+                if i > 0 and words[i-1] in detector.negations:
+                    score *= -0.5
+                emotion_scores[emotion] += score
+    return emotion_scores
+
+
+def simple_tokens(text):
+    """Whitespace tokens of the cleaned text (no tokenizer data required)"""
+    text = re.sub(r'[^a-zA-Z0-9\s\.\!\?]', '', text.lower())
+    return re.findall(r"[a-z0-9]+|[\.\!\?]", text)
+
+
+print("=" * 60)
+print("Text Emotion Detector Benchmark")
+print("=" * 60)
+
+detector = EmotionDetector()
+
+print("\n1. Keyword scoring (per call)")
+for label, text in (("10 words", SHORT_TEXT), ("5000 chars", LONG_TEXT)):
+    words = simple_tokens(text)
+    linear = time_per_call(lambda w: linear_scan_keywords(detector, w), words)
+    indexed = time_per_call(detector.detect_emotion_keywords, words)
+    print(f"   {label:10s} ({len(words):4d} tokens): "
+          f"linear scan {linear:9.1f} us | index {indexed:9.1f} us | "
+          f"speedup {linear / indexed:5.1f}x")
+
+print("\n2. Full detect() (per call)")
+for label, text in (("10 words", SHORT_TEXT), ("5000 chars", LONG_TEXT)):
+    try:
+        latency = time_per_call(detector.detect, text, repeat=50)
+        print(f"   {label:10s}: {latency:9.1f} us")
+    except LookupError:
+        print("   [SKIPPED] NLTK tokenizer data (punkt) is not installed")
+        break
+
+print("\n3. Sentiment scoring (per call)")
+fast_detector = EmotionDetector(sentiment_mode='fast')
+for label, text in (("10 words", SHORT_TEXT), ("5000 chars", LONG_TEXT)):
+    processed_text = re.sub(r'[^a-zA-Z0-9\s\.\!\?]', '', text.lower())
+    words = simple_tokens(text)
+    textblob = time_per_call(detector.calculate_sentiment, processed_text, repeat=50)
+    fast = time_per_call(lambda w: fast_detector.calculate_sentiment(processed_text, w), words)
+    print(f"   {label:10s}: TextBlob {textblob:9.1f} us | fast {fast:9.1f} us | "
+          f"speedup {textblob / fast:5.1f}x")
+
+print("\n4. Tokenization (per call)")
+try:
+    import nltk
+    try:
+        nltk.data.find('tokenizers/punkt_tab')
+        reference, reference_name = nltk.word_tokenize, "nltk"
+    except LookupError:
+        # Without punkt data only the Treebank word tokenizer can run
+        from nltk.tokenize import NLTKWordTokenizer
+        reference, reference_name = NLTKWordTokenizer().tokenize, "treebank"
+except ImportError:
+    reference, reference_name = None, None
+
+for label, text in (("10 words", SHORT_TEXT), ("5000 chars", LONG_TEXT)):
+    normalized = detector.normalize_text(text)
+    regex = time_per_call(regex_tokenize, normalized)
+    if reference is None:
+        print(f"   {label:10s}: regex {regex:9.1f} us (NLTK not installed)")
+        continue
+    baseline = time_per_call(reference, normalized, repeat=50)
+    print(f"   {label:10s}: {reference_name} {baseline:9.1f} us | regex {regex:9.1f} us | "
+          f"speedup {baseline / regex:5.1f}x")
+
+print("\n" + "=" * 60)
+print("Benchmark complete!")
@@ -0,0 +1,129 @@
+"""
+Benchmark: text detection latency while face inference is saturated
+Run with: python benchmark_workers.py [image_dir]
+Compares face detection in the web process with the FaceWorkerPool, which
+runs it in worker processes. Worker processes re-import this script, so
+everything runs under the __main__ guard.
+"""
+import sys
+import io
+import contextlib
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+FACE_THREADS = 8
+TEXT_CALLS = 300
+TEXT_INTERVAL = 0.01  # Seconds between text requests
+TEXTS = [
+    "I am so happy and excited but also really fed up today",
+    "Honestly I was not worried at first, but after the meeting I felt worn out",
+    "The team was thrilled about the launch, yet I am frustrated that nobody noticed",
+    "What a surprise! I did not expect to feel this calm about it"
+]
+
+
+def load_images(image_dir=None):
+    """Load images from image_dir, or build synthetic 640x480 frames with a face-like blob"""
+    if image_dir:
+        return [(name, cv2.imread(os.path.join(image_dir, name))) for name in sorted(os.listdir(image_dir))
+                if name.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.webp'))]
+
+    rng = np.random.default_rng(0)
+    frame = cv2.GaussianBlur(rng.integers(0, 256, (480, 640, 3), dtype=np.uint8), (15, 15), 0)
+    cv2.ellipse(frame, (320, 240), (90, 120), 0, 0, 360, (170, 190, 220), -1)
+    return [('synthetic', frame)]
+
+
+def text_latencies(detector):
+    """Latency of each text detection in milliseconds"""
+    latencies = []
+    for i in range(TEXT_CALLS):
+        text = f"{TEXTS[i % len(TEXTS)]} #{i}"  # Unique texts: no cache hits
+        start = time.perf_counter()
+        detector.detect(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(TEXT_INTERVAL)
+    return np.array(latencies)
+
+
+def under_face_load(face_detector, images, text_detector):
+    """Run text detections while FACE_THREADS threads keep face detection busy"""
+    stop = threading.Event()
+    frames = [0]
+
+    def hammer(offset):
+        index = offset
+        while not stop.is_set():
+            face_detector.detect_from_array(images[index % len(images)][1])
+            frames[0] += 1
+            index += 1
+
+    threads = [threading.Thread(target=hammer, args=(i,)) for i in range(FACE_THREADS)]
+    for thread in threads:
+        thread.start()
+    time.sleep(1.0)  # Let the load reach a steady state
+
+    start = time.perf_counter()
+    frames_before = frames[0]
+    latencies = text_latencies(text_detector)
+    elapsed = time.perf_counter() - start
+    face_fps = (frames[0] - frames_before) / elapsed
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, face_fps
+
+
+def report(label, latencies, face_fps=None):
+    line = f"   {label:<28} text p50 {np.percentile(latencies, 50):6.2f}ms  p95 {np.percentile(latencies, 95):6.2f}ms"
+    if face_fps is not None:
+        line += f"  faces {face_fps:6.1f} frames/s"
+    print(line)
+
+
+def main():
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    from emotion_detector import EmotionDetector
+    from face_emotion_detector import FaceEmotionDetector
+    from face_worker_pool import FaceWorkerPool
+
+    print("=" * 60)
+    print("Face Worker Pool Benchmark")
+    print("=" * 60)
+
+    images = load_images(sys.argv[1] if len(sys.argv) > 1 else None)
+    text_detector = EmotionDetector(cache_size=0)
+    detector_kwargs = {'frame_cache_clients': 0}  # Every frame runs the model
+    print(f"Images: {len(images)}, face threads: {FACE_THREADS}, text calls: {TEXT_CALLS}, CPUs: {os.cpu_count()}")
+    print("(Worker processes log to the console; their output is not captured)")
+
+    print("\n1. Text latency without face load")
+    report("idle", text_latencies(text_detector))
+
+    print("\n2. Text latency with face inference saturated")
+    with contextlib.redirect_stdout(io.StringIO()):  # Detector logs every call
+        detector = FaceEmotionDetector(**detector_kwargs)
+        detector.warm_up()
+        in_process = under_face_load(detector, images, text_detector)
+        detector.scheduler.close()
+    report("face in web process", *in_process)
+
+    for size, niceness in ((1, 0), (2, 0), (2, 10)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            pool = FaceWorkerPool(size, detector_kwargs, niceness=niceness)
+            pool.warm_up()
+            pooled = under_face_load(pool, images, text_detector)
+            pool.close()
+        report(f"{size} worker(s), niceness {niceness}", *pooled)
+
+    print("\n" + "=" * 60)
+    print("Benchmark complete!")
+
+
+if __name__ == '__main__':
+    main()
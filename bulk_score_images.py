@@ -0,0 +1,326 @@
+"""
+Offline bulk facial emotion scoring of an image archive
+Walks a directory tree, decodes images and finds faces on a thread pool,
+runs the faces of many images through the emotion model in shared batches
+and writes one NDJSON or CSV result per image in path order. The output
+file doubles as the checkpoint: --resume skips images already in it.
+
+Usage:
+    python bulk_score_images.py photos/ -o results.ndjson
+    python bulk_score_images.py photos/ -o results.csv --format csv --backend onnx
+    python bulk_score_images.py photos/ -o results.ndjson --resume --db emotion_data.db
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+import cv2
+import numpy as np
+
+from face_emotion_detector import ENHANCED_LABELS
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff')
+
+CSV_FIELDS = ['path', 'success', 'emotion', 'confidence', 'faces_detected', 'method', 'error'] + ENHANCED_LABELS
+
+STAGES = ('decode', 'find_faces', 'model', 'fallback', 'write', 'db')
+
+
+def find_images(root):
+    """
+    Walk a directory tree in a stable (sorted) order
+    Yields:
+        str: image path relative to root, with '/' separators
+    """
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                relative = os.path.relpath(os.path.join(directory, name), root)
+                yield relative.replace(os.sep, '/')
+
+
+def read_checkpoint(path, output_format):
+    """
+    Paths already scored in an existing output file
+    A line cut short by an interruption is truncated away so appending
+    resumes on a clean line
+    Returns: set of relative image paths
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'rb+') as handle:
+        data = handle.read()
+        complete = data.rfind(b'\n') + 1
+        if complete < len(data):
+            handle.truncate(complete)
+    lines = data[:complete].decode('utf-8').splitlines()
+    if output_format == 'csv':
+        return {row['path'] for row in csv.DictReader(lines)}
+    return {json.loads(line)['path'] for line in lines if line.strip()}
+
+
+def chunked(iterable, size):
+    """Split an iterable into lists of at most size items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ImageScorer:
+    """Scores chunks of images with one FaceEmotionDetector"""
+
+    def __init__(self, detector, root, batch_size=32):
+        """
+        Args:
+            detector: Loaded FaceEmotionDetector
+            root: Directory image paths are relative to
+            batch_size: Max face crops per emotion model call
+        """
+        self.detector = detector
+        self.root = root
+        self.batch_size = max(1, int(batch_size))
+        # Crops go straight to the model unless DeepFace must look at the whole frame
+        self.crop_model = detector.emotion_backend is not None and detector.pipeline == 'crop'
+        self.timings = dict.fromkeys(STAGES, 0.0)
+        self.faces = 0
+
+    def load(self, path):
+        """
+        Decode one image and find its faces (runs on the decode thread pool)
+        Only the face crops are kept unless the image needs the fallback path
+        Returns: dict with the path and either crops and boxes, the image, or an error
+        """
+        start = time.perf_counter()
+        image = cv2.imread(os.path.join(self.root, path))
+        decoded = time.perf_counter()
+        if image is None:
+            return {'path': path, 'error': 'Failed to load image file', 'decode': decoded - start, 'find_faces': 0.0}
+
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        faces = self.detector.find_faces(gray, image)
+        if not len(faces) and self.crop_model and not self.detector.deepface_available:
+            # What DeepFace does without a face: classify the whole frame
+            faces = np.array([[0, 0, gray.shape[1], gray.shape[0]]])
+        loaded = {'path': path, 'decode': decoded - start}
+        if len(faces) and self.crop_model:
+            loaded.update(boxes=faces, crops=self.detector.crop_faces(gray, faces))
+        else:
+            loaded['image'] = image
+        loaded['find_faces'] = time.perf_counter() - decoded
+        return loaded
+
+    def score(self, loaded):
+        """
+        Score a chunk of loaded images: their crops share model batches
+        Returns: detection result dicts in chunk order
+        """
+        for item in loaded:
+            self.timings['decode'] += item['decode']
+            self.timings['find_faces'] += item['find_faces']
+
+        start = time.perf_counter()
+        with_crops = [item for item in loaded if 'crops' in item]
+        scored = self.detector.detect_from_crops([item['crops'] for item in with_crops],
+                                                 [item['boxes'] for item in with_crops], self.batch_size)
+        results = {item['path']: result for item, result in zip(with_crops, scored)}
+        self.timings['model'] += time.perf_counter() - start
+
+        # No face for the crop model (DeepFace looks at the whole frame) or no model at all
+        start = time.perf_counter()
+        for item in loaded:
+            if 'image' in item:
+                result = self.detector.detect_from_array(item['image'])
+                result.pop('cached', None)  # No frame cache in bulk scoring
+                results[item['path']] = result
+            elif 'error' in item:
+                results[item['path']] = {'success': False, 'error': item['error']}
+        self.timings['fallback'] += time.perf_counter() - start
+
+        ordered = [results[item['path']] for item in loaded]
+        self.faces += sum(result.get('faces_detected', 0) for result in ordered if result.get('success'))
+        return ordered
+
+
+def output_record(path, result, output_format):
+    """NDJSON object or CSV row for one image result"""
+    if output_format == 'csv':
+        row = {'path': path, 'success': bool(result.get('success')), 'error': result.get('error', '')}
+        if row['success']:
+            row.update(result['all_emotions'])
+            row.update(emotion=result['emotion'], confidence=result['confidence'],
+                       faces_detected=result.get('faces_detected', 0), method=result.get('method', ''))
+        return row
+    record = {'path': path}
+    record.update(result)
+    return record
+
+
+def db_records(path, result, timestamp):
+    """Database records for one image, one per detected face"""
+    faces = result.get('faces') or [result]
+    return [{
+        'text': f"Image {path}" + (f" (face {index} of {len(faces)})" if len(faces) > 1 else ''),
+        'emotion': face['emotion'],
+        'confidence': face['confidence'],
+        'all_emotions': face['all_emotions'],
+        'type': 'face',
+        'faces_detected': result.get('faces_detected', 1),
+        'method': 'bulk',
+        'timestamp': timestamp
+    } for index, face in enumerate(faces, 1)]
+
+
+def score_directory(detector, root, output, output_format='ndjson', done=frozenset(), threads=4,
+                    chunk_size=64, batch_size=32, db=None):
+    """
+    Score every image under root and write results in path order
+    The decode pool works on the next chunk while the model scores the
+    current one; at most 2 chunks are in memory at a time.
+    Args:
+        detector: Loaded FaceEmotionDetector
+        root: Directory to walk
+        output: Writable text file, already positioned for appending
+        output_format: 'ndjson' or 'csv'
+        done: Relative paths to skip (from read_checkpoint)
+        threads: Decode and face-finding threads
+        chunk_size: Images per chunk
+        batch_size: Max face crops per emotion model call
+        db: Optional EmotionDatabase to bulk-load results into
+    Returns:
+        dict: image and face counts, elapsed seconds, throughput and per-stage seconds
+    """
+    scorer = ImageScorer(detector, root, batch_size)
+    writer = None
+    if output_format == 'csv':
+        writer = csv.DictWriter(output, fieldnames=CSV_FIELDS)
+        if output.tell() == 0:
+            writer.writeheader()
+
+    images = failed = skipped = 0
+    start = time.perf_counter()
+
+    def pending_paths():
+        nonlocal skipped
+        for path in find_images(root):
+            if path in done:
+                skipped += 1
+            else:
+                yield path
+
+    with ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix='image-decode') as pool:
+        pending = deque()
+
+        def write_oldest():
+            nonlocal images, failed
+            chunk, futures = pending.popleft()
+            results = scorer.score([future.result() for future in futures])
+            timestamp = datetime.now().isoformat()
+
+            # Database first: a crash before the output is flushed rescores the chunk on resume
+            stage = time.perf_counter()
+            if db is not None:
+                db.add_emotions([record for path, result in zip(chunk, results) if result.get('success')
+                                 for record in db_records(path, result, timestamp)])
+            scorer.timings['db'] += time.perf_counter() - stage
+
+            stage = time.perf_counter()
+            for path, result in zip(chunk, results):
+                record = output_record(path, result, output_format)
+                if writer is not None:
+                    writer.writerow(record)
+                else:
+                    output.write(json.dumps(record) + '\n')
+                images += 1
+                failed += not result.get('success')
+            output.flush()  # The checkpoint: everything written so far survives an interruption
+            scorer.timings['write'] += time.perf_counter() - stage
+
+        for chunk in chunked(pending_paths(), chunk_size):
+            pending.append((chunk, [pool.submit(scorer.load, path) for path in chunk]))
+            if len(pending) >= 2:
+                write_oldest()
+
+        while pending:
+            write_oldest()
+
+    elapsed = time.perf_counter() - start
+    return {
+        'images': images,
+        'failed': failed,
+        'skipped': skipped,
+        'faces': scorer.faces,
+        'elapsed': round(elapsed, 3),
+        'images_per_second': round(images / elapsed, 1) if elapsed > 0 else 0.0,
+        'faces_per_second': round(scorer.faces / elapsed, 1) if elapsed > 0 else 0.0,
+        'stage_seconds': {stage: round(seconds, 3) for stage, seconds in scorer.timings.items()}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk facial emotion scoring of an image directory tree')
+    parser.add_argument('root', help='Directory to walk for images')
+    parser.add_argument('-o', '--output', default='-', help="Output file ('-' for stdout)")
+    parser.add_argument('--format', choices=('ndjson', 'csv'), default='ndjson', help='Output format (default: ndjson)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip images already in the output file and append to it')
+    parser.add_argument('--threads', type=int, default=4, help='Decode and face-finding threads (default: 4)')
+    parser.add_argument('--chunk-size', type=int, default=64, help='Images per chunk (default: 64)')
+    parser.add_argument('--batch-size', type=int, default=32, help='Max faces per emotion model call (default: 32)')
+    parser.add_argument('--backend', default='deepface', help='Emotion model backend (see FACE_BACKEND)')
+    parser.add_argument('--model-path', default=None, help='Exported model for the onnx/opencv backends')
+    parser.add_argument('--quantized', action='store_true', help='Use the int8 model (onnx/opencv backends)')
+    parser.add_argument('--face-detector', default='haar', help='Face detector backend (see FACE_DETECTOR)')
+    parser.add_argument('--db', default=None, help='Also bulk-load results into this SQLite database')
+    parser.add_argument('--verbose', action='store_true', help='Show detector log lines on stderr')
+    args = parser.parse_args()
+
+    if args.resume and args.output == '-':
+        parser.error('--resume needs an output file (-o)')
+    done = read_checkpoint(args.output, args.format) if args.resume else set()
+    if args.output == '-':
+        output = sys.stdout
+    else:
+        output = open(args.output, 'a' if args.resume else 'w', newline='' if args.format == 'csv' else None,
+                      encoding='utf-8')
+
+    # The detector logs every face: keep that out of results written to stdout
+    log = sys.stderr if args.verbose else open(os.devnull, 'w')
+    with contextlib.redirect_stdout(log):
+        from face_emotion_detector import FaceEmotionDetector
+        detector = FaceEmotionDetector(backend=args.backend, model_path=args.model_path, quantized=args.quantized,
+                                       face_detector=args.face_detector, batch_size=1, frame_cache_clients=0)
+        db = None
+        if args.db:
+            from database import EmotionDatabase
+            db = EmotionDatabase(args.db)
+        try:
+            stats = score_directory(detector, args.root, output, args.format, done=done, threads=args.threads,
+                                    chunk_size=args.chunk_size, batch_size=args.batch_size, db=db)
+        finally:
+            if db is not None:
+                db.close()  # Writes anything still queued
+            if args.output != '-':
+                output.close()
+
+    print(f"[BULK] Scored {stats['images']} images ({stats['failed']} failed, {stats['skipped']} already done) "
+          f"in {stats['elapsed']}s: {stats['images_per_second']} images/s, {stats['faces']} faces "
+          f"({stats['faces_per_second']} faces/s)", file=sys.stderr)
+    stages = stats['stage_seconds']
+    print("[BULK] Stage seconds (decode and find_faces summed over threads): " +
+          ", ".join(f"{stage} {stages[stage]}" for stage in STAGES), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
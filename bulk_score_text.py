@@ -0,0 +1,187 @@
+"""
+Offline bulk text emotion scoring
+Streams an input file through a pool of EmotionDetector processes and
+writes NDJSON results in input order
+
+Usage:
+    python bulk_score_text.py chats.txt -o results.ndjson
+    python bulk_score_text.py tickets.csv --format csv --column body --db emotion_data.db
+    python bulk_score_text.py logs.ndjson --format ndjson --field message --workers 8
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+from emotion_detector import EmotionDetector
+
+# Detector owned by each worker process
+_detector = None
+
+
+def _init_worker(sentiment_mode):
+    """Create the per-process detector"""
+    global _detector
+    _detector = EmotionDetector(sentiment_mode=sentiment_mode)
+
+
+def _score_chunk(texts):
+    """Score one chunk of texts in a worker process"""
+    return _detector.detect_batch(texts)
+
+
+def read_texts(path, input_format='lines', column=None, field=None):
+    """
+    Stream texts from an input file
+    Args:
+        path: Input file path ('-' for stdin)
+        input_format: 'lines', 'csv' or 'ndjson'
+        column: CSV column name holding the text
+        field: NDJSON field name holding the text
+    Yields:
+        str: one text per input row
+    """
+    handle = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+    try:
+        if input_format == 'csv':
+            for row in csv.DictReader(handle):
+                yield row.get(column) or ''
+        elif input_format == 'ndjson':
+            for line in handle:
+                if line.strip():
+                    yield str(json.loads(line).get(field) or '')
+        else:
+            for line in handle:
+                yield line.rstrip('\r\n')
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+def chunked(iterable, size):
+    """Split an iterable into lists of at most size items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def score_file(texts, output, workers=None, chunk_size=500, sentiment_mode='textblob',
+               db=None, include_text=False):
+    """
+    Score texts in parallel and write NDJSON results in input order
+    At most 2 chunks per worker are in flight, so memory stays constant
+    regardless of input size.
+    Args:
+        texts: Iterable of texts
+        output: Writable text file for NDJSON results
+        workers: Number of worker processes (default: CPU count)
+        chunk_size: Texts per task sent to a worker
+        sentiment_mode: EmotionDetector sentiment mode
+        db: Optional EmotionDatabase to bulk-load results into
+        include_text: Include the input text in each result
+    Returns:
+        dict: rows scored, elapsed seconds and rows per second
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+    rows = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(sentiment_mode,)) as pool:
+        pending = deque()
+
+        def write_oldest():
+            nonlocal rows
+            chunk, future = pending.popleft()
+            results = future.result()
+            timestamp = datetime.now().isoformat()
+
+            for text, result in zip(chunk, results):
+                record = {'row': rows}
+                if include_text:
+                    record['text'] = text
+                record.update(result)
+                output.write(json.dumps(record) + '\n')
+                rows += 1
+
+            if db is not None:
+                db.add_emotions([{
+                    'text': text,
+                    'emotion': result['emotion'],
+                    'confidence': result['confidence'],
+                    'all_emotions': result['all_emotions'],
+                    'sentiment_polarity': result['sentiment']['polarity'],
+                    'sentiment_subjectivity': result['sentiment']['subjectivity'],
+                    'type': 'text',
+                    'method': 'bulk',
+                    'timestamp': timestamp
+                } for text, result in zip(chunk, results) if text.strip()])
+
+        for chunk in chunked(texts, chunk_size):
+            pending.append((chunk, pool.submit(_score_chunk, chunk)))
+            if len(pending) >= max_in_flight:
+                write_oldest()
+
+        while pending:
+            write_oldest()
+
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'elapsed': round(elapsed, 3),
+        'rows_per_second': round(rows / elapsed, 1) if elapsed > 0 else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk text emotion scoring')
+    parser.add_argument('input', help="Input file ('-' for stdin)")
+    parser.add_argument('-o', '--output', default='-', help="NDJSON output file ('-' for stdout)")
+    parser.add_argument('--format', choices=('lines', 'csv', 'ndjson'), default='lines',
+                        help='Input format (default: lines)')
+    parser.add_argument('--column', default='text', help='CSV column with the text')
+    parser.add_argument('--field', default='text', help='NDJSON field with the text')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=500, help='Texts per worker task')
+    parser.add_argument('--sentiment-mode', choices=EmotionDetector.SENTIMENT_MODES,
+                        default='textblob', help='Sentiment scorer (default: textblob)')
+    parser.add_argument('--db', default=None, help='Also bulk-load results into this SQLite database')
+    parser.add_argument('--include-text', action='store_true', help='Copy input text into results')
+    args = parser.parse_args()
+
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+
+    # Keep log prints (e.g. from EmotionDatabase) out of NDJSON written to stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        db = None
+        if args.db:
+            from database import EmotionDatabase
+            db = EmotionDatabase(args.db)
+
+        texts = read_texts(args.input, args.format, column=args.column, field=args.field)
+        try:
+            stats = score_file(texts, output, workers=args.workers, chunk_size=args.chunk_size,
+                               sentiment_mode=args.sentiment_mode, db=db,
+                               include_text=args.include_text)
+        finally:
+            if args.output != '-':
+                output.close()
+
+    print(f"[BULK] Scored {stats['rows']} rows in {stats['elapsed']}s "
+          f"({stats['rows_per_second']} rows/s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
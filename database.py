@@ -1,23 +1,295 @@
 """
 Database module for AI Emotion Detection
 Uses SQLite to store emotion detection history
+Each thread keeps one connection, opened on first use with the configured
+pragmas (WAL journal by default, so readers never block the writer).
+With write_behind, inserts are queued and written in batches by a
+background thread instead of on the caller's critical path.
 """
+import atexit
+import queue
 import sqlite3
+import threading
+import time
 from datetime import datetime
 import json
 import os
 
+from metrics import Histogram
+
+INSERT_EMOTION_SQL = '''
+    INSERT INTO emotions (
+        text, emotion, confidence, all_emotions,
+        sentiment_polarity, sentiment_subjectivity,
+        detection_type, faces_detected, method, timestamp
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Accepted pragma values (they are interpolated into PRAGMA statements)
+JOURNAL_MODES = ('WAL', 'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY')
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+FLUSH_ROWS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500)
+FLUSH_MS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+# Queue marker: write what has been collected so far right away
+_FLUSH_NOW = object()
+
+# Longest a read waits for queued rows before it goes ahead without them (seconds)
+READ_FLUSH_TIMEOUT = 5.0
+
+
+class WriteBehindQueue:
+    """
+    Writes queued rows in batches on a daemon thread
+    A batch is written once flush_size rows are queued or the oldest row has
+    waited flush_interval seconds, whichever comes first
+    """
+    
+    def __init__(self, write_rows, flush_size=100, flush_interval=0.5, max_queue=10000):
+        """
+        Initialize the queue and start its writer thread
+        Args:
+            write_rows: Callable writing a list of rows in one transaction
+            flush_size: Write once this many rows are queued
+            flush_interval: Write once the oldest queued row has waited this long (seconds)
+            max_queue: Queued calls beyond this block the caller (backpressure)
+        """
+        self.write_rows = write_rows
+        self.flush_size = max(1, int(flush_size))
+        self.flush_interval = max(0.0, float(flush_interval))
+        self.max_queue = max(1, int(max_queue))
+        self.flush_rows = Histogram(FLUSH_ROWS_BUCKETS)
+        self.flush_ms = Histogram(FLUSH_MS_BUCKETS)
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        # Rows accepted and rows finished (written or failed), for depth and flush()
+        self._progress = threading.Condition()
+        self._queued = 0
+        self._finished = 0
+        self.written = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name='db-write-behind', daemon=True)
+        self._thread.start()
+    
+    def put(self, rows):
+        """Queue rows for writing; returns immediately unless the queue is full"""
+        with self._progress:
+            self._queued += len(rows)
+        self._queue.put((time.perf_counter(), rows))
+    
+    def flush(self, timeout=None):
+        """
+        Write everything queued so far now and wait for it
+        Returns: True once those rows are finished, False on timeout
+        """
+        with self._progress:
+            target = self._queued
+            if self._finished >= target:
+                return True
+        self._queue.put(_FLUSH_NOW)
+        with self._progress:
+            return self._progress.wait_for(lambda: self._finished >= target, timeout)
+    
+    def _collect(self):
+        """Block for the first rows, then gather more until full, timed out or flushed"""
+        first = self._queue.get()
+        while first is _FLUSH_NOW:
+            first = self._queue.get()
+        if first is None:
+            return None
+        
+        enqueued, rows = first
+        rows = list(rows)
+        deadline = enqueued + self.flush_interval
+        while len(rows) < self.flush_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _FLUSH_NOW:
+                break
+            if item is None:
+                # Write this batch, then stop
+                self._queue.put(None)
+                break
+            rows.extend(item[1])
+        return rows
+    
+    def _run(self):
+        """Writer loop: collect, write in one transaction (one retry), record metrics"""
+        while True:
+            rows = self._collect()
+            if rows is None:
+                return
+            
+            started = time.perf_counter()
+            for attempt in range(2):
+                try:
+                    self.write_rows(rows)
+                    written = True
+                    break
+                except Exception as e:
+                    written = False
+                    print(f"[DATABASE] Write-behind flush of {len(rows)} rows failed "
+                          f"(attempt {attempt + 1}): {e}")
+                    time.sleep(0.1)
+            self.flush_ms.observe((time.perf_counter() - started) * 1000)
+            self.flush_rows.observe(len(rows))
+            
+            with self._progress:
+                if written:
+                    self.written += len(rows)
+                else:
+                    self.failed += len(rows)
+                self._finished += len(rows)
+                self._progress.notify_all()
+    
+    def close(self):
+        """Write everything still queued, then stop the writer thread"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+    
+    def stats(self):
+        """Get settings, queue depth, row counts and flush histograms"""
+        with self._progress:
+            depth = self._queued - self._finished
+            written, failed = self.written, self.failed
+        return {
+            'flush_size': self.flush_size,
+            'flush_interval_ms': self.flush_interval * 1000,
+            'queue_depth': depth,
+            'rows_written': written,
+            'rows_failed': failed,
+            'flush_rows': self.flush_rows.snapshot(),
+            'flush_ms': self.flush_ms.snapshot()
+        }
+
+
 class EmotionDatabase:
     """Handles all database operations for emotion detection"""
     
-    def __init__(self, db_path='emotion_data.db'):
-        """Initialize database connection"""
+    def __init__(self, db_path='emotion_data.db', journal_mode='WAL', synchronous='NORMAL',
+                 mmap_size_mb=256, cache_size_mb=16, busy_timeout=5.0,
+                 write_behind=False, flush_size=100, flush_interval=0.5, max_queue=10000):
+        """
+        Initialize the database and this thread's connection
+        Args:
+            db_path: SQLite file
+            journal_mode: 'WAL' (readers and the writer do not block each
+                          other) or SQLite's default 'DELETE'
+            synchronous: 'NORMAL' (with WAL: durable across app crashes, the
+                         last commits may roll back on power loss) or 'FULL'
+            mmap_size_mb: Memory-mapped I/O window (0 disables it)
+            cache_size_mb: Page cache per connection
+            busy_timeout: Seconds a connection waits for a lock before failing
+            write_behind: Queue inserts and write them in batches on a
+                          background thread (add_emotion(..., sync=True)
+                          still writes right away and returns the row id)
+            flush_size: Write-behind batch size (rows)
+            flush_interval: Max seconds a queued row waits to be written
+            max_queue: Queued inserts beyond this make callers wait
+        """
+        if journal_mode.upper() not in JOURNAL_MODES:
+            raise ValueError(f"journal_mode must be one of {JOURNAL_MODES}")
+        if synchronous.upper() not in SYNCHRONOUS_MODES:
+            raise ValueError(f"synchronous must be one of {SYNCHRONOUS_MODES}")
         self.db_path = db_path
+        self.journal_mode = journal_mode.upper()
+        self.synchronous = synchronous.upper()
+        self.mmap_size = int(mmap_size_mb * 1024 * 1024)
+        self.cache_size_kb = int(cache_size_mb * 1024)
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        # Every open connection by owning thread, so close() and pruning can reach them
+        self._connections = {}
+        self._connections_lock = threading.Lock()
+        self._pid = os.getpid()
+        self._fork_lock = threading.Lock()
         self.init_database()
+        
+        self.write_queue = None
+        if write_behind:
+            self.write_queue = WriteBehindQueue(self._write_rows, flush_size, flush_interval, max_queue)
+            # Queued rows are written before the interpreter exits
+            atexit.register(self.close)
+    
+    def _check_fork(self):
+        """
+        After a fork (e.g. a preloading server), drop the parent's connections
+        and start this process's own write-behind thread: neither the
+        connections nor the writer thread carry over to the child
+        """
+        if self._pid == os.getpid():
+            return
+        with self._fork_lock:
+            if self._pid == os.getpid():
+                return
+            self._local, self._connections = threading.local(), {}
+            self._connections_lock = threading.Lock()
+            if self.write_queue is not None:
+                # Rows the parent had queued are the parent's to write
+                parent_queue = self.write_queue
+                self.write_queue = WriteBehindQueue(self._write_rows, parent_queue.flush_size,
+                                                    parent_queue.flush_interval, parent_queue.max_queue)
+            self._pid = os.getpid()
+    
+    def _connect(self):
+        """
+        This thread's connection, opened once with the configured pragmas
+        Connections of threads that have exited are closed when a new one opens
+        """
+        self._check_fork()
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        
+        # Only the owning thread uses a connection; close() may run elsewhere
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False)
+        conn.execute(f'PRAGMA journal_mode={self.journal_mode}')
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        conn.execute(f'PRAGMA mmap_size={self.mmap_size}')
+        conn.execute(f'PRAGMA cache_size={-self.cache_size_kb}')  # Negative: size in KiB
+        self._local.conn = conn
+        
+        with self._connections_lock:
+            for thread in [thread for thread in self._connections if not thread.is_alive()]:
+                self._connections.pop(thread).close()
+            self._connections[threading.current_thread()] = conn
+        return conn
+    
+    def close(self):
+        """
+        Write any queued rows, stop the write-behind thread and close every
+        thread's connection (the next call in a thread reopens its own and
+        writes synchronously)
+        """
+        self._check_fork()
+        if self.write_queue is not None:
+            self.write_queue.close()
+            self.write_queue = None
+        with self._connections_lock:
+            connections, self._connections = self._connections, {}
+        for conn in connections.values():
+            conn.close()
+        self._local = threading.local()
+    
+    def connection_info(self):
+        """Open connections and the pragmas they run with"""
+        with self._connections_lock:
+            open_connections = len(self._connections)
+        return {
+            'connections': open_connections,
+            'journal_mode': self._connect().execute('PRAGMA journal_mode').fetchone()[0],
+            'synchronous': self.synchronous,
+            'mmap_size_mb': round(self.mmap_size / (1024 * 1024), 1),
+            'cache_size_mb': round(self.cache_size_kb / 1024, 1)
+        }
     
     def init_database(self):
         """Create tables if they don't exist"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         # Create emotions table
@@ -55,27 +327,11 @@ class EmotionDatabase:
         ''')
         
         conn.commit()
-        conn.close()
-        print(f"[DATABASE] Initialized at {self.db_path}")
+        print(f"[DATABASE] Initialized at {self.db_path} ({self.journal_mode} journal, synchronous={self.synchronous})")
     
-    def add_emotion(self, data):
-        """
-        Add emotion detection result to database
-        Args:
-            data: dict with emotion data
-        Returns:
-            int: ID of inserted record
-        """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO emotions (
-                text, emotion, confidence, all_emotions,
-                sentiment_polarity, sentiment_subjectivity,
-                detection_type, faces_detected, method, timestamp
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+    def _emotion_row(self, data):
+        """Convert an emotion data dict into an emotions table row"""
+        return (
             data.get('text', ''),
             data['emotion'],
             data['confidence'],
@@ -86,15 +342,77 @@ class EmotionDatabase:
             data.get('faces_detected'),
             data.get('method'),
             data.get('timestamp', datetime.now().isoformat())
-        ))
+        )
+    
+    def _write_rows(self, rows):
+        """Insert rows in one transaction on this thread's connection"""
+        with self._connect() as conn:
+            conn.executemany(INSERT_EMOTION_SQL, rows)
+    
+    def flush(self, timeout=None):
+        """
+        Write queued rows now and wait for them (no-op without write-behind)
+        Returns: False if timeout seconds passed first
+        """
+        self._check_fork()
+        return self.write_queue.flush(timeout) if self.write_queue is not None else True
+    
+    def _flush_before_read(self):
+        """Write queued rows so a read sees every accepted write (bounded by READ_FLUSH_TIMEOUT)"""
+        if not self.flush(READ_FLUSH_TIMEOUT):
+            print(f"[DATABASE] Queued rows not written within {READ_FLUSH_TIMEOUT}s; reading without them")
+    
+    def write_queue_stats(self):
+        """Write-behind queue depth, row counts and flush latency (None when disabled)"""
+        self._check_fork()
+        return self.write_queue.stats() if self.write_queue is not None else None
+    
+    def add_emotion(self, data, sync=False):
+        """
+        Add emotion detection result to database
+        Args:
+            data: dict with emotion data
+            sync: Write now even with write-behind enabled
+        Returns:
+            int: ID of inserted record (None when queued for write-behind)
+        """
+        self._check_fork()
+        if self.write_queue is not None and not sync:
+            self.write_queue.put([self._emotion_row(data)])
+            print(f"[DATABASE] Queued emotion record: {data['emotion']}")
+            return None
         
-        record_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        conn = self._connect()
+        with conn:
+            record_id = conn.execute(INSERT_EMOTION_SQL, self._emotion_row(data)).lastrowid
         
         print(f"[DATABASE] Added emotion record #{record_id}: {data['emotion']}")
         return record_id
     
+    def add_emotions(self, records, sync=False):
+        """
+        Add many emotion detection results in a single transaction
+        Args:
+            records: list of dicts with emotion data
+            sync: Write now even with write-behind enabled
+        Returns:
+            int: Number of inserted (or queued) records
+        """
+        rows = [self._emotion_row(data) for data in records]
+        if not rows:
+            return 0
+        self._check_fork()
+        
+        if self.write_queue is not None and not sync:
+            self.write_queue.put(rows)
+            print(f"[DATABASE] Queued {len(rows)} emotion records")
+            return len(rows)
+        
+        self._write_rows(rows)
+        
+        print(f"[DATABASE] Added {len(rows)} emotion records")
+        return len(rows)
+    
     def get_recent_history(self, limit=10):
         """
         Get recent emotion detection history
@@ -103,7 +421,8 @@ class EmotionDatabase:
         Returns:
             list: Recent emotion records
         """
-        conn = sqlite3.connect(self.db_path)
+        self._flush_before_read()
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -116,7 +435,6 @@ class EmotionDatabase:
         ''', (limit,))
         
         rows = cursor.fetchall()
-        conn.close()
         
         history = []
         for row in rows:
@@ -142,7 +460,8 @@ class EmotionDatabase:
         Returns:
             dict: Statistics about emotions
         """
-        conn = sqlite3.connect(self.db_path)
+        self._flush_before_read()
+        conn = self._connect()
         cursor = conn.cursor()
         
         # Total detections
@@ -184,8 +503,6 @@ class EmotionDatabase:
         ''')
         daily_activity = {row[0]: row[1] for row in cursor.fetchall()}
         
-        conn.close()
-        
         return {
             'total_detections': total,
             'emotion_counts': emotion_counts,
@@ -203,7 +520,8 @@ class EmotionDatabase:
         Returns:
             list: Matching records
         """
-        conn = sqlite3.connect(self.db_path)
+        self._flush_before_read()
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -215,7 +533,6 @@ class EmotionDatabase:
         ''', (emotion, limit))
         
         rows = cursor.fetchall()
-        conn.close()
         
         return [{
             'id': row[0],
@@ -233,53 +550,47 @@ class EmotionDatabase:
         Returns:
             int: Number of deleted records
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            DELETE FROM emotions
-            WHERE timestamp < datetime('now', '-' || ? || ' days')
-        ''', (days,))
+        self._flush_before_read()
+        # A failed statement rolls back instead of leaving this thread's connection mid-transaction
+        with self._connect() as conn:
+            cursor = conn.execute('''
+                DELETE FROM emotions
+                WHERE timestamp < datetime('now', '-' || ? || ' days')
+            ''', (days,))
         
         deleted = cursor.rowcount
-        conn.commit()
-        conn.close()
         
         print(f"[DATABASE] Deleted {deleted} old records")
         return deleted
     
     def clear_all(self):
         """Clear all records from database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM emotions')
-        deleted = cursor.rowcount
-        conn.commit()
-        conn.close()
+        self._flush_before_read()
+        with self._connect() as conn:
+            deleted = conn.execute('DELETE FROM emotions').rowcount
         
         print(f"[DATABASE] Cleared {deleted} records")
         return deleted
     
     def get_database_info(self):
         """Get database information"""
-        conn = sqlite3.connect(self.db_path)
+        self._flush_before_read()
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT COUNT(*) FROM emotions')
         total_records = cursor.fetchone()[0]
         
-        # Database file size
-        db_size = os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0
+        # Database file size (recent WAL commits live in the -wal file until checkpointed)
+        db_size = sum(os.path.getsize(path) for path in (self.db_path, self.db_path + '-wal') if os.path.exists(path))
         db_size_mb = round(db_size / (1024 * 1024), 2)
         
-        conn.close()
-        
         return {
             'database_path': self.db_path,
             'total_records': total_records,
             'size_mb': db_size_mb,
-            'size_bytes': db_size
+            'size_bytes': db_size,
+            'connection': self.connection_info()
         }
 
 
@@ -0,0 +1,172 @@
+"""
+Emotion classifier backends for FaceEmotionDetector
+A backend runs the 7-class facial emotion model on a preprocessed batch
+(float32, N x 48 x 48 x 1 grayscale scaled to 0..1) and returns softmax rows
+in EMOTION_LABELS order. 'deepface' runs DeepFace's Keras model on
+TensorFlow; 'onnx' (ONNX Runtime) and 'opencv' (cv2.dnn) run the same
+weights exported by export_emotion_model.py without loading TensorFlow, or
+its int8 version from quantize_emotion_model.py.
+"""
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# Where export_emotion_model.py writes the exported model by default
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'facial_expression_model.onnx')
+
+# Where quantize_emotion_model.py writes the int8 model by default
+QUANTIZED_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'facial_expression_model.int8.onnx')
+
+
+class EmotionBackend:
+    """Base class: load the model in __init__, run it in predict()"""
+
+    name = None
+
+    def __init__(self):
+        self.load_seconds = None
+        self.model_file = None
+
+    def predict(self, batch):
+        """
+        Run the model on a preprocessed batch
+        Returns: (N, 7) float64 softmax rows in EMOTION_LABELS order
+        """
+        raise NotImplementedError
+
+    def info(self):
+        """Backend name, model file and load time for metrics"""
+        return {
+            'name': self.name,
+            'model': os.path.basename(self.model_file) if self.model_file else None,
+            'load_seconds': self.load_seconds
+        }
+
+
+class DeepFaceBackend(EmotionBackend):
+    """DeepFace's Keras emotion model on TensorFlow"""
+
+    name = 'deepface'
+
+    def __init__(self, DeepFace=None):
+        """
+        Build DeepFace's emotion model and keep a reference to it
+        DeepFace caches built models, so analyze() reuses this instance
+        Args:
+            DeepFace: The imported DeepFace module (imported here if omitted)
+        """
+        super().__init__()
+        if DeepFace is None:
+            from deepface import DeepFace
+        start = time.perf_counter()
+        try:
+            built = DeepFace.build_model('Emotion', task='facial_attribute')
+        except TypeError:
+            # Older DeepFace versions take only the model name
+            built = DeepFace.build_model('Emotion')
+        # Newer DeepFace wraps the Keras model in a client object
+        self.model = getattr(built, 'model', built)
+        self.load_seconds = round(time.perf_counter() - start, 3)
+
+    def predict(self, batch):
+        # Calling the model directly avoids predict()'s per-call setup cost
+        return np.asarray(self.model(batch, training=False), dtype=np.float64)
+
+
+class OnnxRuntimeBackend(EmotionBackend):
+    """Exported emotion model on ONNX Runtime (CPU)"""
+
+    name = 'onnx'
+
+    def __init__(self, model_path=None, threads=0):
+        """
+        Load the exported model
+        Args:
+            model_path: ONNX file (default DEFAULT_MODEL_PATH)
+            threads: Intra-op threads (0 = ONNX Runtime's default)
+        """
+        super().__init__()
+        import onnxruntime
+
+        start = time.perf_counter()
+        self.model_file = _model_file(model_path)
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = int(threads)
+        self.session = onnxruntime.InferenceSession(self.model_file, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.load_seconds = round(time.perf_counter() - start, 3)
+
+    def predict(self, batch):
+        # InferenceSession.run is thread-safe
+        return np.asarray(self.session.run(None, {self.input_name: batch})[0], dtype=np.float64)
+
+
+class OpenCVDnnBackend(EmotionBackend):
+    """Exported emotion model on OpenCV's dnn module (no extra dependency)"""
+
+    name = 'opencv'
+
+    def __init__(self, model_path=None, threads=0):
+        """
+        Load the exported model
+        Args:
+            model_path: ONNX file (default DEFAULT_MODEL_PATH)
+            threads: OpenCV worker threads (0 = OpenCV's default); process-wide
+        """
+        super().__init__()
+        start = time.perf_counter()
+        if threads:
+            cv2.setNumThreads(int(threads))
+        self.model_file = _model_file(model_path)
+        self.net = cv2.dnn.readNetFromONNX(self.model_file)
+        # setInput() + forward() share state on the net
+        self._lock = threading.Lock()
+        self.load_seconds = round(time.perf_counter() - start, 3)
+
+    def predict(self, batch):
+        with self._lock:
+            self.net.setInput(np.ascontiguousarray(batch, dtype=np.float32))
+            return np.asarray(self.net.forward(), dtype=np.float64)
+
+
+BACKENDS = {
+    'deepface': DeepFaceBackend,
+    'onnx': OnnxRuntimeBackend,
+    'opencv': OpenCVDnnBackend
+}
+
+
+def _model_file(model_path):
+    """Resolve the exported model path, with a hint if it has not been created yet"""
+    path = model_path or DEFAULT_MODEL_PATH
+    if not os.path.isfile(path):
+        if path == QUANTIZED_MODEL_PATH:
+            hint = 'python quantize_emotion_model.py path/to/face/photos'
+        else:
+            hint = f'python export_emotion_model.py {path}'
+        raise FileNotFoundError(f"Emotion model not found at {path}; create it with: {hint}")
+    return path
+
+
+def build_emotion_backend(name, model_path=None, threads=0, quantized=False):
+    """
+    Create an emotion backend by name
+    Args:
+        name: One of BACKENDS
+        model_path: Exported model file for 'onnx' and 'opencv'
+        threads: Inference threads for 'onnx' and 'opencv' (0 = library default)
+        quantized: Use the int8 model (QUANTIZED_MODEL_PATH unless model_path is given)
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"backend must be one of {tuple(BACKENDS)}")
+    if name == 'deepface':
+        if quantized:
+            raise ValueError("the int8 model needs the 'onnx' or 'opencv' backend")
+        return DeepFaceBackend()
+    if quantized and not model_path:
+        model_path = QUANTIZED_MODEL_PATH
+    return BACKENDS[name](model_path, threads=threads)
@@ -1,8 +1,65 @@
 import re
-import nltk
 from textblob import TextBlob
+from textblob.en import sentiment as pattern_sentiment
 import numpy as np
 from collections import Counter
+from fast_sentiment import FastSentimentScorer, SentimentAccumulator
+from result_cache import LRUCache
+
+# Word tokenizer for normalized text, reproducing the splits nltk.word_tokenize
+# makes on it: ! and ? stand alone, sentence-final periods are split off,
+# numbers like 3.5 and abbreviations like e.g. stay whole
+TOKEN_PATTERN = re.compile(r"""
+    \w+(?:\.\w+)*                     # words, numbers and dotted words,
+    (?:(?<=\.\w)\.(?=\s))?             # keeping the period of "e.g." mid-sentence
+  | \.\.\.                            # ellipsis
+  | [!?]                              # exclamation and question marks
+  | \.+                               # sentence-final periods
+""", re.VERBOSE)
+
+# Sentence boundaries used to cut long documents into chunks
+SENTENCE_END_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+# Same as TOKEN_PATTERN, but splits "n't" off contractions ("don't" -> "do", "n't")
+CONTRACTION_TOKEN_PATTERN = re.compile(r"""
+    \w+?(?=n't\b)                     # "do" in "don't"
+  | n't\b                             # negation clitic
+  | \w+(?:\.\w+)*                     # words, numbers and dotted words,
+    (?:(?<=\.\w)\.(?=\s))?             # keeping the period of "e.g." mid-sentence
+  | \.\.\.                            # ellipsis
+  | [!?]                              # exclamation and question marks
+  | \.+                               # sentence-final periods
+""", re.VERBOSE)
+
+# Words the Treebank tokenizer splits in two ("cannot" -> "can", "not")
+SPLIT_CONTRACTIONS = {
+    'cannot': ('can', 'not'),
+    'gimme': ('gim', 'me'),
+    'gonna': ('gon', 'na'),
+    'gotta': ('got', 'ta'),
+    'lemme': ('lem', 'me'),
+    'wanna': ('wan', 'na')
+}
+
+
+def regex_tokenize(text):
+    """Tokenize normalized text without NLTK"""
+    if "n't" in text:
+        words = CONTRACTION_TOKEN_PATTERN.findall(text)
+    else:
+        words = TOKEN_PATTERN.findall(text)
+    
+    if SPLIT_CONTRACTIONS.keys().isdisjoint(words):
+        return words
+    
+    split_words = []
+    for word in words:
+        if word in SPLIT_CONTRACTIONS:
+            split_words.extend(SPLIT_CONTRACTIONS[word])
+        else:
+            split_words.append(word)
+    return split_words
+
 
 class EmotionDetector:
     """
@@ -10,13 +67,51 @@ class EmotionDetector:
     Detects emotions: happy, sad, angry, fear, surprise, neutral
     """
     
-    def __init__(self):
-        """Initialize the emotion detector with keyword patterns"""
-        # Download required NLTK data
-        try:
-            nltk.data.find('tokenizers/punkt')
-        except LookupError:
-            nltk.download('punkt', quiet=True)
+    # Available sentiment scorers: 'textblob' builds a TextBlob per call,
+    # 'fast' scores the already-tokenized words against the same lexicon
+    SENTIMENT_MODES = ('textblob', 'fast')
+    
+    # Available tokenizers: 'regex' needs no downloads, 'nltk' uses nltk.word_tokenize
+    TOKENIZERS = ('regex', 'nltk')
+    
+    def __init__(self, sentiment_mode='textblob', cache_size=0, cache_ttl=None,
+                 tokenizer='regex'):
+        """
+        Initialize the emotion detector with keyword patterns
+        Args:
+            sentiment_mode: 'textblob' (default) or 'fast'
+            cache_size: Max results kept in the LRU result cache (0 disables it)
+            cache_ttl: Seconds a cached result stays valid (None = no expiry)
+            tokenizer: 'regex' (default) or 'nltk'
+        """
+        if tokenizer not in self.TOKENIZERS:
+            raise ValueError(
+                f"Unknown tokenizer '{tokenizer}', expected one of {self.TOKENIZERS}"
+            )
+        if sentiment_mode not in self.SENTIMENT_MODES:
+            raise ValueError(
+                f"Unknown sentiment_mode '{sentiment_mode}', "
+                f"expected one of {self.SENTIMENT_MODES}"
+            )
+        self.sentiment_mode = sentiment_mode
+        self.fast_sentiment = FastSentimentScorer() if sentiment_mode == 'fast' else None
+        
+        # Results are cached by normalized text, so "Great!" and "great!" share an entry
+        self.result_cache = LRUCache(cache_size, cache_ttl) if cache_size else None
+        
+        self.tokenizer = tokenizer
+        if tokenizer == 'nltk':
+            import nltk
+            
+            # Download required NLTK data
+            try:
+                nltk.data.find('tokenizers/punkt')
+            except LookupError:
+                nltk.download('punkt', quiet=True)
+            
+            self._tokenize = nltk.word_tokenize
+        else:
+            self._tokenize = regex_tokenize
         
         # Emotion keywords dictionary (expanded for better accuracy)
         self.emotion_keywords = {
@@ -111,75 +206,198 @@ class EmotionDetector:
             'not', 'no', 'never', 'neither', 'nobody', 'nothing', 'nowhere',
             'hardly', 'barely', 'scarcely', "n't", 'cannot', 'cant'
         ]
+        
+        # Compile the lexicon once into O(1) lookup structures
+        self._compile_keyword_index()
     
-    def preprocess_text(self, text):
-        """Clean and preprocess the input text"""
+    def _normalize_keyword(self, keyword):
+        """Clean a lexicon entry the same way preprocess_text cleans input"""
+        return tuple(self.normalize_text(keyword).split())
+    
+    def _compile_keyword_index(self):
+        """
+        Build the inverted keyword index and phrase trie from emotion_keywords
+        keyword_index: token -> ((emotion, weight), ...)
+        phrase_trie: nested dicts keyed by token, with the emotion weights
+                     of a complete phrase stored under the None key
+        """
+        index = {}
+        trie = {}
+        
+        for emotion, keywords in self.emotion_keywords.items():
+            for keyword in keywords:
+                tokens = self._normalize_keyword(keyword)
+                if not tokens:
+                    continue
+                
+                if len(tokens) == 1:
+                    weights = index.setdefault(tokens[0], {})
+                else:
+                    node = trie
+                    for token in tokens:
+                        node = node.setdefault(token, {})
+                    weights = node.setdefault(None, {})
+                
+                # A keyword listed twice for one emotion still counts once
+                weights[emotion] = 1.0
+        
+        self.keyword_index = {
+            token: tuple(weights.items()) for token, weights in index.items()
+        }
+        self.phrase_trie = self._freeze_trie(trie)
+        self._intensifier_set = frozenset(self.intensifiers)
+        self._negation_set = frozenset(self.negations)
+    
+    def _freeze_trie(self, node):
+        """Convert phrase weight dicts in the trie to tuples"""
+        frozen = {}
+        for key, value in node.items():
+            if key is None:
+                frozen[key] = tuple(value.items())
+            else:
+                frozen[key] = self._freeze_trie(value)
+        return frozen
+    
+    def _match_phrase(self, words, start):
+        """
+        Find the longest lexicon phrase starting at words[start]
+        Returns: (emotion weights, phrase length) or (None, 0)
+        """
+        node = self.phrase_trie.get(words[start])
+        if node is None:
+            return None, 0
+        
+        best, best_length = None, 0
+        position = start + 1
+        while node is not None and position < len(words):
+            node = node.get(words[position])
+            position += 1
+            if node is not None and None in node:
+                best, best_length = node[None], position - start
+        
+        return best, best_length
+    
+    def _pending_phrase_start(self, words):
+        """
+        Find where an unfinished lexicon phrase starts at the end of words
+        (a phrase that may continue in text not read yet)
+        Returns: its position, or len(words) when every match is final
+        """
+        phrase_trie = self.phrase_trie
+        
+        # Step through the tokens exactly as _iter_keyword_matches does
+        i = 0
+        while i < len(words):
+            node = phrase_trie.get(words[i])
+            if node is None:
+                i += 1
+                continue
+            
+            position = i + 1
+            while node is not None and position < len(words):
+                node = node.get(words[position])
+                position += 1
+            if node is not None and any(key is not None for key in node):
+                return i
+            
+            _, length = self._match_phrase(words, i)
+            i += length or 1
+        
+        return len(words)
+    
+    def normalize_text(self, text):
+        """Lowercase the text and strip special characters"""
         # Convert to lowercase
         text = text.lower()
         
         # Remove special characters but keep basic punctuation
-        text = re.sub(r'[^a-zA-Z0-9\s\.\!\?]', '', text)
+        return re.sub(r'[^a-zA-Z0-9\s\.\!\?]', '', text)
+    
+    def tokenize(self, text):
+        """Split normalized text into word tokens"""
+        return self._tokenize(text)
+    
+    def preprocess_text(self, text):
+        """Clean and preprocess the input text"""
+        text = self.normalize_text(text)
         
         # Tokenize
-        words = nltk.word_tokenize(text)
+        words = self.tokenize(text)
         
         return text, words
     
-    def calculate_sentiment(self, text):
-        """Calculate sentiment polarity and subjectivity using TextBlob"""
-        blob = TextBlob(text)
-        sentiment = blob.sentiment
+    def calculate_sentiment(self, text, words=None):
+        """
+        Calculate sentiment polarity and subjectivity
+        Uses the fast lexicon scorer on the given tokens in 'fast' mode,
+        otherwise TextBlob on the text
+        """
+        if self.fast_sentiment is not None and words is not None:
+            polarity, subjectivity = self.fast_sentiment.score(words)
+        else:
+            sentiment = TextBlob(text).sentiment
+            polarity, subjectivity = sentiment.polarity, sentiment.subjectivity
         
         return {
-            'polarity': round(sentiment.polarity, 3),  # -1 to 1
-            'subjectivity': round(sentiment.subjectivity, 3)  # 0 to 1
+            'polarity': round(polarity, 3),  # -1 to 1
+            'subjectivity': round(subjectivity, 3)  # 0 to 1
         }
     
-    def detect_emotion_keywords(self, words):
-        """Detect emotions based on keyword matching"""
+    def _iter_keyword_matches(self, words):
+        """
+        Walk the tokens once and yield every lexicon hit
+        Yields: (position, emotion weights) where position is the index of
+                the first token of the matched word or phrase
+        """
+        keyword_index = self.keyword_index
+        phrase_trie = self.phrase_trie
+        
+        i = 0
+        while i < len(words):
+            word = words[i]
+            
+            # Multi-word phrases take precedence over single tokens
+            matches, length = (None, 0)
+            if word in phrase_trie:
+                matches, length = self._match_phrase(words, i)
+            if matches is None:
+                matches, length = keyword_index.get(word), 1
+            
+            if matches:
+                yield i, matches
+            
+            i += length
+    
+    def detect_emotion_keywords(self, words, previous_word=None):
+        """
+        Detect emotions based on keyword matching
+        previous_word is the token preceding words (e.g. the last token of
+        the previous chunk), so negations and intensifiers carry over
+        """
         emotion_scores = {emotion: 0 for emotion in self.emotion_keywords.keys()}
         
-        # Check for negations and intensifiers
-        for i, word in enumerate(words):
-            # Check if word is in any emotion category
-            for emotion, keywords in self.emotion_keywords.items():
-                if word in keywords:
-                    score = 1.0
-                    
-                    # Check for intensifiers before the word
-                    if i > 0 and words[i-1] in self.intensifiers:
-                        score *= 1.5
-                    
-                    # Check for negations before the word
-                    if i > 0 and words[i-1] in self.negations:
-                        score *= -0.5  # Reverse the emotion
-                    
-                    emotion_scores[emotion] += score
+        for i, matches in self._iter_keyword_matches(words):
+            score = 1.0
+            before = words[i-1] if i > 0 else previous_word
+            
+            # Check for intensifiers before the word
+            if before in self._intensifier_set:
+                score *= 1.5
+            
+            # Check for negations before the word
+            if before in self._negation_set:
+                score *= -0.5  # Reverse the emotion
+            
+            for emotion, weight in matches:
+                emotion_scores[emotion] += score * weight
         
         return emotion_scores
     
-    def detect(self, text):
+    def _finalize_scores(self, emotion_scores, sentiment):
         """
-        Main method to detect emotion from text
-        Returns: dict with emotion, confidence, and all emotion scores
+        Turn raw keyword scores and sentiment into a detection result
+        (sentiment adjustment, fallback and normalization)
         """
-        if not text or not text.strip():
-            return {
-                'emotion': 'neutral',
-                'confidence': 0.0,
-                'all_emotions': {},
-                'sentiment': {'polarity': 0.0, 'subjectivity': 0.0}
-            }
-        
-        # Preprocess
-        processed_text, words = self.preprocess_text(text)
-        
-        # Get sentiment
-        sentiment = self.calculate_sentiment(processed_text)
-        
-        # Detect emotions using keywords
-        emotion_scores = self.detect_emotion_keywords(words)
-        
         # Adjust scores based on sentiment polarity
         if sentiment['polarity'] > 0.3:
             emotion_scores['happy'] += sentiment['polarity'] * 2
@@ -217,6 +435,275 @@ class EmotionDetector:
             'all_emotions': normalized_scores,
             'sentiment': sentiment
         }
+    
+    def detect(self, text):
+        """
+        Main method to detect emotion from text
+        Returns: dict with emotion, confidence, and all emotion scores
+        """
+        if not text or not text.strip():
+            return {
+                'emotion': 'neutral',
+                'confidence': 0.0,
+                'all_emotions': {},
+                'sentiment': {'polarity': 0.0, 'subjectivity': 0.0}
+            }
+        
+        # Preprocess
+        processed_text = self.normalize_text(text)
+        
+        # Serve repeated inputs from the result cache
+        if self.result_cache is not None:
+            cached = self.result_cache.get(processed_text)
+            if cached is not None:
+                return cached
+        
+        words = self.tokenize(processed_text)
+        
+        # Get sentiment
+        sentiment = self.calculate_sentiment(processed_text, words)
+        
+        # Detect emotions using keywords
+        emotion_scores = self.detect_emotion_keywords(words)
+        
+        result = self._finalize_scores(emotion_scores, sentiment)
+        
+        if self.result_cache is not None:
+            self.result_cache.put(processed_text, result)
+        
+        return result
+    
+    def iter_text_chunks(self, source, chunk_size=1000):
+        """
+        Split a long text into chunks of about chunk_size characters,
+        cutting at sentence ends where possible (else at whitespace)
+        Args:
+            source: A string or an iterable of strings (e.g. an open file)
+            chunk_size: Target chunk length in characters
+        Yields: (start offset, chunk text)
+        """
+        if isinstance(source, str):
+            source = (source,)
+        
+        buffer = ''
+        position = 0  # Start of the unconsumed part of buffer
+        offset = 0  # Character offset of buffer[position] in the document
+        
+        for piece in source:
+            buffer = buffer[position:] + piece
+            position = 0
+            
+            while len(buffer) - position >= chunk_size:
+                limit = position + chunk_size
+                cut = None
+                for match in SENTENCE_END_PATTERN.finditer(buffer, position, limit):
+                    cut = match.end()
+                if cut is None or cut <= position:
+                    space = buffer.rfind(' ', position, limit)
+                    cut = space + 1 if space > position else limit
+                
+                yield offset, buffer[position:cut]
+                offset += cut - position
+                position = cut
+        
+        if buffer[position:].strip():
+            yield offset, buffer[position:]
+    
+    def _sentiment_tokens(self, processed_text, words):
+        """
+        Get the tokens sentiment is scored on: our own tokens in 'fast'
+        mode, TextBlob's tokenization (as TextBlob(text).sentiment uses)
+        otherwise
+        """
+        if self.fast_sentiment is not None:
+            return words
+        return ' '.join(pattern_sentiment.tokenizer(processed_text)).lower().split()
+    
+    def detect_stream(self, source, chunk_size=1000):
+        """
+        Incrementally detect emotions in a long document
+        Each chunk is scored as soon as it is read, so memory stays
+        constant regardless of document length. Raw keyword scores and
+        sentiment assessments are summed across chunks, so the aggregate
+        is the score of the combined text. A lexicon phrase cut by a chunk
+        boundary is scored with the chunk it ends in.
+        Args:
+            source: A string or an iterable of strings (e.g. an open file)
+            chunk_size: Target chunk length in characters
+        Yields: {'type': 'chunk', ...} per chunk, then one
+                {'type': 'aggregate', ...} with the document result
+        """
+        totals = {emotion: 0 for emotion in self.emotion_keywords.keys()}
+        scorer = self.fast_sentiment or FastSentimentScorer()
+        document_sentiment = SentimentAccumulator(scorer)
+        previous_word = None
+        # Tokens of a phrase left unfinished at the end of the previous chunk
+        carried = []
+        chunks = 0
+        text_length = 0
+        
+        # Read one chunk ahead: the last chunk scores its unfinished phrase too
+        pieces = self.iter_text_chunks(source, chunk_size)
+        following = next(pieces, None)
+        while following is not None:
+            (start, chunk), following = following, next(pieces, None)
+            text_length = start + len(chunk)
+            if not chunk.strip():
+                continue
+            
+            processed_text = self.normalize_text(chunk)
+            words = self.tokenize(processed_text)
+            
+            keyword_words = carried + words
+            pending = len(keyword_words) if following is None else self._pending_phrase_start(keyword_words)
+            keyword_words, carried = keyword_words[:pending], keyword_words[pending:]
+            emotion_scores = self.detect_emotion_keywords(keyword_words, previous_word)
+            for emotion, score in emotion_scores.items():
+                totals[emotion] += score
+            if keyword_words:
+                previous_word = keyword_words[-1]
+            
+            # Score the chunk on its own, and continue the document-wide
+            # sentiment stream (an "!" can still boost the previous chunk)
+            sentiment_tokens = self._sentiment_tokens(processed_text, words)
+            document_sentiment.feed(sentiment_tokens)
+            polarity, subjectivity, count = scorer.totals(sentiment_tokens)
+            sentiment = {
+                'polarity': round(polarity / float(count or 1), 3),
+                'subjectivity': round(subjectivity / float(count or 1), 3)
+            }
+            result = self._finalize_scores(emotion_scores, sentiment)
+            result.update({
+                'type': 'chunk',
+                'index': chunks,
+                'start': start,
+                'length': len(chunk)
+            })
+            chunks += 1
+            yield result
+        
+        polarity, subjectivity, count = document_sentiment.totals()
+        sentiment = {
+            'polarity': round(polarity / float(count or 1), 3),
+            'subjectivity': round(subjectivity / float(count or 1), 3)
+        }
+        result = self._finalize_scores(totals, sentiment)
+        result.update({
+            'type': 'aggregate',
+            'chunks': chunks,
+            'text_length': text_length
+        })
+        yield result
+    
+    def detect_document(self, source, chunk_size=1000):
+        """
+        Detect emotions in a long document
+        Returns: dict with 'timeline' (one result per chunk) and 'aggregate'
+        """
+        timeline = []
+        for result in self.detect_stream(source, chunk_size):
+            if result['type'] == 'aggregate':
+                return {'timeline': timeline, 'aggregate': result}
+            timeline.append(result)
+    
+    def cache_stats(self):
+        """Get result cache counters, or None when caching is disabled"""
+        if self.result_cache is None:
+            return None
+        return self.result_cache.stats()
+    
+    def detect_batch(self, texts):
+        """
+        Detect emotions for a list of texts in one vectorized pass
+        Keyword hits for the whole batch are collected into a sparse
+        (text, emotion) matrix and weighted, sentiment-adjusted and
+        normalized with NumPy array operations.
+        Returns: list of dicts, identical to calling detect() per text
+        """
+        emotions = list(self.emotion_keywords.keys())
+        columns = {emotion: col for col, emotion in enumerate(emotions)}
+        results = [None] * len(texts)
+        
+        # Sparse keyword hits: one entry per (text, emotion) match
+        rows, cols, weights = [], [], []
+        intensified, negated = [], []
+        batch_rows = []
+        sentiments = []
+        
+        for index, text in enumerate(texts):
+            if not text or not text.strip():
+                results[index] = self.detect(text)
+                continue
+            
+            row = len(batch_rows)
+            batch_rows.append(index)
+            
+            processed_text, words = self.preprocess_text(text)
+            sentiments.append(self.calculate_sentiment(processed_text, words))
+            
+            for i, matches in self._iter_keyword_matches(words):
+                previous = words[i-1] if i > 0 else None
+                for emotion, weight in matches:
+                    rows.append(row)
+                    cols.append(columns[emotion])
+                    weights.append(weight)
+                    intensified.append(previous in self._intensifier_set)
+                    negated.append(previous in self._negation_set)
+        
+        if not batch_rows:
+            return results
+        
+        # Intensifier (x1.5) and negation (x-0.5) weighting
+        weights = np.array(weights, dtype=np.float64)
+        weights *= np.where(intensified, 1.5, 1.0)
+        weights *= np.where(negated, -0.5, 1.0)
+        
+        scores = np.zeros((len(batch_rows), len(emotions)), dtype=np.float64)
+        np.add.at(scores, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)), weights)
+        
+        # Adjust scores based on sentiment polarity
+        polarity = np.array([s['polarity'] for s in sentiments], dtype=np.float64)
+        positive = polarity > 0.3
+        negative = polarity < -0.3
+        happy, sad, angry, neutral = (
+            columns['happy'], columns['sad'], columns['angry'], columns['neutral']
+        )
+        scores[positive, happy] += polarity[positive] * 2
+        scores[negative, sad] += np.abs(polarity[negative]) * 1.5
+        scores[negative, angry] += np.abs(polarity[negative]) * 1.0
+        
+        # If no emotions detected, use sentiment to determine emotion
+        # (cumsum keeps the left-to-right summation order of detect())
+        empty = np.cumsum(scores, axis=1)[:, -1] == 0
+        use_happy = empty & (polarity > 0.1)
+        use_sad = empty & ~use_happy & (polarity < -0.1)
+        use_neutral = empty & ~use_happy & ~use_sad
+        scores[use_happy, happy] = polarity[use_happy]
+        scores[use_sad, sad] = np.abs(polarity[use_sad])
+        scores[use_neutral, neutral] = 1.0
+        
+        # Normalize scores
+        totals = np.cumsum(scores, axis=1)[:, -1]
+        has_total = totals > 0
+        normalized = np.zeros_like(scores)
+        normalized[has_total] = scores[has_total] / totals[has_total, None]
+        normalized[~has_total, neutral] = 1.0
+        
+        for row, index in enumerate(batch_rows):
+            normalized_scores = {
+                emotion: round(float(score), 3)
+                for emotion, score in zip(emotions, normalized[row])
+            }
+            dominant_emotion = max(normalized_scores, key=normalized_scores.get)
+            
+            results[index] = {
+                'emotion': dominant_emotion,
+                'confidence': round(normalized_scores[dominant_emotion], 3),
+                'all_emotions': normalized_scores,
+                'sentiment': sentiments[row]
+            }
+        
+        return results
 
 # Test the detector
 if __name__ == '__main__':
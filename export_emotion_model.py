@@ -0,0 +1,57 @@
+"""
+Export DeepFace's emotion model to ONNX for the 'onnx' and 'opencv' backends
+Run with: python export_emotion_model.py [output.onnx]
+Needs the full stack once (deepface, tensorflow) plus tf2onnx:
+    pip install tf2onnx
+The exported file runs with FACE_BACKEND=onnx (onnxruntime) or
+FACE_BACKEND=opencv (cv2.dnn) without TensorFlow installed.
+"""
+import sys
+import io
+import os
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+import numpy as np
+
+from emotion_backends import DEFAULT_MODEL_PATH, DeepFaceBackend
+from face_emotion_detector import EMOTION_INPUT_SIZE
+
+OPSET = 13
+
+
+def export(output_path):
+    """Convert the Keras emotion model to ONNX with a dynamic batch dimension"""
+    import tensorflow as tf
+    import tf2onnx
+
+    keras_model = DeepFaceBackend().model
+    spec = (tf.TensorSpec((None, EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE, 1), tf.float32, name='faces'),)
+    # Traced through a tf.function: tf2onnx's Keras entry point does not handle Keras 3 models
+    function = tf.function(lambda faces: keras_model(faces, training=False))
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tf2onnx.convert.from_function(function, input_signature=spec, opset=OPSET, output_path=output_path)
+    return keras_model
+
+
+def verify(keras_model, output_path):
+    """Largest softmax difference between Keras and each exported-model backend"""
+    from emotion_backends import BACKENDS
+
+    batch = np.random.default_rng(0).random((8, EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE, 1), dtype=np.float32)
+    expected = np.asarray(keras_model(batch, training=False), dtype=np.float64)
+    for name in ('onnx', 'opencv'):
+        try:
+            backend = BACKENDS[name](output_path)
+        except ImportError as e:
+            print(f"   {name}: skipped ({e})")
+            continue
+        print(f"   {name}: max difference {np.abs(backend.predict(batch) - expected).max():.2e}")
+
+
+if __name__ == '__main__':
+    output_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_MODEL_PATH
+    print(f"Exporting DeepFace emotion model to {output_path} (opset {OPSET})...")
+    keras_model = export(output_path)
+    print(f"[OK] Wrote {os.path.getsize(output_path) / 1e6:.1f} MB")
+    print("Checking exported model against Keras on random faces...")
+    verify(keras_model, output_path)
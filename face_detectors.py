@@ -0,0 +1,250 @@
+"""
+Face detector backends for FaceEmotionDetector
+A backend finds face boxes (x, y, w, h) in a frame. 'haar' runs OpenCV's
+bundled Haar cascade; 'yunet' (cv2.FaceDetectorYN) and 'ssd' (the res10
+SSD on cv2.dnn) run DNN detectors from local model files, which also find
+turned and tilted faces the frontal cascade misses. All backends search a
+copy of the frame downscaled to max_side and map boxes back to full
+resolution, so crops come from the original frame.
+"""
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+
+# Default model locations (see README: Face detector backends)
+YUNET_MODEL_PATH = os.path.join(MODELS_DIR, 'face_detection_yunet_2023mar.onnx')
+SSD_MODEL_PATH = os.path.join(MODELS_DIR, 'res10_300x300_ssd_iter_140000.caffemodel')
+SSD_CONFIG_PATH = os.path.join(MODELS_DIR, 'deploy.prototxt')
+
+
+class FaceDetectorBackend:
+    """Base class: load the detector in __init__, search one (downscaled) image in _detect()"""
+
+    name = None
+    # DNN detectors are trained on color images; Haar works on grayscale
+    needs_color = False
+
+    def __init__(self, max_side=640):
+        """
+        Args:
+            max_side: Longest side (pixels) of the image faces are searched in
+                      (0 searches the full frame)
+        """
+        self.max_side = max(0, int(max_side))
+        self.load_seconds = None
+        self.model_file = None
+
+    def find(self, gray, frame=None):
+        """
+        Find faces in a frame
+        Args:
+            gray: Grayscale frame
+            frame: The BGR frame, if the caller has it (color backends
+                   fall back to the grayscale one)
+        Returns: (N, 4) int array of x, y, w, h boxes in full-resolution coordinates
+        """
+        image = gray
+        if self.needs_color:
+            image = frame if frame is not None and frame.ndim == 3 else cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+        height, width = image.shape[:2]
+
+        scale = min(1.0, self.max_side / max(height, width)) if self.max_side else 1.0
+        small = image if scale == 1.0 else cv2.resize(
+            image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA
+        )
+
+        faces = np.asarray(self._detect(small, scale), dtype=np.float64).reshape(-1, 4)
+        if not len(faces):
+            return faces.astype(int)
+
+        # Map boxes back to the full-resolution frame and clip them to it
+        faces = np.round(faces / scale).astype(int)
+        x0 = np.clip(faces[:, 0], 0, width)
+        y0 = np.clip(faces[:, 1], 0, height)
+        x1 = np.clip(faces[:, 0] + faces[:, 2], 0, width)
+        y1 = np.clip(faces[:, 1] + faces[:, 3], 0, height)
+        faces = np.stack([x0, y0, x1 - x0, y1 - y0], axis=1)
+        return faces[(faces[:, 2] > 0) & (faces[:, 3] > 0)]
+
+    def _detect(self, image, scale):
+        """
+        Search one image (already downscaled)
+        Args:
+            image: The image to search
+            scale: Its size relative to the frame (1.0 when not downscaled)
+        Returns: sequence of x, y, w, h boxes in image coordinates
+        """
+        raise NotImplementedError
+
+    def info(self):
+        """Backend name, model file and load time for metrics"""
+        return {
+            'name': self.name,
+            'model': os.path.basename(self.model_file) if self.model_file else None,
+            'load_seconds': self.load_seconds,
+            'max_side': self.max_side
+        }
+
+
+class HaarFaceDetector(FaceDetectorBackend):
+    """OpenCV's Haar cascade (frontal faces, no model download)"""
+
+    name = 'haar'
+
+    def __init__(self, max_side=640, model_path=None):
+        """
+        Args:
+            max_side: See FaceDetectorBackend (frames no larger than this,
+                      and every frame with 0, are searched with the
+                      original lenient parameters)
+            model_path: Cascade XML (default OpenCV's haarcascade_frontalface_default.xml)
+        """
+        super().__init__(max_side)
+        start = time.perf_counter()
+        self.model_file = model_path or cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        # A CascadeClassifier must not run in two threads at once: one per thread
+        self._local = threading.local()
+        if self.cascade.empty():
+            raise FileNotFoundError(f"Could not load Haar cascade from {self.model_file}")
+        self.load_seconds = round(time.perf_counter() - start, 3)
+
+    @property
+    def cascade(self):
+        """This thread's CascadeClassifier"""
+        cascade = getattr(self._local, 'cascade', None)
+        if cascade is None:
+            cascade = self._local.cascade = cv2.CascadeClassifier(self.model_file)
+        return cascade
+
+    def _detect(self, image, scale):
+        if scale == 1.0:
+            # Full frame with lenient fixed parameters (small or distant faces included)
+            return self.cascade.detectMultiScale(
+                image,
+                scaleFactor=1.05,  # More sensitive (was 1.1)
+                minNeighbors=3,     # More lenient (was 5)
+                minSize=(20, 20)    # Smaller minimum (was 30x30)
+            )
+        scale_factor, min_size = self.detection_params(image.shape)
+        return self.cascade.detectMultiScale(
+            image, scaleFactor=scale_factor, minNeighbors=3, minSize=(min_size, min_size)
+        )
+
+    @staticmethod
+    def detection_params(shape):
+        """
+        Haar scale factor and minimum face size adapted to a downscaled detection frame
+        Returns: (scale_factor, min_size)
+        """
+        short_side = min(shape[:2])
+        # Faces smaller than 1/12 of the short side are background at webcam distances
+        min_size = max(20, short_side // 12)
+        # Fine pyramid steps on small frames, coarser ones when there is room
+        scale_factor = 1.05 if short_side <= 480 else 1.1
+        return scale_factor, min_size
+
+
+class YuNetFaceDetector(FaceDetectorBackend):
+    """YuNet on cv2.FaceDetectorYN (OpenCV >= 4.8; fast, handles turned faces)"""
+
+    name = 'yunet'
+    needs_color = True
+
+    def __init__(self, max_side=640, model_path=None, score_threshold=0.6, nms_threshold=0.3):
+        """
+        Args:
+            max_side: See FaceDetectorBackend
+            model_path: YuNet ONNX file (default YUNET_MODEL_PATH)
+            score_threshold: Minimum face confidence
+            nms_threshold: Overlap above which weaker boxes are suppressed
+        """
+        super().__init__(max_side)
+        start = time.perf_counter()
+        self.model_file = _model_file(model_path or YUNET_MODEL_PATH)
+        self.detector = cv2.FaceDetectorYN.create(self.model_file, '', (320, 320), score_threshold, nms_threshold)
+        # setInputSize() + detect() share state on the detector
+        self._lock = threading.Lock()
+        self.load_seconds = round(time.perf_counter() - start, 3)
+
+    def _detect(self, image, scale):
+        height, width = image.shape[:2]
+        with self._lock:
+            self.detector.setInputSize((width, height))
+            _, faces = self.detector.detect(image)
+        # Rows are x, y, w, h, five landmarks and the score
+        return faces[:, :4] if faces is not None else []
+
+
+class SSDFaceDetector(FaceDetectorBackend):
+    """OpenCV's res10 300x300 SSD face detector (Caffe) on cv2.dnn"""
+
+    name = 'ssd'
+    needs_color = True
+    INPUT_SIZE = 300
+    MEAN = (104.0, 177.0, 123.0)
+
+    def __init__(self, max_side=640, model_path=None, config_path=None, score_threshold=0.5):
+        """
+        Args:
+            max_side: See FaceDetectorBackend
+            model_path: Caffe weights (default SSD_MODEL_PATH)
+            config_path: Caffe network definition (default deploy.prototxt next to the weights)
+            score_threshold: Minimum face confidence
+        """
+        super().__init__(max_side)
+        start = time.perf_counter()
+        self.model_file = _model_file(model_path or SSD_MODEL_PATH)
+        config_file = _model_file(config_path or os.path.join(os.path.dirname(self.model_file), 'deploy.prototxt'))
+        self.net = cv2.dnn.readNetFromCaffe(config_file, self.model_file)
+        self.score_threshold = score_threshold
+        # setInput() + forward() share state on the net
+        self._lock = threading.Lock()
+        self.load_seconds = round(time.perf_counter() - start, 3)
+
+    def _detect(self, image, scale):
+        height, width = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(
+            cv2.resize(image, (self.INPUT_SIZE, self.INPUT_SIZE)), 1.0, (self.INPUT_SIZE, self.INPUT_SIZE), self.MEAN
+        )
+        with self._lock:
+            self.net.setInput(blob)
+            detections = np.asarray(self.net.forward()).reshape(-1, 7)
+        # Rows are image id, class, score and corners as fractions of the image
+        detections = detections[detections[:, 2] >= self.score_threshold]
+        corners = detections[:, 3:7] * np.array([width, height, width, height])
+        return np.column_stack([corners[:, :2], corners[:, 2:] - corners[:, :2]])
+
+
+DETECTORS = {
+    'haar': HaarFaceDetector,
+    'yunet': YuNetFaceDetector,
+    'ssd': SSDFaceDetector
+}
+
+
+def _model_file(path):
+    """Check a detector model file exists, with a hint if it has not been downloaded"""
+    if not os.path.isfile(path):
+        raise FileNotFoundError(
+            f"Face detector model not found at {path}; download it as described in README.md (Face detector backends)"
+        )
+    return path
+
+
+def build_face_detector_backend(name, model_path=None, max_side=640):
+    """
+    Create a face detector backend by name
+    Args:
+        name: One of DETECTORS
+        model_path: Model file (cascade XML for 'haar', ONNX for 'yunet',
+                    caffemodel for 'ssd'); each has a default location
+        max_side: Longest side (pixels) of the image faces are searched in
+    """
+    if name not in DETECTORS:
+        raise ValueError(f"face detector must be one of {tuple(DETECTORS)}")
+    return DETECTORS[name](max_side, model_path=model_path)
@@ -4,6 +4,112 @@ from PIL import Image
 import io
 import base64
 import os
+import threading
+import time
+
+# Output order of DeepFace's emotion model
+EMOTION_LABELS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+
+# Input size of DeepFace's emotion model (grayscale)
+EMOTION_INPUT_SIZE = 48
+
+# Our 16-emotion system, in the column order of project_emotions()
+ENHANCED_LABELS = ['happy', 'excited', 'content', 'calm', 'sad', 'tired', 'bored', 'angry',
+                   'frustrated', 'disgust', 'fear', 'anxious', 'worried', 'surprise', 'confused', 'neutral']
+
+# Piecewise projection of each DeepFace emotion onto the enhanced ones, as
+# (lower bound, {enhanced emotion: weight}) tiers checked top down: a score
+# uses the first tier it is strictly above (None = any score). Same rules as
+# FaceEmotionDetector._map_to_enhanced_emotions
+EMOTION_PROJECTION = {
+    'angry': [(0.4, {'angry': 1.0, 'frustrated': 0.3}),
+              (None, {'frustrated': 0.8, 'angry': 0.6})],
+    'disgust': [(None, {'disgust': 1.2})],
+    'fear': [(0.4, {'fear': 0.9, 'anxious': 0.4}),
+             (0.2, {'anxious': 0.8, 'worried': 0.5}),
+             (None, {'worried': 0.8, 'fear': 0.4})],
+    'happy': [(0.5, {'excited': 0.7, 'happy': 0.5}),
+              (0.2, {'happy': 0.9, 'content': 0.4}),
+              (None, {'content': 0.7, 'happy': 0.5})],
+    'sad': [(0.4, {'sad': 1.0, 'tired': 0.3}),
+            (0.2, {'sad': 0.8, 'bored': 0.5}),
+            (None, {'tired': 0.6, 'sad': 0.6})],
+    'surprise': [(0.3, {'surprise': 1.0, 'confused': 0.3}),
+                 (None, {'confused': 0.8, 'surprise': 0.6})],
+    'neutral': [(0.8, {'neutral': 0.5, 'calm': 0.3}),
+                (0.6, {'calm': 0.4, 'neutral': 0.2}),
+                (None, {'calm': 0.3, 'neutral': 0.1})]
+}
+
+
+def _projection_tables():
+    """
+    Build lookup tables for EMOTION_PROJECTION
+    Returns: (bounds, weights) with bounds of shape (7, tiers - 1), padded
+             with -inf, and weights of shape (7, tiers, 16)
+    """
+    tiers = max(len(rules) for rules in EMOTION_PROJECTION.values())
+    bounds = np.full((len(EMOTION_LABELS), tiers - 1), -np.inf)
+    weights = np.zeros((len(EMOTION_LABELS), tiers, len(ENHANCED_LABELS)))
+    for source, label in enumerate(EMOTION_LABELS):
+        for tier, (bound, targets) in enumerate(EMOTION_PROJECTION[label]):
+            if bound is not None:
+                bounds[source, tier] = bound
+            for target, weight in targets.items():
+                weights[source, tier, ENHANCED_LABELS.index(target)] = weight
+    return bounds, weights
+
+
+_PROJECTION_BOUNDS, _PROJECTION_WEIGHTS = _projection_tables()
+
+
+def _sum_columns(values):
+    """Row sums added left to right, matching Python's sum() over a row"""
+    total = values[:, 0].copy()
+    for column in range(1, values.shape[1]):
+        total += values[:, column]
+    return total
+
+
+def _round_like_python(values, decimals):
+    """
+    np.round() that agrees with Python's round() on every element
+    np.round() scales by 10**decimals first, which can push a value sitting
+    on a rounding tie to the wrong side; those few are redone with round()
+    """
+    rounded = np.round(values, decimals)
+    scaled = values * 10 ** decimals
+    ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-9
+    if ties.any():
+        rounded[ties] = [round(value, decimals) for value in values[ties].tolist()]
+    return rounded
+
+
+def project_emotions(scores):
+    """
+    Map DeepFace's 7 emotions to our 16-emotion system for many faces at once
+    Vectorized form of FaceEmotionDetector._map_to_enhanced_emotions, giving
+    the same values after rounding
+    Args:
+        scores: (N, 7) array of scores (any scale) in EMOTION_LABELS order
+    Returns:
+        (N, 16) float64 array in ENHANCED_LABELS order, rows summing to ~1.0
+        and rounded to 3 decimals (all zeros for an all-zero row)
+    """
+    scores = np.asarray(scores, dtype=np.float64).reshape(-1, len(EMOTION_LABELS))
+    total = _sum_columns(scores)[:, None]
+    normalized = np.divide(scores, total, out=np.zeros_like(scores), where=total > 0)
+    
+    # Tier per score = how many tier bounds it is not above
+    tiers = (normalized[:, :, None] <= _PROJECTION_BOUNDS).sum(axis=2)
+    weights = _PROJECTION_WEIGHTS[np.arange(len(EMOTION_LABELS)), tiers]
+    # Each enhanced emotion comes from a single DeepFace emotion, so this sum adds only zeros
+    enhanced = (normalized[:, :, None] * weights).sum(axis=1)
+    
+    total_enhanced = _sum_columns(enhanced)[:, None]
+    enhanced = np.divide(enhanced, total_enhanced, out=enhanced, where=total_enhanced > 0)
+    return _round_like_python(enhanced, 3)
+
 
 class FaceEmotionDetector:
     """
@@ -11,8 +117,55 @@ class FaceEmotionDetector:
     Detects emotions from facial expressions in images
     """
     
-    def __init__(self):
-        """Initialize the face emotion detector"""
+    # 'crop': face detector boxes are cropped and fed straight to the emotion model
+    # 'deepface': full frame goes to DeepFace.analyze (runs its own detector)
+    PIPELINES = ('crop', 'deepface')
+    
+    def __init__(self, pipeline='crop', batch_size=16, batch_wait_ms=10, detect_max_side=640,
+                 frame_cache_clients=1024, frame_cache_ttl=5.0, frame_cache_distance=5,
+                 backend='deepface', model_path=None, backend_threads=0, quantized=False,
+                 face_detector='haar', face_detector_model=None):
+        """
+        Initialize the face emotion detector
+        Args:
+            pipeline: 'crop' (one detection pass per frame) or 'deepface'
+            batch_size: Max face crops per batched model call across concurrent
+                        requests (1 disables micro-batching)
+            batch_wait_ms: Max time a crop waits for others to join its batch
+            detect_max_side: Longest side (pixels) of the frame faces are searched in;
+                             larger frames are downscaled for detection only
+                             (0 searches the full frame with fixed parameters)
+            frame_cache_clients: Clients kept in the near-duplicate frame cache (0 disables it)
+            frame_cache_ttl: Seconds a cached frame result stays valid (None for no expiry)
+            frame_cache_distance: Max perceptual-hash bit difference for a cache hit
+            backend: Emotion model runtime: 'deepface' (TensorFlow), or 'onnx' /
+                     'opencv' running the exported model without TensorFlow
+                     (crop pipeline only; see emotion_backends.py)
+            model_path: Exported model file for the 'onnx' and 'opencv' backends
+            backend_threads: Inference threads for 'onnx' and 'opencv' (0 = default)
+            quantized: Run the int8 model from quantize_emotion_model.py
+                       ('onnx' and 'opencv' backends)
+            face_detector: Face finder: 'haar' (bundled cascade), or 'yunet' /
+                           'ssd' running a DNN detector from a local model file
+                           (see face_detectors.py)
+            face_detector_model: Model file for the face detector (each has a default)
+        """
+        if pipeline not in self.PIPELINES:
+            raise ValueError(f"pipeline must be one of {self.PIPELINES}")
+        if backend != 'deepface' and pipeline != 'crop':
+            raise ValueError(f"the '{pipeline}' pipeline needs the deepface backend")
+        if quantized and backend == 'deepface':
+            raise ValueError("the int8 model needs the 'onnx' or 'opencv' backend")
+        self.pipeline = pipeline
+        
+        # Near-identical frames from the same client reuse the previous result
+        self.frame_cache = None
+        if frame_cache_clients > 0:
+            from frame_cache import FrameHashCache
+            self.frame_cache = FrameHashCache(
+                max_clients=frame_cache_clients, ttl=frame_cache_ttl, max_distance=frame_cache_distance
+            )
+        
         self.emotions_map = {
             'happy': '😊',
             'sad': '😢',
@@ -23,85 +176,240 @@ class FaceEmotionDetector:
             'disgust': '🤢'
         }
         
-        # Load face cascade for face detection
-        cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        self.face_cascade = cv2.CascadeClassifier(cascade_path)
+        # Face detector backend (an explicitly configured DNN model must load)
+        from face_detectors import build_face_detector_backend
+        self.face_detector = build_face_detector_backend(face_detector, face_detector_model, max_side=detect_max_side)
+        print(f"[OK] Face detector ({self.face_detector.name}) loaded in {self.face_detector.load_seconds}s")
+        
+        # Latency metrics (cold = first call after load, warm = steady state)
+        self.metrics = {
+            'model_load_seconds': None,
+            'warmed_up': False,
+            'warmup_cold_ms': None,
+            'warmup_warm_ms': None,
+            'requests': 0,
+            'first_request_ms': None,
+            'last_request_ms': None,
+            'total_request_ms': 0.0
+        }
+        self._metrics_lock = threading.Lock()
         
-        # Flag to check if DeepFace is available
+        # Flag to check if DeepFace is available (full-frame analyze() path)
         self.deepface_available = False
-        try:
-            from deepface import DeepFace
-            self.DeepFace = DeepFace
-            self.deepface_available = True
-            print("[OK] DeepFace loaded successfully - Accurate emotion detection enabled")
-        except ImportError as e:
-            print(f"[WARNING] DeepFace not available: {e}")
-            print("[WARNING] Using basic emotion detection (lower accuracy)")
-        except Exception as e:
-            print(f"[WARNING] Error loading DeepFace: {e}")
-            print("[WARNING] Using basic emotion detection (lower accuracy)")
+        self.emotion_backend = None
+        self.scheduler = None
+        if backend == 'deepface':
+            try:
+                from deepface import DeepFace
+                from emotion_backends import DeepFaceBackend
+                self.DeepFace = DeepFace
+                # Build the emotion model now instead of inside the first analyze() call
+                self.emotion_backend = DeepFaceBackend(DeepFace)
+                self.deepface_available = True
+                print("[OK] DeepFace loaded successfully - Accurate emotion detection enabled")
+            except ImportError as e:
+                print(f"[WARNING] DeepFace not available: {e}")
+                print("[WARNING] Using basic emotion detection (lower accuracy)")
+            except Exception as e:
+                print(f"[WARNING] Error loading DeepFace: {e}")
+                print("[WARNING] Using basic emotion detection (lower accuracy)")
+        else:
+            # An explicitly configured exported model must load
+            from emotion_backends import build_emotion_backend
+            self.emotion_backend = build_emotion_backend(
+                backend, model_path, threads=backend_threads, quantized=quantized
+            )
+        
+        if self.emotion_backend is not None:
+            self.metrics['model_load_seconds'] = self.emotion_backend.load_seconds
+            print(f"[OK] Emotion model ({self.emotion_backend.name}) built in {self.emotion_backend.load_seconds}s")
+            
+            # Crops from concurrent requests share one model call
+            if batch_size > 1:
+                from inference_scheduler import MicroBatchScheduler
+                self.scheduler = MicroBatchScheduler(self._run_emotion_model, batch_size, batch_wait_ms)
+    
+    def warm_up(self):
+        """
+        Run synthetic inferences so the first real request is not the slow one
+        The first call pays for graph tracing and kernel selection (cold),
+        the second shows steady-state latency (warm)
+        Returns: dict with the latency metrics
+        """
+        if self.emotion_backend is None:
+            return self.get_metrics()
+        
+        # Mid-gray frame: same code path as a real request, no face required
+        frame = np.full((480, 640, 3), 128, dtype=np.uint8)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        box = [(220, 140, 200, 200)]
+        
+        timings = []
+        for _ in range(2):
+            start = time.perf_counter()
+            if self.pipeline == 'crop':
+                self._predict_emotions(self._preprocess_faces(gray, box))
+            else:
+                self.DeepFace.analyze(frame, actions=['emotion'], enforce_detection=False, silent=True)
+            timings.append(round((time.perf_counter() - start) * 1000, 1))
+        
+        if self.pipeline == 'crop' and self.deepface_available:
+            # Frames without a detected face still fall back to DeepFace.analyze
+            self.DeepFace.analyze(frame, actions=['emotion'], enforce_detection=False, silent=True)
+        
+        self.metrics['warmup_cold_ms'], self.metrics['warmup_warm_ms'] = timings
+        self.metrics['warmed_up'] = True
+        print(f"[OK] Face model warmed up (cold {timings[0]}ms, warm {timings[1]}ms)")
+        return self.get_metrics()
+    
+    def _record_latency(self, elapsed_ms):
+        """Record the latency of one detection request"""
+        elapsed_ms = round(elapsed_ms, 1)
+        with self._metrics_lock:
+            if self.metrics['first_request_ms'] is None:
+                self.metrics['first_request_ms'] = elapsed_ms
+            self.metrics['last_request_ms'] = elapsed_ms
+            self.metrics['requests'] += 1
+            self.metrics['total_request_ms'] += elapsed_ms
+    
+    def get_metrics(self):
+        """Get model load, warm-up and request latency metrics"""
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        total = metrics.pop('total_request_ms')
+        metrics['avg_request_ms'] = round(total / metrics['requests'], 1) if metrics['requests'] else None
+        metrics['backend'] = self.emotion_backend.info() if self.emotion_backend else None
+        metrics['face_detector'] = self.face_detector.info()
+        metrics['scheduler'] = self.scheduler.stats() if self.scheduler else None
+        metrics['frame_cache'] = self.frame_cache.stats() if self.frame_cache else None
+        return metrics
     
-    def detect_from_base64(self, base64_image):
+    def detect_from_base64(self, base64_image, cache_key=None):
         """
         Detect emotion from base64 encoded image
         Args:
             base64_image: Base64 encoded image string
+            cache_key: Client identifier for the frame cache (None bypasses it)
         Returns:
             dict with emotion detection results
         """
         try:
-            # Remove data URL prefix if present
-            if ',' in base64_image:
-                base64_image = base64_image.split(',')[1]
-            
-            # Decode base64 to image
-            image_data = base64.b64decode(base64_image)
-            image = Image.open(io.BytesIO(image_data))
-            
-            # Convert to numpy array
-            img_array = np.array(image)
-            
-            # Convert RGB to BGR for OpenCV
-            if len(img_array.shape) == 3 and img_array.shape[2] == 3:
-                img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-            
-            return self.detect_from_array(img_array)
-            
+            img_array = self.decode_base64_image(base64_image)
         except Exception as e:
             return {
                 'success': False,
                 'error': f'Failed to process image: {str(e)}'
             }
+        
+        return self.detect_from_array(img_array, cache_key=cache_key)
     
-    def detect_from_array(self, img_array):
+    @staticmethod
+    def decode_base64_image(base64_image):
+        """
+        Decode a base64 image (optionally a data URL) into a BGR array
+        Returns: numpy array of the image
+        """
+        # Remove data URL prefix if present
+        if ',' in base64_image:
+            base64_image = base64_image.split(',')[1]
+        
+        # Decode base64 to image
+        image_data = base64.b64decode(base64_image)
+        image = Image.open(io.BytesIO(image_data))
+        
+        # Convert to numpy array
+        img_array = np.array(image)
+        
+        # Convert RGB to BGR for OpenCV
+        if len(img_array.shape) == 3 and img_array.shape[2] == 3:
+            img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
+        
+        return img_array
+    
+    def detect_from_bytes(self, image_bytes, cache_key=None):
+        """
+        Detect emotion from encoded image bytes (JPEG, PNG, ...)
+        Decodes straight from the buffer with OpenCV: no base64, no PIL copy
+        Args:
+            image_bytes: Encoded image as bytes, bytearray or memoryview
+            cache_key: Client identifier for the frame cache (None bypasses it)
+        Returns:
+            dict with emotion detection results
+        """
+        try:
+            img_array = self.decode_image_bytes(image_bytes)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Failed to process image: {str(e)}'
+            }
+        
+        return self.detect_from_array(img_array, cache_key=cache_key)
+    
+    @staticmethod
+    def decode_image_bytes(image_bytes):
+        """
+        Decode encoded image bytes into a BGR array without intermediate copies
+        Returns: numpy array of the image
+        """
+        img_array = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img_array is None:
+            raise ValueError('not a supported image format')
+        return img_array
+    
+    def detect_from_array(self, img_array, cache_key=None):
         """
         Detect emotion from numpy array image
         Args:
             img_array: Numpy array of image
+            cache_key: Client identifier for the frame cache; a frame nearly
+                       identical to one this client sent recently returns the
+                       cached result (None bypasses the cache)
         Returns:
-            dict with emotion detection results
+            dict with emotion detection results ('cached' tells whether the
+            result came from the frame cache)
         """
+        start = time.perf_counter()
+        try:
+            use_cache = self.frame_cache is not None and cache_key is not None
+            if use_cache:
+                result = self.frame_cache.get(cache_key, img_array)
+                if result is not None:
+                    print("[DETECT] Near-identical frame, reusing cached result")
+                    result['cached'] = True
+                    return result
+            
+            result = self._detect_from_array(img_array)
+            if use_cache and result.get('success'):
+                self.frame_cache.put(cache_key, img_array, result)
+            if result.get('success'):
+                result['cached'] = False
+            return result
+        finally:
+            self._record_latency((time.perf_counter() - start) * 1000)
+    
+    def _detect_from_array(self, img_array):
+        """Run face detection and emotion analysis on one image"""
         try:
             print(f"[DETECT] Processing image array, shape: {img_array.shape}")
             
-            # Detect faces with more lenient parameters
+            # Detect faces (boxes are in full-resolution coordinates)
             gray = cv2.cvtColor(img_array, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(
-                gray,
-                scaleFactor=1.05,  # More sensitive (was 1.1)
-                minNeighbors=3,     # More lenient (was 5)
-                minSize=(20, 20)    # Smaller minimum (was 30x30)
-            )
+            faces = self.find_faces(gray, img_array)
             
-            print(f"[DETECT] Faces detected by Haar Cascade: {len(faces)}")
+            print(f"[DETECT] Faces detected by {self.face_detector.name}: {len(faces)}")
             
-            # If no faces detected by Haar Cascade, try DeepFace anyway
+            # If the face detector found nothing, try DeepFace anyway
             # DeepFace has its own face detection
             if len(faces) == 0:
-                print("[DETECT] No faces found by Haar Cascade, trying DeepFace anyway...")
+                print(f"[DETECT] No faces found by {self.face_detector.name}, trying DeepFace anyway...")
                 if self.deepface_available:
                     # Try DeepFace with enforce_detection=False
                     return self._detect_with_deepface(img_array, [])
+                elif self.emotion_backend is not None:
+                    # What DeepFace does without a face: classify the whole frame
+                    height, width = gray.shape
+                    return self._detect_with_crops(img_array, gray, np.array([[0, 0, width, height]]))
                 else:
                     return {
                         'success': False,
@@ -111,7 +419,9 @@ class FaceEmotionDetector:
                     }
             
             # Use DeepFace if available, otherwise use basic detection
-            if self.deepface_available:
+            if self.emotion_backend is not None and self.pipeline == 'crop':
+                return self._detect_with_crops(img_array, gray, faces)
+            elif self.deepface_available:
                 return self._detect_with_deepface(img_array, faces)
             else:
                 return self._detect_basic(img_array, faces)
@@ -122,6 +432,27 @@ class FaceEmotionDetector:
                 'error': f'Detection failed: {str(e)}'
             }
     
+    def find_faces(self, gray, frame=None):
+        """
+        Find faces with the configured detector backend on a resolution-capped
+        copy of the frame; boxes are mapped back so crops come from the
+        full-resolution frame
+        Args:
+            gray: Grayscale frame
+            frame: The BGR frame, if available (DNN detectors use color)
+        Returns: (N, 4) int array of x, y, w, h boxes
+        """
+        return self.face_detector.find(gray, frame)
+    
+    @property
+    def detect_max_side(self):
+        """Longest side (pixels) of the frame faces are searched in (0 = full frame)"""
+        return self.face_detector.max_side
+    
+    @detect_max_side.setter
+    def detect_max_side(self, value):
+        self.face_detector.max_side = max(0, int(value))
+    
     def _detect_with_deepface(self, img_array, faces):
         """Use DeepFace for emotion detection with enhanced mapping"""
         try:
@@ -137,37 +468,21 @@ class FaceEmotionDetector:
             
             print(f"[OK] DeepFace analysis complete")
             
-            # Handle both single face and multiple faces
-            if isinstance(result, list):
-                result = result[0]
+            # One entry per face DeepFace found (a single whole-frame entry if none)
+            if not isinstance(result, list):
+                result = [result]
             
-            emotions = result['emotion']
-            print(f"[RESULT] Raw emotions: {emotions}")
+            boxes, scores = [], []
+            for face in result:
+                emotions = {k.lower(): float(v) for k, v in face['emotion'].items()}
+                print(f"[RESULT] Raw emotions: {emotions}")
+                print(f"[RESULT] Dominant emotion: {face['dominant_emotion'].lower()}")
+                region = face.get('region') or {}
+                boxes.append([region.get(key, 0) for key in ('x', 'y', 'w', 'h')])
+                scores.append([emotions.get(label, 0.0) for label in EMOTION_LABELS])
+            face_results = self._face_results(scores, boxes)
             
-            # Get dominant emotion
-            dominant_emotion = result['dominant_emotion'].lower()
-            print(f"[RESULT] Dominant emotion: {dominant_emotion}")
-            
-            # Map DeepFace emotions to our enhanced 16-emotion system
-            enhanced_emotions = self._map_to_enhanced_emotions(emotions)
-            
-            # Get the final dominant emotion from enhanced mapping
-            final_emotion = max(enhanced_emotions, key=enhanced_emotions.get)
-            confidence = float(enhanced_emotions[final_emotion])
-            
-            print(f"[ENHANCED] Final emotion: {final_emotion} ({confidence:.1%})")
-            
-            # Count faces detected (use DeepFace's count if Haar didn't find any)
-            faces_count = len(faces) if len(faces) > 0 else 1
-            
-            return {
-                'success': True,
-                'emotion': final_emotion,
-                'confidence': round(float(confidence), 3),
-                'all_emotions': enhanced_emotions,
-                'faces_detected': int(faces_count),
-                'method': 'deepface_enhanced'
-            }
+            return self._build_result(face_results, 'deepface_enhanced')
             
         except Exception as e:
             print(f"[ERROR] DeepFace error: {str(e)}")
@@ -175,6 +490,144 @@ class FaceEmotionDetector:
             # Fallback to basic detection
             return self._detect_basic(img_array, faces)
     
+    def _detect_with_crops(self, img_array, gray, faces):
+        """
+        Run the emotion model directly on detected face crops
+        All faces go through the model as one batch, and DeepFace's own face
+        detector is skipped, so each frame pays for one detection pass
+        """
+        try:
+            print(f"[ANALYZING] {len(faces)} face crop(s) with emotion model...")
+            percentages = self.classify_faces(gray, faces)
+            for row in percentages.tolist():
+                print(f"[RESULT] Raw emotions: {dict(zip(EMOTION_LABELS, row))}")
+            face_results = self._face_results(percentages, faces)
+            
+            return self._build_result(face_results, f'{self.emotion_backend.name}_crop')
+            
+        except Exception as e:
+            print(f"[ERROR] Emotion model error: {str(e)}")
+            if not self.deepface_available:
+                return self._detect_basic(img_array, faces)
+            print(f"[WARNING] Falling back to full-frame DeepFace analysis")
+            return self._detect_with_deepface(img_array, faces)
+    
+    def classify_faces(self, gray, boxes):
+        """
+        Run the emotion model on face boxes of a grayscale frame as one batch
+        Returns: (N, 7) array of percentages in EMOTION_LABELS order
+        """
+        return self._predict_emotions(self._preprocess_faces(gray, boxes))
+    
+    def crop_faces(self, gray, boxes):
+        """
+        Cut face boxes out of a grayscale frame, preprocessed for the emotion
+        model (keep these instead of the frame when scoring later)
+        Returns: float32 array of shape (N, 48, 48, 1)
+        """
+        return self._preprocess_faces(gray, boxes)
+    
+    def detect_from_crops(self, crops, boxes, batch_size=32):
+        """
+        Emotion results for many images from their face crops
+        The crops of all images share emotion model calls of up to
+        batch_size faces (needs an emotion model backend)
+        Args:
+            crops: Per-image crop arrays from crop_faces()
+            boxes: The matching per-image face boxes
+            batch_size: Max face crops per model call
+        Returns: one result dict per image, as detect_from_array() gives
+        """
+        if not crops:
+            return []
+        batch = np.concatenate(crops)
+        scores = np.concatenate([
+            self._predict_emotions(batch[start:start + batch_size])
+            for start in range(0, len(batch), max(1, int(batch_size)))
+        ])
+        
+        method = f'{self.emotion_backend.name}_crop'
+        results = []
+        offset = 0
+        for image_boxes in boxes:
+            count = len(image_boxes)
+            results.append(self._build_result(self._face_results(scores[offset:offset + count], image_boxes), method))
+            offset += count
+        return results
+    
+    def _preprocess_faces(self, gray, boxes):
+        """
+        Crop face boxes out of a grayscale frame into an emotion model batch
+        Matches DeepFace's preprocessing: 48x48 grayscale scaled to 0..1
+        Returns: float32 array of shape (N, 48, 48, 1)
+        """
+        batch = np.empty((len(boxes), EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE, 1), dtype=np.float32)
+        for i, (x, y, w, h) in enumerate(boxes):
+            batch[i, :, :, 0] = cv2.resize(gray[y:y + h, x:x + w], (EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE))
+        batch /= 255.0
+        return batch
+    
+    def _run_emotion_model(self, batch):
+        """Run the emotion model on a preprocessed batch, returning softmax rows"""
+        return self.emotion_backend.predict(batch)
+    
+    def _predict_emotions(self, batch):
+        """
+        Run the emotion model on a preprocessed batch (through the scheduler if enabled)
+        Returns: (N, 7) array of percentages in EMOTION_LABELS order, as DeepFace reports them
+        """
+        if self.scheduler is not None:
+            predictions = self.scheduler.submit(batch)
+        else:
+            predictions = self._run_emotion_model(batch)
+        return 100 * predictions / predictions.sum(axis=1, keepdims=True)
+    
+    def _face_results(self, scores, boxes):
+        """
+        Map raw 7-class scores of N faces to their 16-emotion results
+        Args:
+            scores: (N, 7) scores in EMOTION_LABELS order
+            boxes: N face boxes as x, y, w, h
+        """
+        # Map DeepFace emotions to our enhanced 16-emotion system, all faces at once
+        enhanced = project_emotions(scores)
+        
+        # Get the final dominant emotion from enhanced mapping
+        dominant = enhanced.argmax(axis=1)
+        
+        face_results = []
+        for box, row, best in zip(boxes, enhanced.tolist(), dominant.tolist()):
+            final_emotion = ENHANCED_LABELS[best]
+            confidence = row[best]
+            print(f"[ENHANCED] Final emotion: {final_emotion} ({confidence:.1%})")
+            
+            x, y, w, h = (int(v) for v in box)
+            face_results.append({
+                'box': {'x': x, 'y': y, 'w': w, 'h': h},
+                'emotion': final_emotion,
+                'confidence': confidence,
+                'all_emotions': dict(zip(ENHANCED_LABELS, row))
+            })
+        return face_results
+    
+    def _build_result(self, face_results, method):
+        """
+        Build the API result from per-face results
+        The largest face is the subject reported in the top-level fields
+        """
+        face_results = sorted(face_results, key=lambda face: face['box']['w'] * face['box']['h'], reverse=True)
+        primary = face_results[0]
+        
+        return {
+            'success': True,
+            'emotion': primary['emotion'],
+            'confidence': primary['confidence'],
+            'all_emotions': primary['all_emotions'],
+            'faces_detected': len(face_results),
+            'faces': face_results,
+            'method': method
+        }
+    
     def _map_to_enhanced_emotions(self, deepface_emotions):
         """
         Map DeepFace's 7 emotions to our 16-emotion system
@@ -182,6 +635,8 @@ class FaceEmotionDetector:
         We enhance to: happy, excited, content, calm, sad, tired, bored, 
                        angry, frustrated, disgust, fear, anxious, worried, 
                        surprise, confused, neutral
+        Per-face reference for project_emotions(), which the detection
+        paths use to map all faces of a frame in one call
         """
         # Normalize DeepFace scores
         total = sum(deepface_emotions.values())
@@ -345,4 +800,5 @@ if __name__ == '__main__':
     detector = FaceEmotionDetector()
     print("Face Emotion Detector initialized")
     print(f"DeepFace available: {detector.deepface_available}")
+    print(f"Warm-up metrics: {detector.warm_up()}")
     print("\nReady to detect emotions from facial expressions!")
@@ -0,0 +1,205 @@
+"""
+Real-time face emotion streaming
+One FaceStreamSession per connected client: full face detection only on
+keyframes, cheap template tracking of face boxes in between, the emotion
+model at a capped rate and exponentially smoothed per-face emotions
+"""
+import time
+
+import cv2
+import numpy as np
+
+from face_emotion_detector import ENHANCED_LABELS, project_emotions
+
+# Longest side of the frame used for tracking between keyframes
+TRACK_MAX_SIDE = 320
+
+# Minimum normalized correlation for a tracked face to count as found
+TRACK_MIN_SCORE = 0.5
+
+# Minimum overlap for a keyframe detection to continue an existing track
+TRACK_MIN_IOU = 0.3
+
+
+def box_iou(a, b):
+    """Intersection over union of two x, y, w, h boxes"""
+    overlap_w = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    overlap_h = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    if overlap_w <= 0 or overlap_h <= 0:
+        return 0.0
+    overlap = overlap_w * overlap_h
+    return overlap / float(a[2] * a[3] + b[2] * b[3] - overlap)
+
+
+class FaceTrack:
+    """One face followed across frames"""
+
+    __slots__ = ('id', 'box', 'template', 'scores')
+
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = tuple(int(v) for v in box)  # Full-resolution x, y, w, h
+        self.template = None  # Face patch in the tracking frame
+        self.scores = None  # Smoothed 7-class percentages
+
+
+class FaceStreamSession:
+    """Per-connection streaming state on top of a shared FaceEmotionDetector"""
+
+    def __init__(self, detector, keyframe_interval=10, emotion_fps=5.0, smoothing=0.6):
+        """
+        Initialize the session
+        Args:
+            detector: Loaded FaceEmotionDetector (shared between sessions)
+            keyframe_interval: Run full face detection every N frames
+            emotion_fps: Max emotion model runs per second (0 = every frame)
+            smoothing: Weight of the previous emotion scores in the moving
+                       average (0 = no smoothing)
+        """
+        self.detector = detector
+        self.keyframe_interval = max(1, int(keyframe_interval))
+        self.emotion_interval = 1.0 / emotion_fps if emotion_fps > 0 else 0.0
+        self.smoothing = min(max(float(smoothing), 0.0), 0.95)
+        self.tracks = []
+        self.frames = 0
+        self.keyframes = 0
+        self.emotion_runs = 0
+        self._next_track_id = 1
+        self._force_keyframe = True
+        self._last_emotion_run = None
+        self._started = time.perf_counter()
+
+    def process_bytes(self, image_bytes):
+        """Decode an encoded frame (JPEG/PNG bytes) and process it"""
+        return self.process(self.detector.decode_image_bytes(image_bytes))
+
+    def process(self, frame):
+        """
+        Process one BGR frame
+        Returns: update dict with per-face boxes and smoothed emotions
+        """
+        start = time.perf_counter()
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        height, width = gray.shape
+        scale = min(1.0, TRACK_MAX_SIDE / max(height, width))
+        small = gray if scale == 1.0 else cv2.resize(
+            gray, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA
+        )
+
+        keyframe = self._force_keyframe or self.frames % self.keyframe_interval == 0
+        if keyframe:
+            self._detect(gray)
+            self.keyframes += 1
+        else:
+            self._track(small, scale)
+        self._update_templates(small, scale)
+
+        # Emotion model at a capped rate, and right away for new faces
+        now = time.perf_counter()
+        due = self._last_emotion_run is None or now - self._last_emotion_run >= self.emotion_interval
+        new_faces = any(track.scores is None for track in self.tracks)
+        emotion_updated = bool(self.tracks) and (due or new_faces)
+        if emotion_updated:
+            self._classify(gray)
+            self._last_emotion_run = now
+
+        self.frames += 1
+        elapsed = time.perf_counter() - self._started
+        return {
+            'type': 'update',
+            'frame': self.frames - 1,
+            'keyframe': keyframe,
+            'emotion_updated': emotion_updated,
+            'faces': self._face_states(),
+            'faces_detected': len(self.tracks),
+            'latency_ms': round((time.perf_counter() - start) * 1000, 1),
+            'fps': round(self.frames / elapsed, 1) if elapsed > 0 else None
+        }
+
+    def _detect(self, gray):
+        """Keyframe: full face detection, matched to existing tracks by overlap"""
+        self._force_keyframe = False
+        tracks = []
+        unmatched = list(self.tracks)
+        for box in self.detector.find_faces(gray):
+            best = max(unmatched, key=lambda track: box_iou(track.box, box), default=None)
+            if best is not None and box_iou(best.box, box) >= TRACK_MIN_IOU:
+                unmatched.remove(best)
+                best.box = tuple(int(v) for v in box)
+                tracks.append(best)
+            else:
+                tracks.append(FaceTrack(self._next_track_id, box))
+                self._next_track_id += 1
+        self.tracks = tracks
+
+    def _track(self, small, scale):
+        """Between keyframes: find each face near its last position by template matching"""
+        height, width = small.shape
+        for track in self.tracks:
+            if track.template is None:
+                self._force_keyframe = True
+                continue
+            th, tw = track.template.shape
+            x, y = round(track.box[0] * scale), round(track.box[1] * scale)
+
+            # Search window: the last box grown by half its size on each side
+            left, top = max(0, x - tw // 2), max(0, y - th // 2)
+            right, bottom = min(width, x + tw + tw // 2), min(height, y + th + th // 2)
+            window = small[top:bottom, left:right]
+            if window.shape[0] < th or window.shape[1] < tw:
+                self._force_keyframe = True
+                continue
+
+            _, score, _, (dx, dy) = cv2.minMaxLoc(cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED))
+            if score < TRACK_MIN_SCORE:
+                # Lost the face: detect again on the next frame
+                self._force_keyframe = True
+                continue
+
+            track.box = (round((left + dx) / scale), round((top + dy) / scale), track.box[2], track.box[3])
+
+    def _update_templates(self, small, scale):
+        """Refresh each face's template from its current box"""
+        for track in self.tracks:
+            x, y, w, h = (round(v * scale) for v in track.box)
+            template = small[y:y + h, x:x + w]
+            track.template = template if template.size else track.template
+
+    def _classify(self, gray):
+        """Run the emotion model on every tracked face as one batch and smooth the scores"""
+        percentages = self.detector.classify_faces(gray, [track.box for track in self.tracks])
+        self.emotion_runs += 1
+        for track, scores in zip(self.tracks, percentages):
+            if track.scores is None or not self.smoothing:
+                track.scores = scores
+            else:
+                track.scores = self.smoothing * track.scores + (1 - self.smoothing) * scores
+
+    def _face_states(self):
+        """Public view of the scored tracks: box plus enhanced emotion distribution"""
+        tracks = [track for track in self.tracks if track.scores is not None]
+        if not tracks:
+            return []
+        enhanced = project_emotions(np.stack([track.scores for track in tracks]))
+        states = []
+        for track, row, best in zip(tracks, enhanced.tolist(), enhanced.argmax(axis=1).tolist()):
+            x, y, w, h = track.box
+            states.append({
+                'id': track.id,
+                'box': {'x': x, 'y': y, 'w': w, 'h': h},
+                'emotion': ENHANCED_LABELS[best],
+                'confidence': row[best],
+                'all_emotions': dict(zip(ENHANCED_LABELS, row))
+            })
+        return states
+
+    def stats(self):
+        """Get frame, keyframe and emotion-run counts for this session"""
+        elapsed = time.perf_counter() - self._started
+        return {
+            'frames': self.frames,
+            'keyframes': self.keyframes,
+            'emotion_runs': self.emotion_runs,
+            'tracks': len(self.tracks),
+            'fps': round(self.frames / elapsed, 1) if elapsed > 0 else None
+        }
@@ -0,0 +1,471 @@
+"""
+Process pool for face emotion inference
+Each worker process holds its own loaded FaceEmotionDetector, so TensorFlow
+and OpenCV work runs outside the web process and its GIL. Decoded frames
+reach the workers through shared memory; only small task tuples and result
+dicts are pickled. Workers that crash are restarted in the background.
+"""
+import atexit
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import connection, shared_memory
+
+import numpy as np
+
+from face_emotion_detector import FaceEmotionDetector
+from metrics import Histogram
+
+# Detector methods a worker runs on request
+WORKER_METHODS = ('detect_from_array', 'find_faces', 'classify_faces', 'get_metrics')
+
+ROUND_TRIP_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Restart delay after a worker fails to start, doubled per consecutive failure
+RESTART_BACKOFF = 1.0
+RESTART_BACKOFF_MAX = 30.0
+
+
+def _worker_main(conn, detector_kwargs, threads, niceness):
+    """
+    Worker process: load a detector, then run tasks from conn until told to stop
+    Tasks run on a few threads so concurrent requests can share model batches
+    """
+    # Shutdown is driven by the web process, not by Ctrl+C on the process group
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Lower priority so request threads in the web process win the CPU
+    if niceness and hasattr(os, 'nice'):
+        os.nice(niceness)
+    try:
+        detector = FaceEmotionDetector(**detector_kwargs)
+        detector.warm_up()
+    except Exception as e:
+        conn.send((None, 'failed', str(e)))
+        raise SystemExit(1)
+
+    send_lock = threading.Lock()
+
+    def reply(message):
+        with send_lock:
+            conn.send(message)
+
+    def run(task_id, method, frame_spec, kwargs):
+        try:
+            if method not in WORKER_METHODS:
+                raise ValueError(f"unknown worker method '{method}'")
+            if frame_spec is None:
+                result = getattr(detector, method)(**kwargs)
+            else:
+                name, shape, dtype = frame_spec
+                shm = shared_memory.SharedMemory(name=name)
+                try:
+                    frame = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+                    result = getattr(detector, method)(frame, **kwargs)
+                    del frame  # Release the buffer before closing the mapping
+                finally:
+                    shm.close()
+            reply((task_id, 'ok', result))
+        except Exception as e:
+            reply((task_id, 'error', f'{type(e).__name__}: {e}'))
+
+    reply((None, 'ready', os.getpid()))
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='face-task') as executor:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:  # Web process went away
+                break
+            if message is None:
+                break
+            executor.submit(run, *message)
+
+
+class _Task:
+    """One request waiting for a worker's reply"""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Worker:
+    """Web-process handle for one worker slot (survives restarts)"""
+
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.send_lock = threading.Lock()
+        self.state = 'stopped'  # starting -> ready, or restarting after an exit
+        self.pid = None
+        self.pending = {}  # task id -> _Task
+        self.tasks = 0
+        self.restarts = 0
+        self.failures = 0  # Consecutive failed starts
+        self.restart_at = None
+        self.error = None
+
+
+class FaceWorkerPool:
+    """
+    Face detection served by a pool of worker processes
+    Offers the FaceEmotionDetector methods the app and stream sessions use,
+    so it can stand in for an in-process detector.
+    """
+
+    def __init__(self, size=2, detector_kwargs=None, threads=4, niceness=10, timeout=30.0, start_timeout=600.0):
+        """
+        Initialize the pool and start the workers
+        Args:
+            size: Number of worker processes
+            detector_kwargs: FaceEmotionDetector arguments for every worker
+            threads: Concurrent tasks per worker (lets its micro-batcher fill batches)
+            niceness: Scheduling priority decrease for workers (0 = same as the web process)
+            timeout: Seconds a request waits for its result
+            start_timeout: Seconds warm_up() waits for the workers to load
+        """
+        self.size = max(1, int(size))
+        self.detector_kwargs = dict(detector_kwargs or {})
+        self.threads = max(1, int(threads))
+        self.niceness = max(0, int(niceness))
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.round_trip_ms = Histogram(ROUND_TRIP_BUCKETS_MS)
+        # spawn: forking a process with TensorFlow or request threads loaded is unsafe
+        self._context = multiprocessing.get_context('spawn')
+        self._workers = [_Worker(index) for index in range(self.size)]
+        self._task_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._state_changed = threading.Condition(self._lock)
+        self._closed = False
+
+        with self._lock:
+            for worker in self._workers:
+                self._start(worker)
+        self._monitor_thread = threading.Thread(target=self._monitor, name='face-pool-monitor', daemon=True)
+        self._monitor_thread.start()
+        atexit.register(self.close)
+
+    def _start(self, worker):
+        """Spawn a process for a worker slot (called with the lock held)"""
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.detector_kwargs, self.threads, self.niceness),
+            name=f'face-worker-{worker.index}',
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        worker.process, worker.conn, worker.pid = process, parent_conn, process.pid
+        worker.state = 'starting'
+        worker.restart_at = None
+        print(f"[POOL] Started face worker {worker.index} (pid {process.pid})")
+
+    def warm_up(self):
+        """
+        Block until every worker has loaded its detector
+        Raises RuntimeError (and shuts the pool down) if a worker cannot start
+        """
+        deadline = time.monotonic() + self.start_timeout
+        with self._lock:
+            while not all(worker.state == 'ready' for worker in self._workers):
+                failed = next((worker for worker in self._workers if worker.failures), None)
+                remaining = deadline - time.monotonic()
+                if failed is not None or remaining <= 0:
+                    break
+                self._state_changed.wait(remaining)
+            else:
+                return
+
+        self.close()
+        if failed is not None:
+            raise RuntimeError(f'Face worker {failed.index} failed to start: {failed.error}')
+        raise RuntimeError(f'Face workers did not start within {self.start_timeout}s')
+
+    def _monitor(self):
+        """Route worker replies to waiting requests and restart exited workers"""
+        while not self._closed:
+            with self._lock:
+                waitables = {}
+                for worker in self._workers:
+                    if worker.process is not None:
+                        waitables[worker.conn] = worker
+                        waitables[worker.process.sentinel] = worker
+                restart_times = [worker.restart_at for worker in self._workers if worker.restart_at is not None]
+
+            timeout = 0.5
+            if restart_times:
+                timeout = min(timeout, max(0.0, min(restart_times) - time.monotonic()))
+            for ready in connection.wait(list(waitables), timeout):
+                worker = waitables[ready]
+                if ready is worker.conn:
+                    self._receive(worker)
+                else:
+                    self._on_exit(worker)
+            self._restart_due()
+
+    def _receive(self, worker):
+        """Handle every reply waiting on a worker's connection"""
+        conn = worker.conn
+        try:
+            while conn is not None and conn.poll():
+                task_id, status, payload = conn.recv()
+                with self._lock:
+                    if status == 'ready':
+                        worker.state, worker.pid, worker.failures, worker.error = 'ready', payload, 0, None
+                        self._state_changed.notify_all()
+                        print(f"[POOL] Face worker {worker.index} ready")
+                        continue
+                    if status == 'failed':
+                        worker.error = payload
+                        continue
+                    task = worker.pending.pop(task_id, None)
+                if task is None:  # Timed out already
+                    continue
+                if status == 'ok':
+                    task.result = payload
+                else:
+                    task.error = payload
+                task.done.set()
+        except (EOFError, OSError):
+            self._on_exit(worker)
+
+    def _on_exit(self, worker, conn=None):
+        """
+        Fail a dead worker's in-flight tasks and schedule its restart
+        With conn, only if that is still the worker's connection (not a
+        restarted process's)
+        """
+        with self._lock:
+            process = worker.process
+            if process is None or (conn is not None and worker.conn is not conn):
+                return
+            process.join(timeout=1)
+            worker.conn.close()
+            worker.process = worker.conn = None
+            pending, worker.pending = worker.pending, {}
+
+            if worker.state == 'ready':
+                worker.failures = 0
+            else:
+                worker.failures += 1
+            delay = 0.0 if not worker.failures else min(RESTART_BACKOFF_MAX, RESTART_BACKOFF * 2 ** (worker.failures - 1))
+            worker.state = 'restarting'
+            worker.restart_at = None if self._closed else time.monotonic() + delay
+            self._state_changed.notify_all()
+
+        if not self._closed:
+            print(f"[POOL] Face worker {worker.index} exited with code {process.exitcode}; "
+                  f"restarting in {delay:.0f}s")
+        for task in pending.values():
+            task.error = f'Face worker {worker.index} exited with code {process.exitcode}'
+            task.done.set()
+
+    def _restart_due(self):
+        """Restart workers whose backoff has passed"""
+        with self._lock:
+            now = time.monotonic()
+            for worker in self._workers:
+                if worker.restart_at is not None and worker.restart_at <= now and not self._closed:
+                    worker.restarts += 1
+                    self._start(worker)
+
+    def _pick(self, route):
+        """
+        Choose a worker (called with the lock held)
+        Requests with a route key (the frame cache client) stick to one
+        worker so its cache sees them, unless that worker already has a
+        full load of tasks; others go to the least busy worker.
+        """
+        alive = [worker for worker in self._workers if worker.conn is not None]
+        candidates = [worker for worker in alive if worker.state == 'ready'] or alive
+        if not candidates:
+            raise RuntimeError('No face workers available (restarting)')
+        if route is not None:
+            preferred = self._workers[hash(route) % self.size]
+            # A busy worker loses its cache hit to spreading the load
+            if preferred in candidates and len(preferred.pending) < self.threads:
+                return preferred
+        return min(candidates, key=lambda worker: len(worker.pending))
+
+    def _call(self, method, frame=None, route=None, **kwargs):
+        """
+        Run a detector method in a worker and wait for its result
+        The frame, if any, is copied into a shared memory block for the call
+        """
+        if self._closed:
+            raise RuntimeError('Face worker pool is closed')
+
+        start = time.perf_counter()
+        shm = frame_spec = None
+        if frame is not None:
+            frame = np.ascontiguousarray(frame)
+            shm = shared_memory.SharedMemory(create=True, size=max(1, frame.nbytes))
+            np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf)[...] = frame
+            frame_spec = (shm.name, frame.shape, frame.dtype.str)
+
+        try:
+            # A worker that died since it was picked is marked dead and another one tried
+            for _ in range(self.size):
+                task = _Task()
+                with self._lock:
+                    worker = self._pick(route)
+                    task_id = next(self._task_ids)
+                    worker.pending[task_id] = task
+                    worker.tasks += 1
+                    conn = worker.conn
+                if self._send(worker, conn, (task_id, method, frame_spec, kwargs)):
+                    break
+            else:
+                raise RuntimeError('No face workers available (restarting)')
+
+            if not task.done.wait(self.timeout):
+                with self._lock:
+                    worker.pending.pop(task_id, None)
+                raise TimeoutError(f'Face worker {worker.index} did not answer within {self.timeout}s')
+            if task.error is not None:
+                raise RuntimeError(task.error)
+            return task.result
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            self.round_trip_ms.observe((time.perf_counter() - start) * 1000)
+
+    def _send(self, worker, conn, message):
+        """
+        Send a task to a worker
+        Returns: False if the worker has exited or its pipe is broken (the
+        worker is then handled as exited and restarted)
+        """
+        with self._lock:
+            process = worker.process if worker.conn is conn else None
+        try:
+            # The first write to a just-killed worker's pipe still succeeds: check it is alive
+            if process is None or connection.wait([process.sentinel], 0):
+                raise BrokenPipeError(f'face worker {worker.index} has exited')
+            with worker.send_lock:
+                conn.send(message)
+            return True
+        except (OSError, ValueError):
+            self._on_exit(worker, conn)
+            return False
+
+    # FaceEmotionDetector interface used by the app and stream sessions
+
+    decode_base64_image = staticmethod(FaceEmotionDetector.decode_base64_image)
+    decode_image_bytes = staticmethod(FaceEmotionDetector.decode_image_bytes)
+
+    def detect_from_base64(self, base64_image, cache_key=None):
+        """Decode a base64 image here and detect emotion in a worker"""
+        try:
+            img_array = self.decode_base64_image(base64_image)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Failed to process image: {str(e)}'
+            }
+        return self.detect_from_array(img_array, cache_key=cache_key)
+
+    def detect_from_bytes(self, image_bytes, cache_key=None):
+        """Decode encoded image bytes here and detect emotion in a worker"""
+        try:
+            img_array = self.decode_image_bytes(image_bytes)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Failed to process image: {str(e)}'
+            }
+        return self.detect_from_array(img_array, cache_key=cache_key)
+
+    def detect_from_array(self, img_array, cache_key=None):
+        """Detect emotion in a BGR frame (the worker is chosen by cache_key)"""
+        return self._call('detect_from_array', img_array, route=cache_key, cache_key=cache_key)
+
+    def find_faces(self, gray):
+        """Face boxes in a grayscale frame, found by a worker"""
+        return self._call('find_faces', gray)
+
+    def classify_faces(self, gray, boxes):
+        """Emotion percentages for face boxes of a grayscale frame, from a worker"""
+        return self._call('classify_faces', gray, boxes=[tuple(int(v) for v in box) for box in boxes])
+
+    def get_metrics(self):
+        """Pool state plus each ready worker's detector metrics"""
+        with self._lock:
+            workers = [{
+                'index': worker.index,
+                'pid': worker.pid,
+                'state': worker.state,
+                'in_flight': len(worker.pending),
+                'tasks': worker.tasks,
+                'restarts': worker.restarts,
+                'error': worker.error
+            } for worker in self._workers]
+
+        for worker, info in zip(self._workers, workers):
+            info['metrics'] = None
+            if info['state'] == 'ready':
+                try:
+                    info['metrics'] = self._call_on(worker, 'get_metrics')
+                except (RuntimeError, TimeoutError):
+                    pass
+
+        return {
+            'pool_size': self.size,
+            'threads_per_worker': self.threads,
+            'niceness': self.niceness,
+            'timeout': self.timeout,
+            'restarts': sum(info['restarts'] for info in workers),
+            'round_trip_ms': self.round_trip_ms.snapshot(),
+            'workers': workers
+        }
+
+    def _call_on(self, worker, method):
+        """Run a frameless method on one specific worker"""
+        task = _Task()
+        with self._lock:
+            if worker.conn is None:
+                raise RuntimeError(f'Face worker {worker.index} is not running')
+            task_id = next(self._task_ids)
+            worker.pending[task_id] = task
+            conn = worker.conn
+        if not self._send(worker, conn, (task_id, method, None, {})):
+            raise RuntimeError(f'Face worker {worker.index} is not running')
+        if not task.done.wait(min(self.timeout, 5.0)):
+            with self._lock:
+                worker.pending.pop(task_id, None)
+            raise TimeoutError(f'Face worker {worker.index} did not answer')
+        if task.error is not None:
+            raise RuntimeError(task.error)
+        return task.result
+
+    def close(self):
+        """Stop all workers (in-flight requests get an error)"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            workers = [(worker, worker.process, worker.conn) for worker in self._workers if worker.process]
+
+        for worker, process, conn in workers:
+            try:
+                with worker.send_lock:
+                    conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for worker, process, conn in workers:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+                process.join(timeout=5)
+            self._on_exit(worker)
+        self._monitor_thread.join(timeout=2)
@@ -0,0 +1,190 @@
+"""
+Fast sentiment scoring for EmotionDetector
+Scores an already-tokenized word list against TextBlob's pattern lexicon,
+which is loaded once per process into a flat hash-indexed table
+"""
+import threading
+
+_lexicon = None
+_lexicon_lock = threading.Lock()
+
+
+def load_sentiment_lexicon():
+    """
+    Load TextBlob's pattern sentiment lexicon into a flat lookup table
+    Returns: dict with 'words' {word: (polarity, subjectivity, intensity, is_modifier)},
+             'negations', 'emoticons' {emoticon: polarity} and 'punctuation'
+    """
+    global _lexicon
+
+    with _lexicon_lock:
+        if _lexicon is None:
+            from textblob.en import sentiment
+            from textblob._text import EMOTICONS, PUNCTUATION
+
+            # Touching the lazy dict parses en-sentiment.xml
+            len(sentiment)
+
+            words = {}
+            for word, senses in dict.items(sentiment):
+                polarity, subjectivity, intensity = senses[None]
+                is_modifier = any(pos in senses for pos in sentiment.modifiers)
+                words[word] = (polarity, subjectivity, intensity, is_modifier)
+
+            emoticons = {}
+            for (_, polarity), faces in EMOTICONS.items():
+                for face in faces:
+                    emoticons.setdefault(face.lower(), polarity)
+
+            _lexicon = {
+                'words': words,
+                'negations': frozenset(sentiment.negations),
+                'emoticons': emoticons,
+                'punctuation': PUNCTUATION
+            }
+
+    return _lexicon
+
+
+class FastSentimentScorer:
+    """
+    Pattern-lexicon sentiment scorer that works on a token list
+    Follows the assessment rules of TextBlob's PatternAnalyzer (modifiers,
+    negation, exclamation boost, emoticons) without re-tokenizing the text
+    or constructing a TextBlob per call.
+    """
+
+    def __init__(self):
+        """Load (or reuse) the shared lexicon table"""
+        lexicon = load_sentiment_lexicon()
+        self.words = lexicon['words']
+        self.negations = lexicon['negations']
+        self.emoticons = lexicon['emoticons']
+        self.punctuation = lexicon['punctuation']
+
+    def score(self, tokens):
+        """
+        Score a list of lowercase tokens
+        Returns: (polarity, subjectivity) with polarity in -1..1
+                 and subjectivity in 0..1
+        """
+        polarity, subjectivity, count = self.totals(tokens)
+        if not count:
+            return 0.0, 0.0
+        return polarity / float(count), subjectivity / float(count)
+
+    def totals(self, tokens):
+        """
+        Sum the assessments of a list of lowercase tokens
+        Returns: (polarity sum, subjectivity sum, assessment count)
+        """
+        accumulator = SentimentAccumulator(self)
+        accumulator.feed(tokens)
+        return accumulator.totals()
+
+
+class SentimentAccumulator:
+    """
+    Incremental form of FastSentimentScorer for token streams
+    Feeding a text in several pieces gives the same totals as scoring it
+    at once: modifier/negation state and the last assessment (which a
+    later "!" or modified word can still change) carry over between
+    feed() calls, while earlier assessments are summed and dropped.
+    """
+
+    def __init__(self, scorer):
+        """Start an empty stream scored with scorer's lexicon"""
+        self.scorer = scorer
+        self.last = None  # Latest assessment: [polarity, subjectivity, intensity, negated]
+        self.modifier = None  # Preceding modifier ("really good")
+        self.negation = None  # Preceding negation ("not good")
+        self.polarity = 0
+        self.subjectivity = 0
+        self.count = 0
+
+    def _append(self, assessment):
+        """Finalize the previous assessment and make assessment the latest"""
+        if self.last is not None:
+            self._add(self.last)
+        self.last = assessment
+
+    def _add(self, assessment):
+        """Add a final assessment to the running sums"""
+        p, s, _, negated = assessment
+        # "not good" = slightly bad, "not bad" = slightly good
+        self.polarity += p * -0.5 if negated else p
+        self.subjectivity += s
+        self.count += 1
+
+    def feed(self, tokens):
+        """Score the next lowercase tokens of the stream"""
+        words = self.scorer.words
+        negations = self.scorer.negations
+        emoticons = self.scorer.emoticons
+        punctuation = self.scorer.punctuation
+        modifier = self.modifier
+        negation = self.negation
+
+        for word in tokens:
+            entry = words.get(word)
+
+            if entry is not None:
+                polarity, subjectivity, intensity, is_modifier = entry
+
+                if modifier is None:
+                    self._append([polarity, subjectivity, intensity, False])
+                else:
+                    last = self.last
+                    last[0] = max(-1.0, min(polarity * last[2], +1.0))
+                    last[1] = max(-1.0, min(subjectivity * last[2], +1.0))
+                    last[2] = intensity
+
+                if negation is not None:
+                    self.last[2] = 1.0 / self.last[2]
+                    self.last[3] = True
+
+                modifier = word if is_modifier else None
+                negation = word if word in negations else None
+                continue
+
+            # Unknown word may be a negation ("not good")
+            if word in negations:
+                negation = word
+            # Retain negation across small words ("not a good")
+            elif negation and len(word.strip("'")) > 1:
+                negation = None
+
+            # Negation preceded by an -ly modifier ("really not good")
+            if negation is not None and modifier is not None and modifier.endswith('ly'):
+                self.last[3] = True
+                negation = None
+            # Retain modifier across small words ("really is a good")
+            elif modifier and len(word) > 2:
+                modifier = None
+
+            # Exclamation marks boost previous word
+            if word == '!' and self.last is not None:
+                self.last[0] = max(-1.0, min(self.last[0] * 1.25, +1.0))
+
+            # Exclamation marks in parentheses indicate sarcasm
+            if word == '(!)':
+                self._append([0.0, 1.0, 1.0, False])
+
+            if not word.isalpha() and len(word) <= 5 and word not in punctuation:
+                if word in emoticons:
+                    self._append([emoticons[word], 1.0, 1.0, False])
+
+        self.modifier = modifier
+        self.negation = negation
+
+    def totals(self):
+        """
+        Get the sums for everything fed so far
+        Returns: (polarity sum, subjectivity sum, assessment count)
+        """
+        if self.last is None:
+            return self.polarity, self.subjectivity, self.count
+
+        p, s, _, negated = self.last
+        polarity = self.polarity + (p * -0.5 if negated else p)
+        return polarity, self.subjectivity + s, self.count + 1
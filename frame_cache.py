@@ -0,0 +1,159 @@
+"""
+Perceptual-hash frame cache for face emotion detection
+Near-identical consecutive frames from the same client (someone sitting
+still in front of a webcam) reuse the previous result instead of running
+face detection and the emotion model again
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Grow the cached face region by this fraction of its size on each side
+REGION_MARGIN = 0.25
+
+
+def dhash(gray, hash_size=8):
+    """
+    Difference hash of a grayscale image
+    Returns: int with hash_size * hash_size bits, one per horizontal gradient sign
+    """
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming_distance(a, b):
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count('1')
+
+
+def face_region(shape, faces):
+    """
+    Region of a frame covering all face boxes plus a margin
+    Returns: (x, y, w, h), or the whole frame when there are no boxes
+    """
+    height, width = shape[:2]
+    if not faces:
+        return 0, 0, width, height
+
+    left = min(face['box']['x'] for face in faces)
+    top = min(face['box']['y'] for face in faces)
+    right = max(face['box']['x'] + face['box']['w'] for face in faces)
+    bottom = max(face['box']['y'] + face['box']['h'] for face in faces)
+    margin_x = int((right - left) * REGION_MARGIN)
+    margin_y = int((bottom - top) * REGION_MARGIN)
+    left, top = max(0, left - margin_x), max(0, top - margin_y)
+    right, bottom = min(width, right + margin_x), min(height, bottom + margin_y)
+    return left, top, right - left, bottom - top
+
+
+class FrameHashCache:
+    """
+    Per-client cache of detection results keyed on a perceptual hash
+    Each client keeps its most recent results together with the region of
+    the frame they came from; a new frame hits when the same region hashes
+    within max_distance bits of a cached one.
+    """
+
+    def __init__(self, max_clients=1024, entries_per_client=4, ttl=5.0, max_distance=5):
+        """
+        Initialize the cache
+        Args:
+            max_clients: Clients kept (least recently seen are evicted)
+            entries_per_client: Recent results kept per client
+            ttl: Seconds a cached result stays valid, or None for no expiry
+            max_distance: Max Hamming distance (of 64 bits) for a hit
+        """
+        self.max_clients = max(0, int(max_clients))
+        self.entries_per_client = max(1, int(entries_per_client))
+        self.ttl = ttl
+        self.max_distance = int(max_distance)
+        self._clients = OrderedDict()  # client -> [(expires_at, shape, region, hash, result), ...]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _region_hash(img_array, region):
+        """dHash of one region of a BGR frame"""
+        x, y, w, h = region
+        crop = img_array[y:y + h, x:x + w]
+        if crop.ndim == 3:
+            crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        return dhash(crop)
+
+    def get(self, client, img_array):
+        """
+        Look up a result for a frame from client
+        Returns: a copy of the cached result, or None on a miss
+        """
+        with self._lock:
+            entries = self._clients.get(client)
+            if entries is not None:
+                self._clients.move_to_end(client)
+                now = time.monotonic()
+                fresh = [entry for entry in entries if entry[0] is None or entry[0] > now]
+                self.expirations += len(entries) - len(fresh)
+                entries[:] = fresh
+            snapshot = list(entries or ())
+
+        # Hash outside the lock; entries are immutable tuples
+        for _, shape, region, frame_hash, result in reversed(snapshot):
+            if shape != img_array.shape:
+                continue
+            if hamming_distance(self._region_hash(img_array, region), frame_hash) <= self.max_distance:
+                with self._lock:
+                    self.hits += 1
+                return copy.deepcopy(result)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, client, img_array, result):
+        """Store a copy of result for the region of img_array its faces cover"""
+        if self.max_clients == 0:
+            return
+
+        region = face_region(img_array.shape, result.get('faces'))
+        if region[2] <= 0 or region[3] <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        entry = (expires_at, img_array.shape, region, self._region_hash(img_array, region), copy.deepcopy(result))
+
+        with self._lock:
+            entries = self._clients.setdefault(client, [])
+            self._clients.move_to_end(client)
+            entries.append(entry)
+            del entries[:-self.entries_per_client]
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all entries (counters are kept)"""
+        with self._lock:
+            self._clients.clear()
+
+    def stats(self):
+        """Get cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'clients': len(self._clients),
+                'entries': sum(len(entries) for entries in self._clients.values()),
+                'max_clients': self.max_clients,
+                'ttl': self.ttl,
+                'max_distance': self.max_distance,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
@@ -0,0 +1,131 @@
+"""
+Dynamic micro-batching for face emotion inference
+Face crops submitted by concurrent requests are queued and run through the
+emotion model as one batch, flushed when the batch is full or the oldest
+crop has waited long enough
+"""
+import queue
+import threading
+import time
+
+import numpy as np
+
+from metrics import Histogram
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+QUEUE_WAIT_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 250)
+
+
+class _Pending:
+    """One submitted batch waiting for its predictions"""
+
+    __slots__ = ('inputs', 'enqueued', 'done', 'result', 'error')
+
+    def __init__(self, inputs):
+        self.inputs = inputs
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatchScheduler:
+    """
+    Runs predict() on batches assembled from concurrent submit() calls
+    A single daemon thread owns the model, so predict() is never called
+    concurrently.
+    """
+
+    def __init__(self, predict, max_batch_size=16, max_wait_ms=10):
+        """
+        Initialize the scheduler
+        Args:
+            predict: Callable mapping an (N, ...) input array to an (N, ...) output array
+            max_batch_size: Flush once this many rows are queued
+            max_wait_ms: Flush once the oldest queued row has waited this long
+        """
+        self.predict = predict
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_BUCKETS_MS)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='inference-scheduler', daemon=True)
+        self._thread.start()
+
+    def submit(self, inputs):
+        """
+        Queue inputs and block until their predictions are ready
+        Returns: predict() output rows for inputs, in order
+        """
+        pending = _Pending(inputs)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _collect(self):
+        """Block for the first submission, then gather more until full or timed out"""
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        rows = len(first.inputs)
+        deadline = first.enqueued + self.max_wait
+        while rows < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                pending = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if pending is None:
+                # Finish this batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(pending)
+            rows += len(pending.inputs)
+        return batch
+
+    def _run(self):
+        """Scheduler loop: collect, predict once, route rows back to callers"""
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            started = time.perf_counter()
+            for pending in batch:
+                self.queue_wait_ms.observe((started - pending.enqueued) * 1000)
+
+            try:
+                inputs = batch[0].inputs if len(batch) == 1 else np.concatenate([p.inputs for p in batch])
+                self.batch_sizes.observe(len(inputs))
+                outputs = self.predict(inputs)
+
+                offset = 0
+                for pending in batch:
+                    pending.result = outputs[offset:offset + len(pending.inputs)]
+                    offset += len(pending.inputs)
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            finally:
+                for pending in batch:
+                    pending.done.set()
+
+    def close(self):
+        """Stop the scheduler thread after queued work is done"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        """Get scheduler settings, queue depth and histograms"""
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'queue_depth': self._queue.qsize(),
+            'batch_size': self.batch_sizes.snapshot(),
+            'queue_wait_ms': self.queue_wait_ms.snapshot()
+        }
@@ -0,0 +1,85 @@
+"""
+Lazy engine loading for the Flask app
+Detectors are built on first use (or by a background warm-up thread)
+instead of at import time, so the web server starts answering at once
+"""
+import threading
+import time
+
+
+class LazyEngine:
+    """A detector that is constructed on first use, exactly once"""
+
+    def __init__(self, name, factory):
+        """
+        Args:
+            name: Engine name reported by /ready
+            factory: Zero-argument callable that builds the engine
+        """
+        self.name = name
+        self.factory = factory
+        self.state = 'not_loaded'  # not_loaded -> loading -> ready | failed
+        self.error = None
+        self.load_seconds = None
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the engine, building it if this is the first use"""
+        instance = self._instance
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if self._instance is None:
+                self.state = 'loading'
+                start = time.perf_counter()
+                try:
+                    self._instance = self.factory()
+                except Exception as e:
+                    self.state = 'failed'
+                    self.error = str(e)
+                    raise
+                self.load_seconds = round(time.perf_counter() - start, 3)
+                self.error = None
+                self.state = 'ready'
+                print(f"[ENGINE] {self.name} loaded in {self.load_seconds}s")
+            return self._instance
+
+    @property
+    def loaded(self):
+        """True once the engine has been built"""
+        return self._instance is not None
+
+    def peek(self):
+        """Return the engine if already built, without loading it"""
+        return self._instance
+
+    def warm_up(self):
+        """Build the engine now, logging instead of raising on failure"""
+        try:
+            self.get()
+        except Exception as e:
+            print(f"[ENGINE] {self.name} failed to load: {e}")
+
+    def status(self):
+        """Get load state for readiness reporting"""
+        return {
+            'state': self.state,
+            'load_seconds': self.load_seconds,
+            'error': self.error
+        }
+
+
+def start_warmup(engines):
+    """
+    Load engines one after another in a background daemon thread
+    Returns: the started thread
+    """
+    def run():
+        for engine in engines:
+            engine.warm_up()
+
+    thread = threading.Thread(target=run, name='engine-warmup', daemon=True)
+    thread.start()
+    return thread
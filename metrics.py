@@ -0,0 +1,59 @@
+"""
+Lightweight in-process metrics
+Fixed-bucket histograms for tuning knobs exposed through /api/metrics
+"""
+import bisect
+import threading
+
+
+class Histogram:
+    """Thread-safe histogram with fixed upper bucket bounds"""
+
+    def __init__(self, buckets):
+        """
+        Initialize the histogram
+        Args:
+            buckets: Ascending upper bounds; larger values go to an overflow bucket
+        """
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = None
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        """Record one value"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+            if self._max is None or value > self._max:
+                self._max = value
+
+    def _quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (caller holds the lock)"""
+        if not self._count:
+            return None
+        rank = q * self._count
+        seen = 0
+        for bound, count in zip(self.buckets, self._counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self._max
+
+    def snapshot(self):
+        """Get counts per bucket plus count, mean, p50, p95 and max"""
+        with self._lock:
+            buckets = {f'le_{bound}': count for bound, count in zip(self.buckets, self._counts)}
+            buckets['overflow'] = self._counts[-1]
+            return {
+                'count': self._count,
+                'mean': round(self._sum / self._count, 3) if self._count else None,
+                'p50': self._quantile(0.5),
+                'p95': self._quantile(0.95),
+                'max': self._max,
+                'buckets': buckets
+            }
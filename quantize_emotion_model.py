@@ -0,0 +1,208 @@
+"""
+Offline int8 quantization of the exported emotion model
+Calibrates on face crops from a local photo directory (Haar boxes, the same
+preprocessing as the detector), writes the int8 model, then reports its
+accuracy delta against the float model on held-out photos and throughput at
+several batch sizes
+
+Usage:
+    python quantize_emotion_model.py path/to/face/photos
+    python quantize_emotion_model.py photos --mode dynamic --report int8_report.json
+    python quantize_emotion_model.py photos --eval-fraction 0.3 --seed 7
+Needs onnxruntime and the float model from export_emotion_model.py.
+Serve the result with FACE_BACKEND=onnx (or opencv) and FACE_QUANTIZED=true.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from emotion_backends import DEFAULT_MODEL_PATH, QUANTIZED_MODEL_PATH, BACKENDS
+from face_emotion_detector import EMOTION_LABELS, FaceEmotionDetector, project_emotions
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+BATCH_SIZES = (1, 8, 32)
+CALIBRATION_BATCH = 16
+
+# Below this many calibration crops static activation ranges are unreliable
+MIN_CALIBRATION_CROPS = 50
+
+
+def split_photos(image_dir, eval_fraction, seed=0):
+    """
+    Split the photos in image_dir into calibration and evaluation sets
+    Whole photos are held out, so no face (or its mirror image) is in both
+    Returns: (calibration names, evaluation names)
+    """
+    names = sorted(name for name in os.listdir(image_dir) if name.lower().endswith(IMAGE_EXTENSIONS))
+    order = np.random.default_rng(seed).permutation(len(names))
+    held_out = max(1, round(len(names) * eval_fraction)) if len(names) > 1 else 0
+    evaluation = sorted(names[i] for i in order[:held_out])
+    calibration = sorted(names[i] for i in order[held_out:])
+    return calibration, evaluation
+
+
+def load_face_crops(detector, image_dir, names):
+    """
+    Preprocessed face crops (and their mirror images) from the named photos in image_dir
+    Returns: float32 array of shape (N, 48, 48, 1)
+    """
+    crops = []
+    for name in names:
+        image = cv2.imread(os.path.join(image_dir, name))
+        if image is None:
+            continue
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        faces = detector.find_faces(gray)
+        if len(faces):
+            batch = detector.crop_faces(gray, faces)
+            crops.extend([batch, batch[:, :, ::-1]])
+    if not crops:
+        raise SystemExit(f"No faces found in {len(names)} photo(s) of {image_dir}")
+    return np.ascontiguousarray(np.concatenate(crops))
+
+
+class CropReader:
+    """onnxruntime CalibrationDataReader over face crops"""
+
+    def __init__(self, input_name, crops):
+        self._batches = iter([
+            {input_name: crops[start:start + CALIBRATION_BATCH]}
+            for start in range(0, len(crops), CALIBRATION_BATCH)
+        ])
+
+    def get_next(self):
+        return next(self._batches, None)
+
+
+def quantize(float_path, output_path, crops, mode):
+    """Write the int8 model: static (calibrated QDQ, per-channel) or dynamic (weights only)"""
+    import onnxruntime
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Fold constants and infer shapes first, as onnxruntime recommends
+        prepared = os.path.join(tmp, 'prepared.onnx')
+        quant_pre_process(float_path, prepared, skip_symbolic_shape=True)
+
+        if mode == 'dynamic':
+            quantize_dynamic(prepared, output_path, weight_type=QuantType.QInt8)
+        else:
+            input_name = onnxruntime.InferenceSession(
+                prepared, providers=['CPUExecutionProvider']
+            ).get_inputs()[0].name
+            quantize_static(
+                prepared, output_path, CropReader(input_name, crops),
+                quant_format=QuantFormat.QDQ, per_channel=True,
+                activation_type=QuantType.QInt8, weight_type=QuantType.QInt8
+            )
+
+
+def accuracy_delta(reference, quantized):
+    """Compare int8 softmax rows with the float model's"""
+    top = reference.argmax(axis=1) == quantized.argmax(axis=1)
+    enhanced_top = project_emotions(reference).argmax(axis=1) == project_emotions(quantized).argmax(axis=1)
+    difference = np.abs(quantized - reference)
+    per_class = {
+        label: round(float(np.mean(quantized.argmax(axis=1) == index) - np.mean(reference.argmax(axis=1) == index)), 4)
+        for index, label in enumerate(EMOTION_LABELS)
+    }
+    return {
+        'crops': len(reference),
+        'top1_agreement': round(float(top.mean()), 4),
+        'enhanced_top1_agreement': round(float(enhanced_top.mean()), 4),
+        'mean_abs_probability_delta': round(float(difference.mean()), 5),
+        'max_abs_probability_delta': round(float(difference.max()), 5),
+        'top1_share_delta': per_class
+    }
+
+
+def throughput(backend, crops):
+    """Faces per second of backend.predict at each batch size"""
+    results = {}
+    for batch_size in BATCH_SIZES:
+        batch = np.resize(crops, (batch_size,) + crops.shape[1:])
+        backend.predict(batch)  # warm-up
+        repeat = max(10, 320 // batch_size)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            backend.predict(batch)
+        elapsed = time.perf_counter() - start
+        results[batch_size] = {
+            'ms_per_batch': round(elapsed / repeat * 1000, 2),
+            'faces_per_second': round(batch_size * repeat / elapsed, 1)
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Quantize the exported emotion model to int8')
+    parser.add_argument('images', help='Directory of face photos for calibration and evaluation')
+    parser.add_argument('--mode', choices=('static', 'dynamic'), default='static',
+                        help='static: calibrated int8 weights and activations (default); dynamic: int8 weights only')
+    parser.add_argument('--input', default=DEFAULT_MODEL_PATH, help='Float ONNX model (from export_emotion_model.py)')
+    parser.add_argument('-o', '--output', default=QUANTIZED_MODEL_PATH, help='Int8 ONNX model to write')
+    parser.add_argument('--report', default=None, help='Also write the report to this JSON file')
+    parser.add_argument('--eval-fraction', type=float, default=0.2,
+                        help='Share of photos held out of calibration to measure the accuracy delta (default: 0.2)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the calibration/evaluation split')
+    args = parser.parse_args()
+    if not 0 < args.eval_fraction < 1:
+        parser.error('--eval-fraction must be between 0 and 1')
+
+    with contextlib.redirect_stdout(io.StringIO()):  # Detector logs every step
+        detector = FaceEmotionDetector(backend='onnx', model_path=args.input, batch_size=1, frame_cache_clients=0)
+    calibration_photos, evaluation_photos = split_photos(args.images, args.eval_fraction, args.seed)
+    crops = load_face_crops(detector, args.images, calibration_photos)
+    eval_crops = load_face_crops(detector, args.images, evaluation_photos)
+    print(f"[QUANT] {len(crops)} calibration crops from {len(calibration_photos)} photos, "
+          f"{len(eval_crops)} held-out evaluation crops from {len(evaluation_photos)} photos "
+          f"(with mirror images) in {args.images}")
+    if args.mode == 'static' and len(crops) < MIN_CALIBRATION_CROPS:
+        print(f"[WARNING] Fewer than {MIN_CALIBRATION_CROPS} crops: calibration ranges may not generalize")
+
+    start = time.perf_counter()
+    quantize(args.input, args.output, crops, args.mode)
+    print(f"[QUANT] Wrote {args.mode} int8 model to {args.output} in {time.perf_counter() - start:.1f}s "
+          f"({os.path.getsize(args.input) / 1e6:.1f} MB -> {os.path.getsize(args.output) / 1e6:.1f} MB)")
+
+    float_backend = detector.emotion_backend
+    int8_backend = BACKENDS['onnx'](args.output)
+    report = {
+        'mode': args.mode,
+        'model': args.output,
+        'calibration_photos': len(calibration_photos),
+        'evaluation_photos': evaluation_photos,
+        'accuracy_delta': accuracy_delta(float_backend.predict(eval_crops), int8_backend.predict(eval_crops)),
+        'throughput': {'float32': throughput(float_backend, eval_crops), 'int8': throughput(int8_backend, eval_crops)}
+    }
+
+    delta = report['accuracy_delta']
+    print(f"\nAccuracy delta vs float model ({delta['crops']} held-out crops, not used for calibration)")
+    print(f"   Top emotion agreement (7 classes):   {delta['top1_agreement']:.1%}")
+    print(f"   Top emotion agreement (16 enhanced): {delta['enhanced_top1_agreement']:.1%}")
+    print(f"   Probability delta: mean {delta['mean_abs_probability_delta']:.4f}, "
+          f"max {delta['max_abs_probability_delta']:.4f}")
+
+    print("\nThroughput (onnxruntime, faces/s)")
+    print("   " + "model".ljust(9) + "".join(f"{f'batch {size}':>12}" for size in BATCH_SIZES))
+    for name, results in report['throughput'].items():
+        print(f"   {name:<9}" + "".join(f"{results[size]['faces_per_second']:12.1f}" for size in BATCH_SIZES))
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, indent=2)
+        print(f"\n[QUANT] Report written to {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Thread-safe bounded LRU cache with optional TTL
+Used to memoize detection results for repeated inputs
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Bounded least-recently-used cache with per-entry time-to-live"""
+
+    def __init__(self, max_size=1024, ttl=None):
+        """
+        Initialize the cache
+        Args:
+            max_size: Maximum number of entries (0 disables the cache)
+            ttl: Seconds an entry stays valid, or None for no expiry
+        """
+        self.max_size = max(0, int(max_size))
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """
+        Look up a cached value
+        Returns: a copy of the cached value, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        # Callers get their own copy so they cannot mutate the cached value
+        return copy.deepcopy(value)
+
+    def put(self, key, value):
+        """Store a copy of value, evicting the least recently used entry if full"""
+        if self.max_size == 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        value = copy.deepcopy(value)
+
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all entries (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        """Get cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
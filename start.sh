@@ -4,7 +4,7 @@
 echo "Starting Gunicorn server..."
 exec gunicorn app:app \
     --workers=1 \
-    --threads=2 \
+    --threads=8 \
     --timeout=120 \
     --bind=0.0.0.0:${PORT:-8000} \
     --access-logfile=- \
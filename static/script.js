@@ -18,6 +18,11 @@ const EMOTIONS = {
     worried: { emoji: '😟', color: '#7c3aed', label: 'Worried' }
 };
 
+// Identifies this tab to the server's frame cache (X-Client-Id); a new id per page load
+const CLIENT_ID = (window.crypto && crypto.randomUUID)
+    ? crypto.randomUUID()
+    : Date.now().toString(36) + Math.random().toString(36).slice(2);
+
 // DOM Elements - Text Mode
 const textInput = document.getElementById('textInput');
 const analyzeBtn = document.getElementById('analyzeBtn');
@@ -30,6 +35,8 @@ const cameraOverlay = document.getElementById('cameraOverlay');
 const startCameraBtn = document.getElementById('startCameraBtn');
 const captureBtn = document.getElementById('captureBtn');
 const stopCameraBtn = document.getElementById('stopCameraBtn');
+const liveBtn = document.getElementById('liveBtn');
+const liveBtnLabel = document.getElementById('liveBtnLabel');
 
 // DOM Elements - Common
 const resultsSection = document.getElementById('resultsSection');
@@ -40,6 +47,12 @@ const toast = document.getElementById('toast');
 let analysisCount = 0;
 let currentMode = 'text';
 let cameraStream = null;
+let liveSocket = null;
+let liveFrameTimer = null;
+let liveAwaitingReply = false;
+
+// Live streaming: frames per second sent over the WebSocket
+const LIVE_FPS = 10;
 
 // Initialize
 document.addEventListener('DOMContentLoaded', () => {
@@ -89,6 +102,13 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
     
+    if (liveBtn) {
+        liveBtn.addEventListener('click', () => {
+            console.log('🔘 Live button clicked');
+            liveSocket ? stopLive() : startLive();
+        });
+    }
+    
     if (stopCameraBtn) {
         stopCameraBtn.addEventListener('click', () => {
             console.log('🔘 Stop Camera button clicked');
@@ -195,12 +215,14 @@ async function analyzeEmotion() {
 }
 
 // Display analysis results
-function displayResults(data) {
+function displayResults(data, scroll = true) {
     const { emotion, confidence, all_emotions, sentiment } = data;
     
     // Show results section
     resultsSection.style.display = 'block';
-    resultsSection.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
+    if (scroll) {
+        resultsSection.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
+    }
     
     // Update main emotion display
     const emotionIcon = document.getElementById('emotionIcon');
@@ -508,6 +530,7 @@ async function startCamera() {
         cameraOverlay.style.display = 'none';
         startCameraBtn.style.display = 'none';
         captureBtn.style.display = 'inline-flex';
+        if (liveBtn) liveBtn.style.display = 'inline-flex';
         stopCameraBtn.style.display = 'inline-flex';
         
         showToast('Camera started successfully!', 'success');
@@ -532,6 +555,7 @@ async function startCamera() {
 }
 
 function stopCamera() {
+    stopLive();
     if (cameraStream) {
         cameraStream.getTracks().forEach(track => track.stop());
         cameraStream = null;
@@ -541,6 +565,7 @@ function stopCamera() {
         cameraOverlay.style.display = 'flex';
         startCameraBtn.style.display = 'inline-flex';
         captureBtn.style.display = 'none';
+        if (liveBtn) liveBtn.style.display = 'none';
         stopCameraBtn.style.display = 'none';
         
         console.log('📷 Camera stopped');
@@ -567,8 +592,14 @@ async function captureAndAnalyze() {
         canvasElement.height = videoElement.videoHeight;
         context.drawImage(videoElement, 0, 0);
         
-        // Convert to base64
-        const imageData = canvasElement.toDataURL('image/jpeg', 0.8);
+        // Encode as JPEG bytes (no base64 inflation)
+        const imageBlob = await new Promise((resolve, reject) => {
+            canvasElement.toBlob(
+                blob => blob ? resolve(blob) : reject(new Error('Failed to encode image')),
+                'image/jpeg',
+                0.8
+            );
+        });
         console.log('✅ Image captured, sending to API...');
         
         // Show loading
@@ -580,9 +611,10 @@ async function captureAndAnalyze() {
         const response = await fetch('/api/detect-face', {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json'
+                'Content-Type': 'image/jpeg',
+                'X-Client-Id': CLIENT_ID
             },
-            body: JSON.stringify({ image: imageData })
+            body: imageBlob
         });
         
         console.log('[API] Response status:', response.status, response.statusText);
@@ -641,3 +673,94 @@ async function captureAndAnalyze() {
 console.log('🎭 AI Emotion Detection App Loaded Successfully!');
 console.log('💡 Tip: Press Ctrl+Enter to analyze text quickly');
 console.log('📷 Facial expression detection available!');
+
+// ============================================
+// LIVE STREAMING (WebSocket)
+// ============================================
+
+function startLive() {
+    if (!cameraStream || liveSocket) {
+        return;
+    }
+    
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    liveSocket = new WebSocket(`${protocol}//${window.location.host}/ws/face-stream`);
+    liveSocket.binaryType = 'arraybuffer';
+    liveAwaitingReply = false;
+    
+    liveSocket.onopen = () => {
+        console.log('[LIVE] Stream connected');
+        liveBtnLabel.textContent = 'Stop Live';
+        captureBtn.disabled = true;
+        liveFrameTimer = setInterval(sendLiveFrame, 1000 / LIVE_FPS);
+        showToast('Live emotion tracking started', 'success');
+    };
+    
+    liveSocket.onmessage = (event) => {
+        liveAwaitingReply = false;
+        const update = JSON.parse(event.data);
+        
+        if (update.type === 'error') {
+            console.error('[LIVE] Error:', update.message);
+            // The server closes the stream after these
+            if (update.error === 'Too many streams' || update.error === 'Idle timeout') {
+                showToast(update.message, 'error');
+            }
+            return;
+        }
+        
+        // Show the largest tracked face
+        if (update.faces && update.faces.length > 0) {
+            const face = update.faces.reduce((a, b) => (a.box.w * a.box.h >= b.box.w * b.box.h ? a : b));
+            displayResults(face, false);
+        }
+    };
+    
+    liveSocket.onerror = () => {
+        showToast('Live streaming is not available on this server', 'error');
+    };
+    
+    liveSocket.onclose = () => {
+        console.log('[LIVE] Stream closed');
+        stopLive();
+    };
+}
+
+function sendLiveFrame() {
+    // Skip frames while the server is still busy with the previous one
+    if (!liveSocket || liveSocket.readyState !== WebSocket.OPEN || liveAwaitingReply) {
+        return;
+    }
+    if (videoElement.videoWidth === 0 || videoElement.videoHeight === 0) {
+        return;
+    }
+    
+    const context = canvasElement.getContext('2d');
+    canvasElement.width = videoElement.videoWidth;
+    canvasElement.height = videoElement.videoHeight;
+    context.drawImage(videoElement, 0, 0);
+    
+    liveAwaitingReply = true;
+    canvasElement.toBlob(blob => {
+        if (blob && liveSocket && liveSocket.readyState === WebSocket.OPEN) {
+            liveSocket.send(blob);
+        } else {
+            liveAwaitingReply = false;
+        }
+    }, 'image/jpeg', 0.7);
+}
+
+function stopLive() {
+    if (liveFrameTimer) {
+        clearInterval(liveFrameTimer);
+        liveFrameTimer = null;
+    }
+    if (liveSocket) {
+        const socket = liveSocket;
+        liveSocket = null;
+        socket.onclose = null;
+        socket.close();
+    }
+    if (liveBtnLabel) liveBtnLabel.textContent = 'Go Live';
+    if (captureBtn) captureBtn.disabled = false;
+}
@@ -0,0 +1,207 @@
+"""
+Test script for the emotion database
+Run with: python test_database.py
+Every database lives in a temporary directory
+"""
+import sys
+import io
+import contextlib
+import os
+import signal
+import tempfile
+import threading
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+from database import EmotionDatabase, WriteBehindQueue
+
+RECORD = {'text': 'I am so happy', 'emotion': 'happy', 'confidence': 0.9,
+          'all_emotions': {'happy': 0.9, 'sad': 0.1}, 'type': 'text', 'method': 'test'}
+
+print("Testing Emotion Database...")
+print("=" * 60)
+failures = 0
+tmp = tempfile.TemporaryDirectory()
+# The database logs every insert
+quiet = contextlib.redirect_stdout(io.StringIO())
+
+
+def open_db(name, **kwargs):
+    with quiet:
+        return EmotionDatabase(os.path.join(tmp.name, name), **kwargs)
+
+
+def row_count(db):
+    with quiet:
+        return db.get_statistics()['total_detections']
+
+
+# Test 1: queued rows are written before a read and sync=True writes right away
+print("\n1. Write-behind: flush before read, sync=True...")
+# An interval this long means only a flush writes the rows
+db = open_db('queued.db', write_behind=True, flush_size=1000, flush_interval=60)
+with quiet:
+    for _ in range(50):
+        db.add_emotion(RECORD)
+queued_depth = db.write_queue_stats()['queue_depth']
+total = row_count(db)
+with quiet:
+    record_id = db.add_emotion(RECORD, sync=True)
+print(f"   Queue depth {queued_depth} before the read, {total} rows read, sync id {record_id}")
+if queued_depth != 50 or total != 50 or db.write_queue_stats()['queue_depth']:
+    failures += 1
+    print("   [ERROR] A read did not see every queued row")
+elif not isinstance(record_id, int) or row_count(db) != 51:
+    failures += 1
+    print("   [ERROR] add_emotion(sync=True) did not write right away and return the row id")
+else:
+    print("   [OK] Reads see queued rows; sync=True returns the row id")
+
+# Test 2: close() writes whatever is still queued
+print("\n2. Write-behind: drain on close()...")
+with quiet:
+    db.add_emotions([RECORD] * 30)
+    db.close()
+reopened = open_db('queued.db')
+total = row_count(reopened)
+reopened.close()
+print(f"   Rows after close and reopen: {total}")
+if total != 81:
+    failures += 1
+    print("   [ERROR] close() lost queued rows")
+else:
+    print("   [OK] Queued rows written on close()")
+
+# Test 3: a failed batch is retried once, then counted as failed
+print("\n3. Write-behind: retry and failure counting...")
+attempts = []
+
+
+def flaky_write(rows):
+    attempts.append(len(rows))
+    if len(attempts) == 1:
+        raise RuntimeError('database is locked')
+
+
+def broken_write(rows):
+    raise RuntimeError('disk I/O error')
+
+
+with quiet:
+    flaky = WriteBehindQueue(flaky_write, flush_size=10, flush_interval=60)
+    flaky.put([('row',)] * 10)
+    flaky.flush(timeout=5)
+    broken = WriteBehindQueue(broken_write, flush_size=10, flush_interval=60)
+    broken.put([('row',)] * 10)
+    broken_flushed = broken.flush(timeout=5)
+flaky_stats, broken_stats = flaky.stats(), broken.stats()
+flaky.close()
+broken.close()
+print(f"   Retried batch: {flaky_stats['rows_written']} written in {len(attempts)} attempts; "
+      f"failing batch: {broken_stats['rows_failed']} failed")
+if attempts != [10, 10] or flaky_stats['rows_written'] != 10 or flaky_stats['rows_failed']:
+    failures += 1
+    print("   [ERROR] A batch that failed once was not retried and written")
+elif not broken_flushed or broken_stats['rows_failed'] != 10 or broken_stats['queue_depth']:
+    failures += 1
+    print("   [ERROR] A batch failing twice was not counted as failed")
+else:
+    print("   [OK] One retry, then rows counted as failed")
+
+# Test 4: a forked child gets its own writer thread
+print("\n4. Write-behind after fork...")
+if not hasattr(os, 'fork'):
+    print("   [OK] Skipped (no os.fork on this platform)")
+else:
+    db = open_db('forked.db', write_behind=True, flush_interval=60)
+    with quiet:
+        db.add_emotion(RECORD)
+    pid = os.fork()
+    if pid == 0:
+        # Child: a hang is a failure, not a stuck test run
+        signal.alarm(20)
+        status = 1
+        try:
+            with quiet:
+                db.add_emotion(RECORD)
+                flushed = db.flush(timeout=5)
+                stats = db.write_queue_stats()
+            status = 0 if flushed and stats['queue_depth'] == 0 and stats['rows_written'] == 1 else 1
+        finally:
+            os._exit(status)
+    _, status = os.waitpid(pid, 0)
+    child_ok = os.waitstatus_to_exitcode(status) == 0
+    # The parent still writes its own queued row
+    total = row_count(db)
+    db.close()
+    print(f"   Child exit {os.waitstatus_to_exitcode(status)}, rows after both processes: {total}")
+    if not child_ok:
+        failures += 1
+        print("   [ERROR] The forked child could not write through its queue")
+    elif total != 2:
+        failures += 1
+        print("   [ERROR] Expected the parent's and the child's row")
+    else:
+        print("   [OK] Parent and child each write their own queued rows")
+
+# Test 5: one connection per thread with the configured pragmas
+print("\n5. Per-thread connections: pragmas, pruning, fork...")
+db = open_db('pool.db', mmap_size_mb=64, cache_size_mb=8)
+conn = db._connect()
+pragmas = {name: conn.execute(f'PRAGMA {name}').fetchone()[0]
+           for name in ('journal_mode', 'synchronous', 'mmap_size', 'cache_size')}
+
+
+def read_in_threads(count):
+    """Read in count threads that all open their connection before any exits"""
+    opened = threading.Barrier(count)
+
+    def read():
+        row_count(db)
+        opened.wait()
+
+    threads = [threading.Thread(target=read) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+read_in_threads(3)
+before_prune = db.connection_info()['connections']
+# Opening a connection closes those of threads that have exited
+read_in_threads(1)
+after_prune = db.connection_info()['connections']
+
+child_connections = None
+if hasattr(os, 'fork'):
+    pid = os.fork()
+    if pid == 0:
+        signal.alarm(20)
+        status = 1
+        try:
+            row_count(db)
+            # Only this process's own connection, not the parent's four
+            status = 0 if db.connection_info()['connections'] == 1 else 1
+        finally:
+            os._exit(status)
+    _, status = os.waitpid(pid, 0)
+    child_connections = os.waitstatus_to_exitcode(status) == 0
+db.close()
+print(f"   Pragmas: {pragmas}")
+print(f"   Connections: {before_prune} after 3 reader threads, {after_prune} after the next one opened")
+if pragmas != {'journal_mode': 'wal', 'synchronous': 1, 'mmap_size': 64 * 1024 * 1024, 'cache_size': -8 * 1024}:
+    failures += 1
+    print("   [ERROR] Connection opened without the configured pragmas")
+elif before_prune != 4 or after_prune != 2:
+    failures += 1
+    print("   [ERROR] Connections of exited threads were not closed")
+elif child_connections is False:
+    failures += 1
+    print("   [ERROR] A forked child reused the parent's connections")
+else:
+    print("   [OK] WAL and pragmas set, dead threads pruned, pool reset after fork")
+
+tmp.cleanup()
+print("\n" + "=" * 60)
+print("Test complete!" if not failures else f"{failures} test(s) failed")
+sys.exit(1 if failures else 0)
@@ -0,0 +1,217 @@
+"""
+Test script for app cold start and readiness
+Run with: python test_startup.py
+Checks that importing app.py and answering /health stays within the
+startup budget (STARTUP_BUDGET_SECONDS, default 2.0), that /ready
+reports per-engine load state, that env defaults of request
+parameters are parsed as numbers and that live streams are capped
+"""
+import sys
+import io
+import json
+import os
+import subprocess
+import tempfile
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BUDGET = float(os.environ.get('STARTUP_BUDGET_SECONDS', 2.0))
+
+# Runs in a fresh interpreter so nothing is imported yet
+COLD_START = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+response = app.app.test_client().get('/health')
+elapsed = time.perf_counter() - start
+ready = app.app.test_client().get('/ready')
+print(json.dumps({
+    'elapsed': elapsed,
+    'health': response.status_code,
+    'ready': ready.status_code,
+    'engines': ready.get_json()['engines'],
+    'heavy_modules': [m for m in ('cv2', 'textblob', 'deepface', 'tensorflow') if m in sys.modules]
+}))
+'''
+
+WARM_START = '''
+import json, time
+import app
+client = app.app.test_client()
+deadline = time.time() + 300
+while client.get('/ready').status_code != 200 and time.time() < deadline:
+    time.sleep(0.1)
+ready = client.get('/ready')
+print(json.dumps({'ready': ready.status_code, 'engines': ready.get_json()['engines']}))
+'''
+
+# /api/detect-video must take its ?fps= default from VIDEO_SAMPLE_FPS as a number
+VIDEO_FPS_DEFAULT = '''
+import json, os
+import app
+client = app.app.test_client()
+statuses = {}
+for value in ('2', '0.5', 'fast'):
+    os.environ['VIDEO_SAMPLE_FPS'] = value
+    # An empty body is rejected right after the sampling rate is checked
+    response = client.post('/api/detect-video', data=b'', content_type='video/mp4')
+    statuses[value] = [response.status_code, response.get_json()['error']]
+print(json.dumps(statuses))
+'''
+
+# /ws/face-stream settings take their defaults from STREAM_* as numbers
+STREAM_SETTING_DEFAULTS = '''
+import json, os
+import app
+os.environ.update(STREAM_KEYFRAME_INTERVAL='10', STREAM_EMOTION_FPS='5', STREAM_SMOOTHING='0.6')
+with app.app.test_request_context('/ws/face-stream'):
+    values = [app.stream_setting('keyframe_interval', 1, int, 1, 300),
+              app.stream_setting('emotion_fps', 1.0, float, 0.0, 60.0),
+              app.stream_setting('smoothing', 0.0, float, 0.0, 0.95)]
+os.environ['STREAM_KEYFRAME_INTERVAL'] = '2.5'
+with app.app.test_request_context('/ws/face-stream'):
+    try:
+        app.stream_setting('keyframe_interval', 1, int, 1, 300)
+        error = None
+    except ValueError as e:
+        error = str(e)
+print(json.dumps({'values': values, 'error': error}))
+'''
+
+# /ws/face-stream caps open streams and closes idle ones
+STREAM_LIMITS = '''
+import json, os, threading
+os.environ.update(STREAM_MAX_SESSIONS='2', STREAM_IDLE_TIMEOUT='0.5')
+import app
+
+class FakeSocket:
+    """Records sent messages; receive() waits for release, then times out"""
+    def __init__(self, release):
+        self.release = release
+        self.sent = []
+        self.timeouts = []
+    def receive(self, timeout=None):
+        self.timeouts.append(timeout)
+        self.release.wait()
+        return None
+    def send(self, data):
+        self.sent.append(json.loads(data))
+
+face_stream = app.app.view_functions['face_stream'].__wrapped__
+
+def stream(ws):
+    with app.app.test_request_context('/ws/face-stream'):
+        face_stream(ws)
+
+release = threading.Event()
+app.face_engine.get()
+held = [FakeSocket(release) for _ in range(2)]
+threads = [threading.Thread(target=stream, args=(ws,)) for ws in held]
+for thread in threads:
+    thread.start()
+# Both streams are open once they wait for a frame
+while sum(len(ws.timeouts) for ws in held) < 2 and all(thread.is_alive() for thread in threads):
+    release.wait(0.01)
+rejected = FakeSocket(release)
+stream(rejected)
+release.set()
+for thread in threads:
+    thread.join()
+print(json.dumps({
+    'rejected': [m['error'] for m in rejected.sent],
+    'closed': [[m['error'] for m in ws.sent] for ws in held],
+    'timeouts': [ws.timeouts for ws in held],
+    'open_after': app.stream_sessions
+}))
+'''
+
+
+def run_app_script(script, warmup):
+    """Run script in a subprocess inside a scratch directory (keeps the real database untouched)"""
+    env = dict(os.environ, WARMUP='True' if warmup else 'False')
+    env['PYTHONPATH'] = REPO_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    with tempfile.TemporaryDirectory() as scratch:
+        completed = subprocess.run(
+            [sys.executable, '-c', script], cwd=scratch, env=env,
+            capture_output=True, text=True, timeout=600
+        )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+print("Testing App Startup...")
+print("=" * 60)
+failures = 0
+
+# Test 1: import-to-first-response within budget, no engine loaded
+print(f"\n1. Cold start (WARMUP=False, budget {BUDGET}s)...")
+cold = run_app_script(COLD_START, warmup=False)
+print(f"   Import to first /health response: {cold['elapsed']:.3f}s")
+print(f"   /ready status before first use: {cold['ready']}")
+if cold['elapsed'] > BUDGET:
+    failures += 1
+    print("   [ERROR] Startup exceeded the budget")
+elif cold['heavy_modules']:
+    failures += 1
+    print(f"   [ERROR] Heavy modules imported at startup: {cold['heavy_modules']}")
+elif cold['health'] != 200 or cold['ready'] != 503:
+    failures += 1
+    print("   [ERROR] Expected /health 200 and /ready 503 before engines load")
+else:
+    print("   [OK] Startup within budget, engines not loaded yet")
+
+# Test 2: background warm-up makes /ready succeed
+print("\n2. Background warm-up (WARMUP=True)...")
+warm = run_app_script(WARM_START, warmup=True)
+for name, status in warm['engines'].items():
+    print(f"   {name}: {status['state']} ({status['load_seconds']}s)")
+if warm['ready'] != 200:
+    failures += 1
+    print("   [ERROR] /ready never reported ready")
+else:
+    print("   [OK] All engines ready")
+
+# Test 3: env defaults of request parameters are converted before range checks
+print("\n3. VIDEO_SAMPLE_FPS default for /api/detect-video...")
+statuses = run_app_script(VIDEO_FPS_DEFAULT, warmup=False)
+for value, (status, error) in statuses.items():
+    print(f"   VIDEO_SAMPLE_FPS={value}: {status} {error}")
+expected = {'2': [400, 'No video provided'], '0.5': [400, 'No video provided'],
+            'fast': [400, 'Invalid sampling rate']}
+if statuses != expected:
+    failures += 1
+    print("   [ERROR] Expected numeric env defaults to pass the fps check and a bad one to give a 400")
+else:
+    print("   [OK] Env default converted; bad value rejected with a 400")
+
+# Test 4: STREAM_* env defaults are converted; bad ones give the settings error
+print("\n4. STREAM_* defaults for /ws/face-stream...")
+stream = run_app_script(STREAM_SETTING_DEFAULTS, warmup=False)
+print(f"   Settings: {stream['values']}, bad value: {stream['error']}")
+if stream['values'] != [10, 5.0, 0.6] or not stream['error']:
+    failures += 1
+    print("   [ERROR] Expected numeric STREAM_* defaults and a ValueError for a bad one")
+else:
+    print("   [OK] Env defaults converted; bad value raises ValueError")
+
+# Test 5: extra streams are rejected and idle ones closed
+print("\n5. STREAM_MAX_SESSIONS and STREAM_IDLE_TIMEOUT for /ws/face-stream...")
+limits = run_app_script(STREAM_LIMITS, warmup=False)
+print(f"   Third stream: {limits['rejected']}, held streams: {limits['closed']}, "
+      f"open afterwards: {limits['open_after']}")
+if limits['rejected'] != ['Too many streams']:
+    failures += 1
+    print("   [ERROR] A stream beyond STREAM_MAX_SESSIONS was not rejected")
+elif limits['closed'] != [['Idle timeout']] * 2 or limits['timeouts'] != [[0.5]] * 2:
+    failures += 1
+    print("   [ERROR] Idle streams were not closed after STREAM_IDLE_TIMEOUT")
+elif limits['open_after'] != 0:
+    failures += 1
+    print("   [ERROR] Closed streams still counted as open")
+else:
+    print("   [OK] Extra stream rejected, idle streams closed, counter released")
+
+print("\n" + "=" * 60)
+print("Test complete!" if not failures else f"{failures} test(s) failed")
+sys.exit(1 if failures else 0)
@@ -0,0 +1,206 @@
+"""
+Test script for the text emotion detector
+Run with: python test_text_detector.py
+"""
+import sys
+import io
+import random
+import threading
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+from emotion_detector import EmotionDetector
+
+print("Testing Text Emotion Detector...")
+print("=" * 60)
+
+detector = EmotionDetector()
+failures = 0
+
+# Build a random corpus from the lexicon so every scoring branch is hit
+random.seed(42)
+vocabulary = sorted({word for words in detector.emotion_keywords.values() for word in words})
+vocabulary += detector.intensifiers + detector.negations
+vocabulary += ['the', 'i', 'good', 'bad', 'nice', 'best', 'worst', '.', '!', '?']
+corpus = [
+    ' '.join(random.choice(vocabulary) for _ in range(random.randint(1, 25)))
+    for _ in range(500)
+]
+corpus += [
+    "I am so happy and excited about this!",
+    "This is terrible and makes me really angry.",
+    "I'm feeling sad and lonely today.",
+    "I am not happy, I am fed up and worn out.",
+    "Everything is just okay, nothing special.",
+    "", "   "
+]
+
+# Test 1: detect_batch matches detect
+print("\n1. Comparing detect_batch() with detect()...")
+batch_results = detector.detect_batch(corpus)
+mismatches = [
+    text for text, result in zip(corpus, batch_results)
+    if result != detector.detect(text)
+]
+if mismatches:
+    failures += 1
+    print(f"   [ERROR] {len(mismatches)} of {len(corpus)} results differ, e.g. {mismatches[0]!r}")
+else:
+    print(f"   [OK] {len(corpus)} results identical")
+
+# Test 2: fast sentiment tracks TextBlob
+print("\n2. Comparing fast sentiment with TextBlob...")
+fast_detector = EmotionDetector(sentiment_mode='fast')
+differences = []
+same_sign = 0
+for text in corpus:
+    if not text.strip():
+        continue
+    processed_text, words = detector.preprocess_text(text)
+    expected = detector.calculate_sentiment(processed_text)
+    actual = fast_detector.calculate_sentiment(processed_text, words)
+    differences.append(abs(expected['polarity'] - actual['polarity']))
+    differences.append(abs(expected['subjectivity'] - actual['subjectivity']))
+    if (expected['polarity'] > 0) == (actual['polarity'] > 0) and \
+            (expected['polarity'] < 0) == (actual['polarity'] < 0):
+        same_sign += 1
+
+compared = len(differences) // 2
+mean_difference = sum(differences) / len(differences)
+exact = sum(1 for d in differences if d == 0) / len(differences)
+print(f"   Compared: {compared} texts")
+print(f"   Mean absolute difference: {mean_difference:.4f}")
+print(f"   Exact matches: {exact:.1%}")
+print(f"   Same polarity sign: {same_sign / compared:.1%}")
+if mean_difference > 0.02 or same_sign / compared < 0.95:
+    failures += 1
+    print("   [ERROR] Fast sentiment drifts too far from TextBlob")
+else:
+    print("   [OK] Fast sentiment tracks TextBlob")
+
+# Test 3: result cache returns the same results and counts hits
+print("\n3. Testing the LRU result cache...")
+cached_detector = EmotionDetector(cache_size=100, cache_ttl=60)
+cache_texts = corpus[:300]
+
+
+def run_cached(texts):
+    for text in texts:
+        if cached_detector.detect(text) != detector.detect(text):
+            errors.append(text)
+
+
+errors = []
+threads = [threading.Thread(target=run_cached, args=(cache_texts,)) for _ in range(4)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+
+stats = cached_detector.cache_stats()
+print(f"   Stats: {stats}")
+if errors:
+    failures += 1
+    print(f"   [ERROR] {len(errors)} cached results differ from uncached ones")
+elif stats['size'] > 100 or stats['evictions'] == 0 or stats['hits'] == 0:
+    failures += 1
+    print("   [ERROR] Cache size bound or counters are wrong")
+else:
+    print("   [OK] Cached results identical under 4 threads")
+
+# Test 4: regex tokenizer reproduces nltk.word_tokenize
+print("\n4. Comparing the regex tokenizer with NLTK...")
+sentences = [
+    "I can't believe how happy I am today!",
+    "Honestly, I'm not sure... maybe it's fine?",
+    "We were so fed up with the delays, it's 3.5 hours late.",
+    "Don't worry, be happy!!",
+    "I cannot stand this anymore, I'm gonna scream.",
+    "The results, e.g. the survey, were surprising.",
+    "Wow!? That was unexpected.",
+    "She felt worn out and on edge after 12 hours.",
+    "Meh. Whatever. It's okay I guess.",
+    "Why would anyone do that?!",
+    "I wanna go home, I'm so tired.",
+    "Not bad at all... really not bad."
+]
+nltk_tokenize = None
+try:
+    import nltk
+    nltk.data.find('tokenizers/punkt_tab')
+    nltk_tokenize = nltk.word_tokenize
+    print("   Reference: nltk.word_tokenize")
+except LookupError:
+    # Punkt data unavailable: split sentences on end punctuation
+    # (but not after abbreviations like "e.g.") instead
+    from nltk.tokenize import NLTKWordTokenizer
+    import re
+    treebank = NLTKWordTokenizer()
+    nltk_tokenize = lambda text: [
+        token for sentence in re.split(r'(?<=[.!?])(?<!\.\w\.)\s+', text)
+        for token in treebank.tokenize(sentence)
+    ]
+    print("   Reference: NLTK Treebank tokenizer (punkt data not installed)")
+except ImportError:
+    print("   [SKIPPED] NLTK is not installed")
+
+if nltk_tokenize is not None:
+    tokenizer_corpus = [
+        ' '.join(random.sample(sentences, random.randint(1, 4))) for _ in range(300)
+    ] + sentences + [text for text in corpus if text.strip()]
+    same_tokens = 0
+    same_scores = 0
+    for text in tokenizer_corpus:
+        normalized = detector.normalize_text(text)
+        expected = nltk_tokenize(normalized)
+        actual = detector.tokenize(normalized)
+        same_tokens += expected == actual
+        same_scores += (
+            detector.detect_emotion_keywords(expected) ==
+            detector.detect_emotion_keywords(actual)
+        )
+    print(f"   Identical tokens: {same_tokens}/{len(tokenizer_corpus)}")
+    print(f"   Identical keyword scores: {same_scores}/{len(tokenizer_corpus)}")
+    if same_scores / len(tokenizer_corpus) < 0.99:
+        failures += 1
+        print("   [ERROR] Regex tokenizer diverges from NLTK")
+    else:
+        print("   [OK] Regex tokenizer matches NLTK")
+
+# Test 5: streamed document aggregate equals the whole-text score
+print("\n5. Testing streaming document analysis...")
+document_mismatches = 0
+for _ in range(50):
+    document = ' '.join(random.choice(sentences) for _ in range(random.randint(20, 200)))
+    analysis = detector.detect_document(document, chunk_size=random.choice([200, 500, 1000]))
+    expected = detector.detect(document)
+    aggregate = {key: analysis['aggregate'][key] for key in expected}
+    covered = sum(chunk['length'] for chunk in analysis['timeline'])
+    if aggregate != expected or covered > len(document) or not analysis['timeline']:
+        document_mismatches += 1
+if document_mismatches:
+    failures += 1
+    print(f"   [ERROR] {document_mismatches} of 50 aggregates differ from detect()")
+else:
+    print("   [OK] 50 document aggregates identical to detect()")
+
+# Test 6: lexicon phrases cut by a chunk boundary still count once
+print("\n6. Testing phrases split across chunks...")
+phrases = sorted(keyword for words in detector.emotion_keywords.values() for keyword in words if ' ' in keyword)
+split_mismatches = []
+for phrase in phrases:
+    # Shift the phrase across the 100-character cut one word at a time
+    for filler in range(20, 27):
+        document = 'the ' * filler + phrase + ' today'
+        analysis = detector.detect_document(document, chunk_size=100)
+        expected = detector.detect(document)
+        if {key: analysis['aggregate'][key] for key in expected} != expected:
+            split_mismatches.append(document)
+if split_mismatches:
+    failures += 1
+    print(f"   [ERROR] {len(split_mismatches)} split-phrase aggregates differ, e.g. {split_mismatches[0][-40:]!r}")
+else:
+    print(f"   [OK] {len(phrases)} phrases at 7 offsets identical to detect()")
+
+print("\n" + "=" * 60)
+print("Test complete!" if not failures else f"{failures} test(s) failed")
+sys.exit(1 if failures else 0)
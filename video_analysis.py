@@ -0,0 +1,228 @@
+"""
+Facial emotion timelines for video files
+A decode thread reads the video with cv2.VideoCapture and keeps only frames
+on the sampling grid; a pool of inference threads runs the face detector on
+them (so the micro-batcher can group their faces) and results are yielded
+in timestamp order as soon as each one is ready. The frame queue and the
+number of frames in flight are bounded, so memory stays flat regardless of
+video length.
+
+Usage:
+    python video_analysis.py interview.mp4 -o timeline.ndjson
+    python video_analysis.py interview.mp4 --fps 5 --backend onnx --threads 4
+"""
+import argparse
+import contextlib
+import json
+import queue
+import sys
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+# Decoded frames waiting for an inference thread
+DECODE_QUEUE_SIZE = 8
+
+# End-of-video marker on the decode queue
+_END = object()
+
+
+def sample_frames(path, sample_fps=2.0, frames=None, stop=None):
+    """
+    Decode a video and yield the frames on the sampling grid
+    Frames between samples are only grabbed, not converted to BGR
+    Args:
+        path: Video file
+        sample_fps: Frames analyzed per second of video (0 = every frame)
+        frames: Optional dict updated with 'decoded', 'video_fps' and 'duration'
+        stop: Optional threading.Event that ends decoding early
+    Yields:
+        (frame index, timestamp in seconds, BGR frame)
+    """
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f'could not open video {path}')
+    frames = frames if frames is not None else {}
+    try:
+        video_fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+        frame_count = capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0
+        frames['video_fps'] = round(video_fps, 3) or None
+        frames['duration'] = round(frame_count / video_fps, 3) if video_fps > 0 and frame_count > 0 else None
+        frames['decoded'] = 0
+        interval = 1.0 / sample_fps if sample_fps > 0 else 0.0
+        next_sample = 0.0
+        index = -1
+        while not (stop and stop.is_set()) and capture.grab():
+            index += 1
+            frames['decoded'] += 1
+            # Container timestamps when the frame rate is unknown (some streams report 0)
+            timestamp = index / video_fps if video_fps > 0 else capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            if timestamp + 1e-6 < next_sample:
+                continue
+            ok, frame = capture.retrieve()
+            if not ok:
+                continue
+            # Stay on the grid: a frame late to a sample never shifts later samples
+            while interval and next_sample <= timestamp + 1e-6:
+                next_sample += interval
+            yield index, round(timestamp, 3), frame
+    finally:
+        capture.release()
+
+
+def _frame_result(index, timestamp, result):
+    """Timeline entry for one analyzed frame"""
+    entry = {'type': 'frame', 'frame': index, 'timestamp': timestamp, 'success': bool(result.get('success'))}
+    if entry['success']:
+        entry.update({
+            'emotion': result['emotion'],
+            'confidence': result['confidence'],
+            'all_emotions': result['all_emotions'],
+            'faces_detected': result.get('faces_detected', 0),
+            'faces': result.get('faces', []),
+            'method': result.get('method', 'unknown')
+        })
+    else:
+        entry['error'] = result.get('error', 'Detection failed')
+    return entry
+
+
+def analyze_video(detector, path, sample_fps=2.0, threads=4):
+    """
+    Analyze a video file frame by frame
+    Decoding runs on its own thread, ahead of inference by at most
+    DECODE_QUEUE_SIZE frames; threads inference calls run at once.
+    Args:
+        detector: Loaded FaceEmotionDetector (or FaceWorkerPool)
+        path: Video file
+        sample_fps: Frames analyzed per second of video (0 = every frame)
+        threads: Concurrent detector calls
+    Yields:
+        dict: one {"type": "frame", ...} per sampled frame in timestamp
+        order, then a final {"type": "summary", ...} with throughput and the
+        dominant emotion over the video
+    Raises:
+        ValueError: if the video cannot be opened
+    """
+    threads = max(1, int(threads))
+    frames = {}
+    decoded = queue.Queue(maxsize=DECODE_QUEUE_SIZE)
+    stop = threading.Event()
+    errors = []
+    start = time.perf_counter()
+
+    # Open in the caller's thread so a bad file raises before anything is yielded
+    samples = sample_frames(path, sample_fps, frames, stop)
+    first = next(samples, None)
+
+    def decode():
+        try:
+            if first is not None:
+                decoded.put(first)
+                for sample in samples:
+                    decoded.put(sample)
+                    if stop.is_set():
+                        break
+        except Exception as e:
+            errors.append(e)
+        finally:
+            samples.close()
+            decoded.put(_END)
+
+    decoder = threading.Thread(target=decode, name='video-decode', daemon=True)
+    decoder.start()
+
+    analyzed = 0
+    emotions = Counter()
+    pending = deque()
+    try:
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='video-infer') as pool:
+            def oldest():
+                nonlocal analyzed
+                index, timestamp, future = pending.popleft()
+                entry = _frame_result(index, timestamp, future.result())
+                analyzed += 1
+                if entry['success']:
+                    emotions[entry['emotion']] += 1
+                return entry
+
+            while True:
+                sample = decoded.get()
+                if sample is _END:
+                    break
+                index, timestamp, frame = sample
+                pending.append((index, timestamp, pool.submit(detector.detect_from_array, frame)))
+                del frame, sample  # Only the in-flight call holds the frame
+                # At most 2 frames per thread in flight: results stream out in order
+                if len(pending) >= threads * 2:
+                    yield oldest()
+
+            while pending:
+                yield oldest()
+    finally:
+        # Consumer gone (client disconnected) or finished: let the decoder exit
+        stop.set()
+        while decoder.is_alive():
+            try:
+                decoded.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        decoder.join()
+
+    if errors:
+        raise errors[0]
+
+    elapsed = time.perf_counter() - start
+    video_seconds = frames['decoded'] / frames['video_fps'] if frames.get('video_fps') else frames.get('duration')
+    yield {
+        'type': 'summary',
+        'frames_decoded': frames['decoded'],
+        'frames_analyzed': analyzed,
+        'frames_with_faces': sum(emotions.values()),
+        'video_fps': frames['video_fps'],
+        'sample_fps': sample_fps,
+        'duration': round(video_seconds, 3) if video_seconds else None,
+        'elapsed': round(elapsed, 3),
+        'fps': round(analyzed / elapsed, 2) if elapsed > 0 else None,
+        'realtime_factor': round(video_seconds / elapsed, 2) if video_seconds and elapsed > 0 else None,
+        'dominant_emotion': emotions.most_common(1)[0][0] if emotions else None,
+        'emotion_counts': dict(emotions.most_common())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Facial emotion timeline of a video file')
+    parser.add_argument('video', help='Video file (any format OpenCV can read)')
+    parser.add_argument('-o', '--output', default='-', help="NDJSON output file ('-' for stdout)")
+    parser.add_argument('--fps', type=float, default=2.0, help='Frames analyzed per second of video (0 = every frame)')
+    parser.add_argument('--threads', type=int, default=4, help='Concurrent detector calls (default: 4)')
+    parser.add_argument('--backend', default='deepface', help='Emotion model backend (see FACE_BACKEND)')
+    parser.add_argument('--model-path', default=None, help='Exported model for the onnx/opencv backends')
+    parser.add_argument('--face-detector', default='haar', help='Face detector backend (see FACE_DETECTOR)')
+    args = parser.parse_args()
+
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+
+    # Keep the detector's log prints out of NDJSON written to stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        from face_emotion_detector import FaceEmotionDetector
+        detector = FaceEmotionDetector(backend=args.backend, model_path=args.model_path,
+                                       face_detector=args.face_detector, frame_cache_clients=0)
+        detector.warm_up()
+        try:
+            for entry in analyze_video(detector, args.video, sample_fps=args.fps, threads=args.threads):
+                output.write(json.dumps(entry) + '\n')
+                output.flush()
+        finally:
+            if args.output != '-':
+                output.close()
+
+    print(f"[VIDEO] Analyzed {entry['frames_analyzed']} of {entry['frames_decoded']} frames in "
+          f"{entry['elapsed']}s ({entry['fps']} frames/s, {entry['realtime_factor']}x real time)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()